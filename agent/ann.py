@@ -0,0 +1,148 @@
+"""
+Inverted-file (IVF) approximate nearest-neighbour index over NumPy.
+
+Vectors are clustered with spherical k-means into `nlist` lists. A query
+scores the centroids, then only the rows in its `nprobe` closest lists, so
+with nlist ~ 4*sqrt(n) the work per query grows far slower than an
+exhaustive scan. New vectors are assigned to the existing centroids;
+the index is retrained once it has grown well past its training size.
+"""
+import json
+import math
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_assignments.npy"
+PARAMS_FILE = "ivf.json"
+
+DEFAULT_NPROBE = 16
+# Training sample per list; more gives better centroids at a slower build
+TRAIN_POINTS_PER_LIST = 32
+MAX_TRAIN_POINTS = 65536
+# Rows assigned to centroids per matrix product, to bound temporary memory
+ASSIGN_BLOCK_ROWS = 8192
+# Retrain once the index holds this many times the vectors it was trained on
+RETRAIN_GROWTH = 4.0
+
+
+def auto_nlist(n: int) -> int:
+    return max(1, min(n, int(4 * math.sqrt(n))))
+
+
+class IVFIndex:
+    """Centroids plus a CSR layout of row ids grouped by list."""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray, trained_size: int, nprobe: int = DEFAULT_NPROBE):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.trained_size = trained_size
+        self.nprobe = nprobe
+        self._rebuild_lists()
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        iters: int = 8,
+        nprobe: int = DEFAULT_NPROBE,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Cluster L2-normalized `vectors` and assign every row to a list.
+
+        Args:
+            vectors: (n, dim) normalized matrix (may be memory-mapped)
+            nlist: Number of lists; defaults to 4*sqrt(n)
+            iters: k-means iterations over the training sample
+            nprobe: Default lists searched per query
+        """
+        n = len(vectors)
+        nlist = min(n, nlist or auto_nlist(n))
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, max(nlist, min(MAX_TRAIN_POINTS, nlist * TRAIN_POINTS_PER_LIST)))
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iters):
+            labels = _nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty lists from random training points
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        return cls(centroids, _nearest(vectors, centroids), trained_size=n, nprobe=nprobe)
+
+    def _rebuild_lists(self) -> None:
+        self._order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=self.nlist)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.centroids.nbytes + self.assignments.nbytes + self._order.nbytes + self._offsets.nbytes)
+
+    def needs_retrain(self) -> bool:
+        return len(self.assignments) > RETRAIN_GROWTH * self.trained_size
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Append rows (ids continue after the existing ones) to their nearest lists."""
+        self.assignments = np.concatenate([self.assignments, _nearest(vectors, self.centroids)])
+        self._rebuild_lists()
+
+    def keep(self, rows) -> None:
+        """Drop every row not in `rows`, renumbering to match the compacted store."""
+        self.assignments = self.assignments[rows]
+        self._rebuild_lists()
+
+    def candidates(self, q: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Sorted row ids in the `nprobe` lists whose centroids are closest to `q`."""
+        nprobe = min(self.nlist, nprobe or self.nprobe)
+        scores = self.centroids @ q
+        lists = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        rows = [self._order[self._offsets[i]:self._offsets[i + 1]] for i in lists]
+        return np.sort(np.concatenate(rows))
+
+    def params(self) -> dict:
+        return {"type": "ivf", "nlist": self.nlist, "nprobe": self.nprobe, "trained_size": self.trained_size}
+
+    def save(self, persist_dir: Path) -> None:
+        persist_dir = Path(persist_dir)
+        np.save(persist_dir / CENTROIDS_FILE, self.centroids)
+        np.save(persist_dir / ASSIGNMENTS_FILE, self.assignments)
+        (persist_dir / PARAMS_FILE).write_text(json.dumps(self.params()), encoding="utf-8")
+
+    @classmethod
+    def load(cls, persist_dir: Path, nprobe: Optional[int] = None) -> Optional["IVFIndex"]:
+        """Load a saved index, or None if `persist_dir` has none."""
+        persist_dir = Path(persist_dir)
+        if not (persist_dir / PARAMS_FILE).exists():
+            return None
+        params = json.loads((persist_dir / PARAMS_FILE).read_text(encoding="utf-8"))
+        return cls(
+            np.load(persist_dir / CENTROIDS_FILE),
+            np.load(persist_dir / ASSIGNMENTS_FILE),
+            trained_size=params["trained_size"],
+            nprobe=nprobe or params["nprobe"],
+        )
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
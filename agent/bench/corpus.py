@@ -0,0 +1,75 @@
+"""Synthetic cookbook corpora for benchmarks."""
+import random
+from pathlib import Path
+from typing import List
+
+DISHES = [
+    "lasagna", "risotto", "paella", "ramen", "curry", "chili", "gumbo", "pad thai",
+    "shakshuka", "moussaka", "biryani", "tagine", "goulash", "carbonara", "pho",
+    "enchiladas", "ratatouille", "bibimbap", "jambalaya", "pierogi", "falafel",
+    "gnocchi", "dumplings", "meatballs", "frittata", "quiche", "stroganoff", "bolognese",
+]
+STYLES = ["classic", "spicy", "smoky", "lemony", "weeknight", "grandma's", "vegetarian", "slow-cooked"]
+INGREDIENTS = [
+    "onion", "garlic", "olive oil", "butter", "tomato", "chicken thigh", "beef mince", "rice",
+    "basil", "parsley", "cumin", "paprika", "coriander", "ginger", "soy sauce", "lemon",
+    "parmesan", "cream", "flour", "egg", "stock", "carrot", "celery", "chili flakes",
+]
+VERBS = ["chop", "saute", "simmer", "whisk", "fold", "roast", "season", "stir", "bake", "rest"]
+
+
+def recipe_titles(pages: int, seed: int = 0) -> List[str]:
+    """The recipe title on each page, in order (same seed -> same titles)."""
+    rng = random.Random(seed)
+    return [f"{rng.choice(STYLES)} {rng.choice(DISHES)} no. {i + 1}" for i in range(pages)]
+
+
+def make_page(title: str, rng: random.Random) -> str:
+    lines = [title.title(), "", f"Serves {rng.randint(2, 8)}. Prep {rng.randint(5, 40)} mins.", "", "Ingredients:"]
+    for ing in rng.sample(INGREDIENTS, rng.randint(6, 12)):
+        lines.append(f"- {rng.randint(1, 500)}g {ing}")
+    lines += ["", "Method:"]
+    for n in range(1, rng.randint(5, 10) + 1):
+        a, b = rng.sample(INGREDIENTS, 2)
+        lines.append(
+            f"{n}. {rng.choice(VERBS).capitalize()} the {a} with the {b} for "
+            f"{rng.randint(1, 30)} minutes, then {rng.choice(VERBS)} until ready."
+        )
+    lines += ["", f"Notes: this {title} keeps for {rng.randint(1, 4)} days in the fridge."]
+    return "\n".join(lines)
+
+
+def write_corpus(out_dir: Path, pages: int, seed: int = 0, fmt: str = "txt", pages_per_file: int = 50) -> List[str]:
+    """
+    Write `pages` synthetic recipe pages into `out_dir`.
+
+    Args:
+        out_dir: Target directory (created if needed)
+        pages: Total number of pages/recipes
+        seed: RNG seed, so runs are comparable
+        fmt: "txt" (one file per `pages_per_file` pages) or "pdf" (needs pymupdf)
+        pages_per_file: Pages grouped into each file
+
+    Returns:
+        The recipe titles, in page order
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    titles = recipe_titles(pages, seed)
+    texts = [make_page(t, rng) for t in titles]
+
+    for start in range(0, pages, pages_per_file):
+        chunk = texts[start:start + pages_per_file]
+        name = f"cookbook_{start // pages_per_file:04d}"
+        if fmt == "pdf":
+            import fitz  # pymupdf
+
+            doc = fitz.open()
+            for text in chunk:
+                page = doc.new_page()
+                page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=9)
+            doc.save(str(out_dir / f"{name}.pdf"))
+            doc.close()
+        else:
+            (out_dir / f"{name}.txt").write_text("\n\n\f\n\n".join(chunk), encoding="utf-8")
+    return titles
@@ -0,0 +1,149 @@
+"""
+In-process stand-ins for the LiveKit pieces `souschef_session` touches.
+
+`FakeJobContext` carries a `FakeRoom` whose local participant records
+published data and registered RPC methods, and `install()` swaps the
+realtime model, VAD and turn detector in `main` for no-ops, so whole
+sessions run without a LiveKit server, audio, or network access. A test
+plays the UI through `FakeRoom.send_data` / `perform_rpc` and the user's
+voice through `FakeAgentSession.say`.
+"""
+import asyncio
+import inspect
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+import codec
+
+
+@dataclass
+class FakeDataPacket:
+    data: bytes
+    topic: Optional[str] = None
+
+
+@dataclass
+class FakeRpcInvocation:
+    request_id: str
+    caller_identity: str
+    payload: str
+    response_timeout: float = 10.0
+
+
+@dataclass
+class FakeTranscript:
+    transcript: str
+    is_final: bool
+
+
+class _Emitter:
+    """The `on(event)` / `on(event, callback)` registration of livekit's EventEmitter."""
+
+    def __init__(self):
+        self._callbacks: dict[str, list[Callable]] = {}
+
+    def on(self, event: str, callback: Optional[Callable] = None):
+        def register(cb: Callable) -> Callable:
+            self._callbacks.setdefault(event, []).append(cb)
+            return cb
+        return register(callback) if callback else register
+
+    def emit(self, event: str, *args) -> None:
+        for cb in list(self._callbacks.get(event, [])):
+            cb(*args)
+
+
+class FakeLocalParticipant:
+    def __init__(self, identity: str = "agent"):
+        self.identity = identity
+        self.rpc_methods: dict[str, Callable] = {}
+        self.messages_sent = 0
+        self.bytes_sent = 0
+
+    def register_rpc_method(self, method: str, handler: Optional[Callable] = None):
+        def register(fn: Callable) -> Callable:
+            self.rpc_methods[method] = fn
+            return fn
+        return register(handler) if handler else register
+
+    async def publish_data(self, payload, reliable: bool = True, topic: str = "", destination_identities=None) -> None:
+        self.messages_sent += 1
+        self.bytes_sent += len(payload)
+
+
+class FakeRoom(_Emitter):
+    def __init__(self, name: str, metadata: str = "", user_identity: str = "user"):
+        super().__init__()
+        self.name = name
+        self.metadata = metadata
+        self.local_participant = FakeLocalParticipant()
+        self.user_identity = user_identity
+        # Set by FakeAgentSession.start
+        self.session: Optional["FakeAgentSession"] = None
+        self._rpc_count = 0
+
+    def send_data(self, message: dict, encoding: str = codec.ENCODING_JSON) -> None:
+        """Deliver a message from the user's UI, as `data_received` would."""
+        self.emit("data_received", FakeDataPacket(codec.encode(message, encoding)))
+
+    async def perform_rpc(self, method: str, payload: str = "") -> str:
+        """Call one of the agent's RPC methods the way the UI does."""
+        self._rpc_count += 1
+        handler = self.local_participant.rpc_methods[method]
+        return await handler(FakeRpcInvocation(str(self._rpc_count), self.user_identity, payload))
+
+
+class FakeJobContext:
+    def __init__(self, room: FakeRoom):
+        self.room = room
+        self._shutdown_callbacks: list[Callable] = []
+
+    def add_shutdown_callback(self, callback: Callable) -> None:
+        self._shutdown_callbacks.append(callback)
+
+    async def wait_for_participant(self, identity: Optional[str] = None):
+        return SimpleNamespace(identity=identity or self.room.user_identity)
+
+    async def shutdown(self) -> None:
+        for callback in self._shutdown_callbacks:
+            result = callback()
+            if inspect.isawaitable(result):
+                await result
+
+
+class FakeAgentSession(_Emitter):
+    """An AgentSession without a model: replies are counted, not spoken."""
+
+    # Seconds each generate_reply takes, shared by all sessions
+    reply_latency = 0.0
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.agent = None
+        self.replies = 0
+
+    async def start(self, room: FakeRoom, agent, room_options=None) -> None:
+        self.agent = agent
+        room.session = self
+
+    async def generate_reply(self, instructions: str = "", **kwargs) -> None:
+        self.replies += 1
+        await asyncio.sleep(self.reply_latency)
+
+    async def say(self, transcript: str, word_gap: float = 0.0) -> None:
+        """Emit the interim transcripts of an utterance word by word, then the final one."""
+        words = transcript.split()
+        for n in range(1, len(words)):
+            self.emit("user_input_transcribed", FakeTranscript(" ".join(words[:n]), False))
+            await asyncio.sleep(word_gap)
+        self.emit("user_input_transcribed", FakeTranscript(transcript, True))
+
+
+def install(main_module, reply_latency: float = 0.0) -> None:
+    """Swap the model, VAD and turn detector used by `main.souschef_session` for no-ops."""
+    FakeAgentSession.reply_latency = reply_latency
+    main_module.AgentSession = FakeAgentSession
+    main_module.google = SimpleNamespace(realtime=SimpleNamespace(RealtimeModel=lambda **kwargs: None))
+    main_module.silero = SimpleNamespace(VAD=SimpleNamespace(load=lambda **kwargs: None))
+    main_module.MultilingualModel = lambda **kwargs: None
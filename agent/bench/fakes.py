@@ -0,0 +1,119 @@
+"""
+Deterministic offline stand-ins for the Google GenAI client.
+
+`FakeGenAIClient` mimics the parts of `genai.Client` the agent uses
+(`models.embed_content` and `models.generate_content`) with configurable
+latency, so ingestion, retrieval and parsing can be benchmarked without
+network access or an API key.
+"""
+import hashlib
+import json
+import math
+import re
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class FakeLatency:
+    """Simulated per-call latency in seconds."""
+    embed: float = 0.0
+    generate: float = 0.0
+
+
+# Shared by every FakeGenAIClient created while installed (see install())
+LATENCY = FakeLatency()
+EMBED_DIM = 768
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> List[float]:
+    """
+    Bag-of-words hashing embedding: each token adds +/-1 to one bucket. Similar
+    texts get similar vectors, so retrieval behaves plausibly.
+    """
+    vec = [0.0] * dim
+    for token in _WORD_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+@dataclass
+class _Embedding:
+    values: List[float]
+
+
+@dataclass
+class _EmbedResponse:
+    embeddings: List[_Embedding] = field(default_factory=list)
+
+
+@dataclass
+class _GenerateResponse:
+    text: str
+
+
+def _fake_recipe(name: str) -> dict:
+    return {
+        "name": name.title(),
+        "servings": "4 servings",
+        "prep_time": "15 mins",
+        "cook_time": "30 mins",
+        "ingredients": [
+            {"name": "olive oil", "quantity": "2 tbsp", "emoji": "🫒"},
+            {"name": "onion", "quantity": "1", "emoji": "🧅"},
+            {"name": "garlic", "quantity": "2 cloves", "emoji": "🧄"},
+        ],
+        "steps": [
+            {"step_number": 1, "instruction": "Heat the oil.", "duration_minutes": 2, "tips": None},
+            {"step_number": 2, "instruction": "Soften the onion and garlic.", "duration_minutes": 5, "tips": None},
+            {"step_number": 3, "instruction": f"Finish the {name}.", "duration_minutes": 20, "tips": None},
+        ],
+    }
+
+
+def _fake_recipe_json(prompt: str, batch: bool = False) -> str:
+    """One recipe per "User wants to make:" line; a list of them for batch requests."""
+    names = [n.strip() for n in re.findall(r"User wants to make:\s*(.+)", prompt)] or ["Mystery Dish"]
+    if batch:
+        return json.dumps([_fake_recipe(n) for n in names])
+    return json.dumps(_fake_recipe(names[0]))
+
+
+class _FakeModels:
+    def embed_content(self, model: str, contents, config=None) -> _EmbedResponse:
+        if LATENCY.embed:
+            time.sleep(LATENCY.embed)
+        texts = contents if isinstance(contents, list) else [contents]
+        dim = getattr(config, "output_dimensionality", None) or EMBED_DIM
+        return _EmbedResponse([_Embedding(fake_embedding(str(t), dim)) for t in texts])
+
+    def generate_content(self, model: str, contents, config=None) -> _GenerateResponse:
+        if LATENCY.generate:
+            time.sleep(LATENCY.generate)
+        schema = (config or {}).get("response_schema")
+        batch = getattr(schema, "__origin__", None) is list
+        return _GenerateResponse(_fake_recipe_json(str(contents), batch))
+
+
+class FakeGenAIClient:
+    def __init__(self, api_key: str = None, **kwargs):
+        self.models = _FakeModels()
+
+
+def install(embed_latency: float = 0.0, generate_latency: float = 0.0) -> None:
+    """
+    Replace `google.genai.Client` with the fake. Must run before `rag` is
+    imported, since that module builds its default embedding at import time.
+    """
+    import os
+    from google import genai
+
+    LATENCY.embed = embed_latency
+    LATENCY.generate = generate_latency
+    genai.Client = FakeGenAIClient
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
@@ -0,0 +1,310 @@
+"""
+Concurrent-room load test for one agent worker process.
+
+Ramps up N simulated users, each running a full `souschef_session` against
+an in-process fake LiveKit room (bench/fake_room.py) with Gemini stubbed
+out (bench/fakes.py). Every user uploads a cookbook (optionally), talks,
+searches, generates a plan and steps through cooking mode, through the same
+tool methods, data messages and RPC handlers the UI and realtime model use.
+
+Per room count it reports event-loop lag, latency percentiles per action,
+RSS and CPU per room, and the largest room count that stayed within the
+lag and latency budgets. Each room count runs in a fresh process.
+
+Usage (from the agent/ directory):
+    python -m bench.load --rooms 1,5,10,25,50 --embed-latency 0.05 --generate-latency 1.0 --out load-results.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from bench.run import AGENT_DIR, _git_rev, _peak_rss_mb, percentile
+
+DEFAULT_ROOMS = [1, 5, 10, 25, 50]
+# Actions held to the latency budget; uploads and session start include indexing and greeting
+TOOL_ACTIONS = ["search_cookbook", "generate_recipe_plan", "start_cooking_mode", "next_step", "rpc_get_index_stats"]
+UPLOAD_TIMEOUT_S = 120.0
+
+
+def _rss_mb() -> float:
+    """Current resident set size; falls back to the peak where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _cpu_s() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class LoopMonitor:
+    """Measures how late the event loop wakes a sleeping task, and samples RSS."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lag_ms: list[float] = []
+        self.rss_peak_mb = 0.0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag_ms.append(max(0.0, (loop.time() - start - self.interval) * 1000))
+            self.rss_peak_mb = max(self.rss_peak_mb, _rss_mb())
+
+
+class Recorder:
+    """Latency, exceptions and unsuccessful results per action."""
+
+    def __init__(self):
+        self.ms: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.failed: Counter = Counter()
+        # First message of each action's unsuccessful results, to explain the counts
+        self.failure_messages: dict[str, str] = {}
+
+    async def timed(self, action: str, coro):
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except Exception as e:
+            self.errors[action] += 1
+            print(f"{action} raised: {e!r}")
+            return None
+        self.ms[action].append((time.perf_counter() - start) * 1000)
+        if isinstance(result, dict) and result.get("success") is False:
+            self.failed[action] += 1
+            self.failure_messages.setdefault(action, str(result.get("message", "")))
+        return result
+
+
+async def _upload(room, rag, data_dir: Path, user: int, rng: random.Random, pages: int) -> None:
+    """
+    Do what the UI does after an upload: call reload_cookbook and wait until
+    the index is searchable. With `pages`, first drop a new cookbook of that
+    many pages into the data directory.
+    """
+    from bench.corpus import DISHES, make_page
+
+    name = None
+    if pages:
+        name = f"upload_{user:04d}.txt"
+        texts = [make_page(f"room {user} {rng.choice(DISHES)} no. {n + 1}", rng) for n in range(pages)]
+        (data_dir / name).write_text("\n\n\f\n\n".join(texts), encoding="utf-8")
+    await room.perform_rpc("reload_cookbook")
+    deadline = time.monotonic() + UPLOAD_TIMEOUT_S
+    while not rag.is_available() or (name and name not in rag.document_names()):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Cookbook was not indexed within {UPLOAD_TIMEOUT_S:.0f}s")
+        await asyncio.sleep(0.05)
+
+
+async def _simulated_user(user: int, titles: list[str], data_dir: Path, rec: Recorder, args: dict) -> int:
+    """One user's session from connect to disconnect. Returns bytes the agent published to them."""
+    import main
+    from bench.corpus import INGREDIENTS
+    from bench.fake_room import FakeJobContext, FakeRoom
+
+    rng = random.Random(args["seed"] * 100003 + user)
+
+    async def think():
+        await asyncio.sleep(rng.uniform(0, args["think"]))
+
+    room = FakeRoom(f"souschef-female-load{user}", user_identity=f"load-user-{user}")
+    ctx = FakeJobContext(room)
+    await rec.timed("session_start", main.souschef_session(ctx))
+    session = room.session
+    agent = session.agent
+
+    # A session with an API key starts with an empty index of its own, like the real app
+    uploads = args["upload_every"] and user % args["upload_every"] == 0
+    await rec.timed("upload", _upload(room, agent.rag, data_dir, user, rng, args["upload_pages"] if uploads else 0))
+
+    title = rng.choice(titles)
+    await session.say(f"I want to make the {title}", args["word_gap"])
+    await rec.timed("search_cookbook", agent.search_cookbook(None, title))
+    await think()
+    await session.say(f"what can I use instead of {rng.choice(INGREDIENTS)}", args["word_gap"])
+    await rec.timed("search_cookbook", agent.search_cookbook(None, f"{rng.choice(INGREDIENTS)} substitutes"))
+    await think()
+    await rec.timed("generate_recipe_plan", agent.generate_recipe_plan(None, title))
+    await rec.timed("start_cooking_mode", agent.start_cooking_mode(None))
+
+    for n in range(args["steps"]):
+        await think()
+        if n % 2 and agent.current_recipe:
+            # Every other step is a click in the UI rather than a voice command
+            room.send_data({
+                "type": "ui_step_change",
+                "action": "next",
+                "step_index": min(agent.current_recipe.current_step_index + 1, len(agent.current_recipe.steps) - 1),
+            })
+        else:
+            await rec.timed("next_step", agent.next_step(None))
+
+    await rec.timed("rpc_get_index_stats", room.perform_rpc("get_index_stats"))
+    room.send_data({"type": "request_recipe", "title": rng.choice(titles)})
+    await think()
+    await ctx.shutdown()
+    return room.local_participant.bytes_sent
+
+
+async def _run_rooms(rooms: int, titles: list[str], data_dir: Path, args: dict) -> dict:
+    monitor = LoopMonitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    rec = Recorder()
+
+    async def staggered(user: int) -> int:
+        await asyncio.sleep(args["ramp"] * user / rooms)
+        return await _simulated_user(user, titles, data_dir, rec, args)
+
+    rss_base = _rss_mb()
+    cpu_start = _cpu_s()
+    wall_start = time.perf_counter()
+    sent = await asyncio.gather(*(staggered(u) for u in range(rooms)), return_exceptions=True)
+    wall_s = time.perf_counter() - wall_start
+    cpu_s = _cpu_s() - cpu_start
+    monitor_task.cancel()
+
+    crashed = [s for s in sent if isinstance(s, BaseException)]
+    for e in crashed:
+        print(f"Simulated user crashed: {e!r}")
+    sent_bytes = [s for s in sent if not isinstance(s, BaseException)]
+
+    row = {
+        "rooms": rooms,
+        "wall_s": round(wall_s, 2),
+        "loop_lag_p50_ms": round(percentile(monitor.lag_ms, 50), 2),
+        "loop_lag_p99_ms": round(percentile(monitor.lag_ms, 99), 2),
+        "loop_lag_max_ms": round(max(monitor.lag_ms, default=0.0), 2),
+        "rss_baseline_mb": round(rss_base, 1),
+        "rss_peak_mb": round(max(monitor.rss_peak_mb, rss_base), 1),
+        "rss_per_room_mb": round(max(0.0, monitor.rss_peak_mb - rss_base) / rooms, 2),
+        "cpu_percent": round(100 * cpu_s / wall_s, 1) if wall_s else 0.0,
+        "cpu_s_per_room": round(cpu_s / rooms, 3),
+        "published_kb_per_room": round(sum(sent_bytes) / 1024 / max(1, len(sent_bytes)), 1),
+        "errors": sum(rec.errors.values()) + len(crashed),
+        "unsuccessful": dict(rec.failed),
+        "unsuccessful_messages": rec.failure_messages,
+    }
+    for action in sorted(rec.ms):
+        for pct in (50, 95, 99):
+            row[f"{action}_p{pct}_ms"] = round(percentile(rec.ms[action], pct), 1)
+    return row
+
+
+def run_rooms(rooms: int, args: dict) -> dict:
+    """Load-test one room count. Runs in a child process."""
+    sys.path.insert(0, str(AGENT_DIR))
+    from bench import fakes
+    fakes.install(embed_latency=args["embed_latency"], generate_latency=args["generate_latency"])
+
+    with tempfile.TemporaryDirectory(prefix="souschef-load-") as tmp:
+        # Saved sessions go to a scratch database, read when state_store is imported
+        os.environ["SOUSCHEF_STATE_DB"] = str(Path(tmp) / "sessions.sqlite3")
+
+        from bench.corpus import write_corpus
+        import rag
+        import text_cache
+
+        data_dir = Path(tmp) / "data"
+        titles = write_corpus(data_dir, args["pages"], seed=args["seed"])
+        rag.DATA_DIR = data_dir
+        rag.SHARDS_DIR = Path(tmp) / "shards"
+        text_cache.TEXT_CACHE_DIR = Path(tmp) / "text"
+        rag.INGEST_OUT_OF_PROCESS = False
+
+        import main
+        from bench import fake_room
+        fake_room.install(main, reply_latency=args["reply_latency"])
+
+        # Build the shared cookbook's shards up front, as on a worker that has served it
+        # before; each room's reload then maps them instead of embedding again
+        rag.CookbookRAG().sync_documents()
+        return asyncio.run(_run_rooms(rooms, titles, data_dir, args))
+
+
+def within_budget(row: dict, max_lag_ms: float, max_tool_ms: float) -> bool:
+    if row.get("errors") or row.get("loop_lag_p99_ms", 0) > max_lag_ms:
+        return False
+    return all(row.get(f"{a}_p95_ms", 0) <= max_tool_ms for a in TOOL_ACTIONS)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Concurrent-room SousChef load test")
+    parser.add_argument("--rooms", default=",".join(map(str, DEFAULT_ROOMS)), help="Comma-separated concurrent room counts")
+    parser.add_argument("--pages", type=int, default=200, help="Pages in the shared cookbook")
+    parser.add_argument("--upload-every", type=int, default=5, help="Every Nth user uploads a new cookbook (0: nobody)")
+    parser.add_argument("--upload-pages", type=int, default=10)
+    parser.add_argument("--steps", type=int, default=6, help="Cooking-mode steps each user takes")
+    parser.add_argument("--think", type=float, default=0.5, help="Max seconds a user pauses between actions")
+    parser.add_argument("--word-gap", type=float, default=0.05, help="Seconds between interim transcript words")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which users join")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake seconds per embedding call")
+    parser.add_argument("--generate-latency", type=float, default=1.0, help="Fake seconds per generation call")
+    parser.add_argument("--reply-latency", type=float, default=0.2, help="Fake seconds per spoken reply")
+    parser.add_argument("--max-lag-ms", type=float, default=100.0, help="Event-loop lag p99 budget")
+    parser.add_argument("--max-tool-ms", type=float, default=3000.0, help="Tool latency p95 budget")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="load-results.json")
+    opts = parser.parse_args(argv)
+
+    args = {
+        "pages": opts.pages,
+        "upload_every": opts.upload_every,
+        "upload_pages": opts.upload_pages,
+        "steps": opts.steps,
+        "think": opts.think,
+        "word_gap": opts.word_gap,
+        "ramp": opts.ramp,
+        "embed_latency": opts.embed_latency,
+        "generate_latency": opts.generate_latency,
+        "reply_latency": opts.reply_latency,
+        "seed": opts.seed,
+    }
+    room_counts = [int(r) for r in opts.rooms.split(",") if r.strip()]
+
+    results = []
+    # Largest room count before the first one over budget
+    capacity, passing = 0, True
+    ctx = multiprocessing.get_context("spawn")
+    for rooms in room_counts:
+        print(f"Load testing {rooms} concurrent room(s)...")
+        with ctx.Pool(1) as pool:
+            row = pool.apply(run_rooms, (rooms, args))
+        row["within_budget"] = within_budget(row, opts.max_lag_ms, opts.max_tool_ms)
+        print("  " + ", ".join(f"{k}={v}" for k, v in row.items() if k != "rooms"))
+        results.append(row)
+        passing = passing and row["within_budget"]
+        if passing:
+            capacity = rooms
+
+    print(f"Capacity: {capacity} concurrent room(s) within p99 loop lag {opts.max_lag_ms:.0f}ms and tool p95 {opts.max_tool_ms:.0f}ms")
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": _git_rev(),
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "config": {**args, "max_lag_ms": opts.max_lag_ms, "max_tool_ms": opts.max_tool_ms},
+        "capacity_rooms": capacity,
+        "results": results,
+    }
+    Path(opts.out).write_text(json.dumps(report, indent=2))
+    print(f"Wrote {opts.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Offline benchmark for cookbook ingestion, retrieval and recipe parsing.
+
+Runs entirely without network access: Gemini embedding and generation calls
+go to deterministic fakes (bench/fakes.py) with configurable latency, over
+synthetic cookbooks (bench/corpus.py). Each corpus size runs in a fresh
+process so peak RSS is per size.
+
+Usage (from the agent/ directory):
+    python -m bench.run --sizes 10,100,500,2000 --embed-latency 0.002 --out bench-results.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+AGENT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_SIZES = [10, 100, 500, 2000]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_size(pages: int, args: dict) -> dict:
+    """Benchmark one corpus size. Runs in a child process."""
+    sys.path.insert(0, str(AGENT_DIR))
+    from bench import fakes
+    fakes.install(embed_latency=args["embed_latency"], generate_latency=args["generate_latency"])
+
+    from bench.corpus import write_corpus
+    import rag
+    import text_cache
+
+    with tempfile.TemporaryDirectory(prefix="souschef-bench-") as tmp:
+        data_dir = Path(tmp) / "data"
+        titles = write_corpus(data_dir, pages, seed=args["seed"], fmt=args["format"])
+        rag.DATA_DIR = data_dir
+        rag.SHARDS_DIR = Path(tmp) / "shards"
+        text_cache.TEXT_CACHE_DIR = Path(tmp) / "text"
+        # The fakes are only installed in this process, so index here too
+        rag.INGEST_OUT_OF_PROCESS = False
+        cookbook = rag.CookbookRAG()
+
+        rss_before = _peak_rss_mb()
+        start = time.perf_counter()
+        cookbook.sync_documents()
+        build_s = time.perf_counter() - start
+        if cookbook.index is None:
+            return {"pages": pages, "error": "index build failed"}
+
+        rng = random.Random(args["seed"])
+        queries = [rng.choice(titles) for _ in range(args["queries"])]
+        query_ms = []
+        hits = 0
+        for q in queries:
+            start = time.perf_counter()
+            result = cookbook.query(q, top_k=3)
+            query_ms.append((time.perf_counter() - start) * 1000)
+            hits += q.lower() in result.lower()
+
+        # Context handed to the recipe parser, with and without reranking
+        full_chars, reranked_chars, reranked_hits = [], [], 0
+        for q in queries:
+            full_chars.append(len(cookbook.query(q, top_k=5)))
+            reranked = cookbook.query(q, top_k=5, rerank=True)
+            reranked_chars.append(len(reranked))
+            reranked_hits += q.lower() in reranked.lower()
+
+        variants = _search_variants(cookbook, queries)
+        plan_ms = asyncio.run(_time_plans(cookbook, queries[:args["plans"]]))
+        batch = asyncio.run(_time_batch_parse(cookbook, queries[:args["plans"]]))
+
+    return {
+        "pages": pages,
+        "index_build_s": round(build_s, 4),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "rss_before_build_mb": round(rss_before, 1),
+        "query_p50_ms": round(percentile(query_ms, 50), 3),
+        "query_p99_ms": round(percentile(query_ms, 99), 3),
+        "query_hit_rate": round(hits / len(queries), 3) if queries else None,
+        "plan_context_chars_p50": round(percentile(full_chars, 50), 1),
+        "plan_context_chars_reranked_p50": round(percentile(reranked_chars, 50), 1),
+        "reranked_hit_rate": round(reranked_hits / len(queries), 3) if queries else None,
+        "plan_p50_ms": round(percentile(plan_ms, 50), 3),
+        "plan_p99_ms": round(percentile(plan_ms, 99), 3),
+        **batch,
+        **variants,
+    }
+
+
+def _search_variants(cookbook, queries: list[str], top_k: int = 3) -> dict:
+    """
+    Recall@k and query latency of quantized and IVF search against exact
+    float32 search over the same vectors, plus the bytes of each search matrix.
+    """
+    import vector_store
+    from llama_index.core.vector_stores.types import VectorStoreQuery
+    from vector_store import NumpyVectorStore
+
+    import numpy as np
+
+    # Compare on one matrix holding every shard
+    shards = list(cookbook.vector_store.shards().values())
+    vectors = np.vstack([np.asarray(s._vectors) for s in shards])
+    records = [r for s in shards for r in s._records]
+    exact = NumpyVectorStore(vectors=vectors, records=records)
+    embed_model = cookbook._embed_model()
+    embeddings = [embed_model.get_query_embedding(q) for q in dict.fromkeys(queries)]
+    out = {"vectors_float32_bytes": exact.memory_bytes()["exact"]}
+
+    # Build IVF even for small benchmark corpora
+    vector_store.ANN_MIN_VECTORS = 0
+    variants = {
+        "float16": {"quantization": "float16"},
+        "int8": {"quantization": "int8"},
+        "ivf": {"index_type": "ivf"},
+    }
+    for name, options in variants.items():
+        store = NumpyVectorStore(vectors=vectors, records=records, **options)
+        found = total = 0
+        query_ms = []
+        for e in embeddings:
+            q = VectorStoreQuery(query_embedding=e, similarity_top_k=top_k)
+            expected = set(exact.query(q).ids)
+            start = time.perf_counter()
+            ids = store.query(q).ids
+            query_ms.append((time.perf_counter() - start) * 1000)
+            found += len(expected & set(ids))
+            total += len(expected)
+        if store.quantization != "none":
+            out[f"{name}_bytes"] = store.memory_bytes()["quantized"]
+        out[f"{name}_recall_at_{top_k}"] = round(found / total, 4) if total else None
+        out[f"{name}_search_p50_ms"] = round(percentile(query_ms, 50), 3)
+    return out
+
+
+async def _time_plans(cookbook, queries: list[str]) -> list[float]:
+    from tools.cooking import CookingMixin
+
+    class BenchAgent(CookingMixin):
+        _publisher = None
+
+        def __init__(self, rag):
+            self.rag = rag
+
+        def _checkpoint(self):
+            pass
+
+    agent = BenchAgent(cookbook)
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        await agent.generate_recipe_plan(None, q)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def _time_batch_parse(cookbook, queries: list[str]) -> dict:
+    """Parsing the same recipes one request at a time vs batched (as plan_meal does)."""
+    from recipe_parser import parse_recipe_from_rag, parse_recipes_from_rag, split_batches
+
+    requests = [(cookbook.query(q, top_k=5, rerank=True), q) for q in queries]
+    start = time.perf_counter()
+    for rag_content, q in requests:
+        await parse_recipe_from_rag(rag_content, q)
+    sequential_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    await parse_recipes_from_rag(requests)
+    batched_ms = (time.perf_counter() - start) * 1000
+    return {
+        "parse_recipes": len(requests),
+        "parse_sequential_ms": round(sequential_ms, 3),
+        "parse_batched_ms": round(batched_ms, 3),
+        "parse_batches": len(split_batches(requests)),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=AGENT_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline SousChef RAG benchmark")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated corpus sizes in pages")
+    parser.add_argument("--format", choices=["txt", "pdf"], default="txt")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Fake seconds per embedding call")
+    parser.add_argument("--generate-latency", type=float, default=0.0, help="Fake seconds per generation call")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--plans", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench-results.json")
+    opts = parser.parse_args(argv)
+
+    args = {
+        "format": opts.format,
+        "embed_latency": opts.embed_latency,
+        "generate_latency": opts.generate_latency,
+        "queries": opts.queries,
+        "plans": opts.plans,
+        "seed": opts.seed,
+    }
+    sizes = [int(s) for s in opts.sizes.split(",") if s.strip()]
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for pages in sizes:
+        print(f"Benchmarking {pages} pages...")
+        with ctx.Pool(1) as pool:
+            row = pool.apply(run_size, (pages, args))
+        print("  " + ", ".join(f"{k}={v}" for k, v in row.items() if k != "pages"))
+        results.append(row)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": _git_rev(),
+        "python": sys.version.split()[0],
+        "config": args,
+        "results": results,
+    }
+    Path(opts.out).write_text(json.dumps(report, indent=2))
+    print(f"Wrote {opts.out}")
+
+
+if __name__ == "__main__":
+    main()
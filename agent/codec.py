@@ -0,0 +1,197 @@
+import json
+from typing import Optional
+
+try:
+    import msgpack
+except ImportError:  # compact encoding is optional
+    msgpack = None
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+# Shared message schema for agent <-> UI data messages.
+#
+# Each message type lists its fields in wire order. In the compact encoding a
+# message is sent as a MessagePack array `[type, field1, field2, ...]` instead
+# of a keyed map. A field spec is either a name, `(name, FIELDS)` for a nested
+# record, or `(name, [FIELDS])` for a list of records.
+INGREDIENT_FIELDS = ("name", "quantity", "emoji")
+# New fields go at the end so older decoders still line up with the ones they know
+STEP_FIELDS = ("step_number", "instruction", "duration_minutes", "tips", "completed", "depends_on")
+PLAN_FIELDS = (
+    "id",
+    "title",
+    "servings",
+    "prep_time",
+    "cook_time",
+    ("ingredients", [INGREDIENT_FIELDS]),
+    ("steps", [STEP_FIELDS]),
+    "current_step_index",
+    "version",
+)
+TIMELINE_STEP_FIELDS = (
+    "recipe",
+    "step_number",
+    "instruction",
+    "start_minute",
+    "end_minute",
+    "hands_off",
+    "duration_minutes",
+    "tips",
+    "timer_started",
+)
+TIMELINE_FIELDS = (
+    "recipes",
+    ("steps", [TIMELINE_STEP_FIELDS]),
+    "total_minutes",
+    "sequential_minutes",
+)
+SHOPPING_ITEM_FIELDS = ("id", "name", "category", "emoji", "quantity", "estimated_price")
+
+MESSAGE_SCHEMAS = {
+    # agent -> UI
+    "timer": ("action", "minutes", "seconds", "label", "id"),
+    "shopping_list": ("action", ("items", [SHOPPING_ITEM_FIELDS])),
+    "recipe_plan_status": ("action",),
+    "recipe_plan": (("plan", PLAN_FIELDS),),
+    "recipe_plan_ref": ("id", "version", "current_step_index", "completed_steps"),
+    "meal_timeline": (("timeline", TIMELINE_FIELDS),),
+    "cooking_mode": ("action",),
+    "step_update": ("step_index",),
+    "hello_ack": ("encoding",),
+    # UI -> agent
+    "hello": ("encodings", "plans"),
+    "plan_missing": ("id",),
+    "ui_step_change": ("action", "step_index"),
+    "timer_cancel": ("id",),
+    "request_recipe": ("title", "book"),
+}
+
+# The UI decodes with a copy of these schemas: regenerate it after changing them
+TS_SCHEMA_COMMAND = "python agent/codec.py > frontend/lib/messageSchemas.ts"
+
+# Always sent as JSON so a client can read them before switching encodings
+_HANDSHAKE_TYPES = {"hello", "hello_ack"}
+
+
+def available_encodings() -> list[str]:
+    """Encodings this agent can speak, most compact first."""
+    if msgpack is not None:
+        return [ENCODING_MSGPACK, ENCODING_JSON]
+    return [ENCODING_JSON]
+
+
+def negotiate(offered: Optional[list]) -> str:
+    """Pick the most compact encoding both sides support, falling back to JSON."""
+    offered = offered or []
+    for encoding in available_encodings():
+        if encoding in offered:
+            return encoding
+    return ENCODING_JSON
+
+
+def _pack(value, fields):
+    if value is None:
+        return None
+    out = []
+    for spec in fields:
+        if isinstance(spec, str):
+            out.append(value.get(spec))
+            continue
+        name, nested = spec
+        child = value.get(name)
+        if isinstance(nested, list):
+            out.append([_pack(v, nested[0]) for v in child] if child is not None else None)
+        else:
+            out.append(_pack(child, nested))
+    return out
+
+
+def _unpack(values, fields):
+    if values is None:
+        return None
+    out = {}
+    for spec, value in zip(fields, values):
+        if isinstance(spec, str):
+            out[spec] = value
+            continue
+        name, nested = spec
+        if isinstance(nested, list):
+            out[name] = [_unpack(v, nested[0]) for v in value] if value is not None else None
+        else:
+            out[name] = _unpack(value, nested)
+    return out
+
+
+def encode(message: dict, encoding: str = ENCODING_JSON) -> bytes:
+    """
+    Serialize a data message for the wire.
+
+    Args:
+        message: Message dict with a "type" key
+        encoding: ENCODING_JSON or ENCODING_MSGPACK
+
+    Returns:
+        Encoded payload bytes
+    """
+    msg_type = message.get("type")
+    if encoding != ENCODING_MSGPACK or msgpack is None or msg_type in _HANDSHAKE_TYPES:
+        return json.dumps(message).encode('utf-8')
+
+    schema = MESSAGE_SCHEMAS.get(msg_type)
+    if schema is None:
+        return msgpack.packb(message, use_bin_type=True)
+    return msgpack.packb([msg_type] + _pack(message, schema), use_bin_type=True)
+
+
+def decode(payload) -> dict:
+    """
+    Parse an incoming data packet in either encoding.
+
+    JSON payloads always start with '{'; anything else is treated as MessagePack.
+    """
+    if isinstance(payload, str):
+        return json.loads(payload)
+
+    payload = bytes(payload)
+    if payload[:1] == b"{" or msgpack is None:
+        return json.loads(payload.decode('utf-8'))
+
+    data = msgpack.unpackb(payload, raw=False)
+    if isinstance(data, list) and data and isinstance(data[0], str):
+        msg_type = data[0]
+        schema = MESSAGE_SCHEMAS.get(msg_type, ())
+        message = _unpack(data[1:], schema)
+        message["type"] = msg_type
+        return message
+    if not isinstance(data, dict):
+        raise ValueError("Unrecognized data message")
+    return data
+
+
+def _ts_fields(fields) -> list:
+    out = []
+    for spec in fields:
+        if isinstance(spec, str):
+            out.append(spec)
+            continue
+        name, nested = spec
+        if isinstance(nested, list):
+            out.append({"name": name, "items": _ts_fields(nested[0])})
+        else:
+            out.append({"name": name, "fields": _ts_fields(nested)})
+    return out
+
+
+def typescript_schemas() -> str:
+    """MESSAGE_SCHEMAS as a TypeScript module for the UI's decoder (frontend/lib/codec.ts)."""
+    schemas = {msg_type: _ts_fields(fields) for msg_type, fields in MESSAGE_SCHEMAS.items()}
+    return (
+        f"// Generated from agent/codec.py MESSAGE_SCHEMAS by `{TS_SCHEMA_COMMAND}`. Do not edit.\n\n"
+        "export type FieldSpec = string | { name: string; fields: FieldSpec[] } | { name: string; items: FieldSpec[] }\n\n"
+        f"export const MESSAGE_SCHEMAS: Record<string, FieldSpec[]> = {json.dumps(schemas, indent=4)}\n"
+    )
+
+
+if __name__ == "__main__":
+    print(typescript_schemas(), end="")
@@ -0,0 +1,122 @@
+import asyncio
+import inspect
+import time
+from typing import Callable, Optional
+
+import codec
+import watchdog
+
+DEFAULT_MAX_TASKS = 4
+
+
+class _RateLimiter:
+    """Token bucket: `rate` messages per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+class _Route:
+    __slots__ = ("handler", "limiter", "is_async")
+
+    def __init__(self, handler: Callable, limiter: Optional[_RateLimiter]):
+        self.handler = handler
+        self.limiter = limiter
+        self.is_async = inspect.iscoroutinefunction(handler)
+
+
+class DataDispatcher:
+    """
+    Routes inbound UI data messages to handlers registered per message type.
+
+    Each packet is decoded once. Sync handlers run inline; async handlers run
+    as tasks in a per-session group of at most `max_tasks`, and packets that
+    arrive while the group is full are dropped. A handler can also be given a
+    rate limit, beyond which its messages are dropped. `aclose` cancels any
+    work still running when the session ends.
+    """
+
+    def __init__(self, max_tasks: int = DEFAULT_MAX_TASKS):
+        self._routes: dict[str, _Route] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._max_tasks = max_tasks
+        self._closed = False
+
+    def on(self, msg_type: str, rate: Optional[float] = None, burst: int = 1):
+        """
+        Decorator registering a handler for one message type.
+
+        Args:
+            msg_type: Value of the message's "type" field
+            rate: Optional max messages per second for this type
+            burst: Messages allowed back-to-back before `rate` applies
+        """
+        def decorator(handler: Callable) -> Callable:
+            limiter = _RateLimiter(rate, burst) if rate else None
+            self._routes[msg_type] = _Route(handler, limiter)
+            return handler
+        return decorator
+
+    def handle_packet(self, packet, *args) -> None:
+        """`data_received` callback for the room."""
+        if self._closed:
+            return
+        try:
+            payload = packet.data if hasattr(packet, 'data') else packet
+            data = codec.decode(payload)
+        except Exception as e:
+            print(f"Dropping undecodable data message: {e}")
+            return
+
+        msg_type = data.get("type")
+        route = self._routes.get(msg_type)
+        if route is None:
+            return
+        if route.limiter and not route.limiter.allow():
+            print(f"Rate limit hit for '{msg_type}' message, dropping")
+            return
+
+        if not route.is_async:
+            try:
+                with watchdog.activity(f"data:{msg_type}"):
+                    route.handler(data)
+            except Exception as e:
+                print(f"Error handling '{msg_type}' message: {e}")
+            return
+
+        if len(self._tasks) >= self._max_tasks:
+            print(f"Too much background work in progress, dropping '{msg_type}' message")
+            return
+        task = asyncio.create_task(self._run(msg_type, route.handler, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, msg_type: str, handler: Callable, data: dict) -> None:
+        try:
+            with watchdog.activity(f"data:{msg_type}"):
+                await handler(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error handling '{msg_type}' message: {e}")
+
+    async def aclose(self) -> None:
+        """Stop accepting messages and cancel in-flight handlers."""
+        self._closed = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,188 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, TypeVar
+
+from metrics import counter
+
+try:
+    import httpx  # google-genai's transport; its network errors don't subclass the builtins
+except ImportError:
+    httpx = None
+
+T = TypeVar("T")
+
+EMBED_RPM = float(os.getenv("GEMINI_EMBED_RPM", "1500"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("GEMINI_EMBED_MAX_CONCURRENCY", "8"))
+EMBED_MAX_RETRIES = int(os.getenv("GEMINI_EMBED_MAX_RETRIES", "6"))
+# Share of the RPM given to an ingestion worker process; the rest stays with the
+# agent process, which keeps embedding live queries while the worker builds
+EMBED_INGEST_SHARE = float(os.getenv("GEMINI_EMBED_INGEST_SHARE", "0.7"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Transient network failures: timeouts, dropped connections, a peer hanging up mid-response
+RETRYABLE_ERRORS: tuple = (ConnectionError, TimeoutError)
+if httpx is not None:
+    RETRYABLE_ERRORS += (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+EMBED_RETRIES = counter("souschef_embed_retries_total", "Embedding requests retried, by reason")
+EMBED_FAILURES = counter("souschef_embed_failures_total", "Embedding requests that failed for good")
+
+
+class EmbeddingError(RuntimeError):
+    """Raised when texts can't be embedded, so nothing half-embedded reaches the index."""
+
+
+def _status_code(e: Exception) -> Optional[int]:
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, RETRYABLE_ERRORS):
+        return True
+    return _status_code(e) in RETRYABLE_STATUS
+
+
+class TokenBucket:
+    """
+    Request-rate limiter sized to the API quota. Priority callers (user
+    queries) never wait; they borrow tokens and bulk ingestion pays them back.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, priority: bool = False) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1 or priority:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by about one slot per window of successful
+    requests and halves on every throttle response.
+    """
+
+    def __init__(self, initial: int, maximum: int):
+        self.maximum = maximum
+        self.limit = float(initial)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+    def release(self, throttled: bool = False) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class EmbedScheduler:
+    """
+    Runs embedding requests under the quota: token bucket for request rate,
+    adaptive concurrency, and exponential backoff with full jitter on 429/5xx.
+    Requests that still fail raise EmbeddingError.
+    """
+
+    def __init__(
+        self,
+        rpm: float = EMBED_RPM,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self.bucket = TokenBucket(rpm / 60.0, capacity=max(1.0, rpm / 60.0))
+        self.concurrency = AdaptiveConcurrency(initial=max(1, max_concurrency // 2), maximum=max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def call(self, fn: Callable[[], T], priority: bool = False, max_retries: Optional[int] = None) -> T:
+        """
+        Run one request with rate limiting and retries.
+
+        Args:
+            fn: Zero-argument callable making the request
+            priority: Interactive request; skips waiting for rate tokens
+            max_retries: Override the retry budget (e.g. fewer for live queries)
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            self.bucket.acquire(priority=priority)
+            self.concurrency.acquire()
+            throttled = False
+            try:
+                return fn()
+            except Exception as e:
+                throttled = _status_code(e) == 429
+                if not is_retryable(e) or attempt >= retries:
+                    EMBED_FAILURES.inc(reason=str(_status_code(e) or type(e).__name__))
+                    raise EmbeddingError(f"Embedding request failed after {attempt + 1} attempt(s): {e}") from e
+                EMBED_RETRIES.inc(reason=str(_status_code(e) or type(e).__name__))
+            finally:
+                self.concurrency.release(throttled=throttled)
+
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+            attempt += 1
+            time.sleep(delay)
+
+    def map(self, fn: Callable[[T], list], items: List[T]) -> list:
+        """
+        Run `fn` over `items` concurrently (bounded by the adaptive limit) and
+        return the results in order. Any item that can't be processed raises.
+        """
+        if len(items) == 1:
+            return [self.call(lambda: fn(items[0]))]
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed")
+        try:
+            futures = [pool.submit(self.call, (lambda item=item: fn(item))) for item in items]
+            return [f.result() for f in futures]
+        except BaseException:
+            # One batch failed for good; don't keep spending quota on the rest
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            pool.shutdown(wait=True)
+
+
+_scheduler: Optional[EmbedScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_embed_scheduler() -> EmbedScheduler:
+    """
+    Process-wide scheduler, shared by every index build and query in this
+    process. It is sized to GEMINI_EMBED_RPM, which the agent lowers to
+    EMBED_INGEST_SHARE of the quota for the ingestion worker it starts,
+    leaving the rest for the agent's live queries during a build.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = EmbedScheduler()
+        return _scheduler
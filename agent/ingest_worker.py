@@ -0,0 +1,63 @@
+"""
+Out-of-process cookbook ingestion.
+
+Parses, chunks and embeds the given files from a data directory, saving one
+NumpyVectorStore shard per file under an output directory for the agent to
+map. Running this in its own process keeps PDF parsing and chunking off the
+agent's GIL, so indexing a large cookbook doesn't add jitter to audio in
+live sessions.
+
+Prints a JSON report as its last line: {"built": {file: {"dir", "build_s"}},
+"failed": {file: error}}.
+
+Usage:
+    python ingest_worker.py --data-dir data --out-dir .index/shards --files book.pdf notes/card.txt
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build cookbook index shards out of process")
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--out-dir", required=True)
+    parser.add_argument("--files", nargs="+", required=True, help="Paths relative to --data-dir")
+    args = parser.parse_args()
+
+    # Background work: yield the CPU to live sessions on the same machine
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    from rag import build_vector_store, file_fingerprint, load_document, make_embed_model, save_shard
+
+    embed_model = make_embed_model(os.getenv("SOUSCHEF_INGEST_API_KEY"))
+    data_dir, out_dir = Path(args.data_dir), Path(args.out_dir)
+    built, failed = {}, {}
+    for key in args.files:
+        path = data_dir / key
+        try:
+            start = time.perf_counter()
+            documents = load_document(path)
+            if not documents:
+                failed[key] = "no text found"
+                continue
+            store = build_vector_store(documents, embed_model, document=key)
+            build_s = round(time.perf_counter() - start, 3)
+            shard_dir = save_shard(
+                store, out_dir, key, file_fingerprint(path), documents=len(documents), build_s=build_s,
+            )
+            built[key] = {"dir": shard_dir.name, "build_s": build_s}
+        except Exception as e:
+            failed[key] = str(e)
+
+    print(json.dumps({"built": built, "failed": failed}))
+    return 0 if built or not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
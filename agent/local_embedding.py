@@ -0,0 +1,136 @@
+import re
+import zlib
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+
+import tracing
+from metrics import CHUNKS_EMBEDDED, EMBED_LATENCY
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedding(BaseEmbedding):
+    """
+    Local, network-free embedding using the hashing trick.
+
+    Each word and word bigram is hashed (crc32, stable across processes) into
+    one of `dim` signed buckets; counts are log-scaled and L2-normalized.
+    Batches are encoded with a single NumPy scatter, so a query takes
+    microseconds and needs no API key.
+    """
+
+    _dim: int = 1024
+    _backend: str = "local"
+
+    def __init__(self, dim: int = 1024, **kwargs):
+        kwargs.setdefault("embed_batch_size", 256)
+        super().__init__(model_name=f"local-hashing-{dim}", **kwargs)
+        self._dim = dim
+
+    def _features(self, text: str) -> List[int]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(g.encode()) for g in grams]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into an (n, dim) float32 matrix."""
+        rows, hashes = [], []
+        for i, text in enumerate(texts):
+            feats = self._features(text)
+            rows.extend([i] * len(feats))
+            hashes.extend(feats)
+
+        matrix = np.zeros((len(texts), self._dim), dtype=np.float32)
+        if hashes:
+            h = np.asarray(hashes, dtype=np.uint32)
+            signs = np.where(h & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix, (np.asarray(rows), h % self._dim), signs)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        with EMBED_LATENCY.time(backend=self._backend, task="query"), \
+                tracing.span("embed.local", backend=self._backend, task="query"):
+            return self.encode([query])[0].tolist()
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        CHUNKS_EMBEDDED.inc(len(texts), backend=self._backend)
+        with EMBED_LATENCY.time(backend=self._backend, task="document"), \
+                tracing.span("embed.local", backend=self._backend, task="document", texts=len(texts)):
+            return self.encode(texts).tolist()
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
+
+
+class OnnxEmbedding(BaseEmbedding):
+    """
+    Local sentence-embedding model run with onnxruntime on CPU.
+
+    Expects a directory containing `model.onnx` and a HuggingFace
+    `tokenizer.json` (e.g. an exported all-MiniLM-L6-v2). Token embeddings are
+    mean-pooled over the attention mask and L2-normalized.
+    """
+
+    _session = None
+    _tokenizer = None
+    _backend: str = "onnx"
+
+    def __init__(self, model_dir: str, max_length: int = 256, **kwargs):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        kwargs.setdefault("embed_batch_size", 64)
+        model_dir = Path(model_dir)
+        super().__init__(model_name=f"onnx-{model_dir.name}", **kwargs)
+        self._session = ort.InferenceSession(str(model_dir / "model.onnx"), providers=["CPUExecutionProvider"])
+        self._tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into an (n, dim) float32 matrix."""
+        encoded = self._tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if any(i.name == "token_type_ids" for i in self._session.get_inputs()):
+            feeds["token_type_ids"] = np.zeros_like(ids)
+
+        tokens = self._session.run(None, feeds)[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (tokens * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (pooled / norms).astype(np.float32)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        with EMBED_LATENCY.time(backend=self._backend, task="query"), \
+                tracing.span("embed.local", backend=self._backend, task="query"):
+            return self.encode([query])[0].tolist()
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        CHUNKS_EMBEDDED.inc(len(texts), backend=self._backend)
+        with EMBED_LATENCY.time(backend=self._backend, task="document"), \
+                tracing.span("embed.local", backend=self._backend, task="document", texts=len(texts)):
+            return self.encode(texts).tolist()
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
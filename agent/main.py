@@ -1,6 +1,7 @@
 import json
 import os
 import asyncio
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 from livekit import agents, rtc
@@ -12,6 +13,16 @@ env_file = Path(__file__).parent / ".env.local"
 load_dotenv(env_file)
 
 from rag import get_rag, reload_rag, clear_rag, CookbookRAG
+from meal_scheduler import MealTimeline
+from recipe_parser import RecipePlan
+from state_store import SessionStateStore, get_state_store, state_key
+from publisher import DataPublisher
+from dispatcher import DataDispatcher
+from speculative import SpeculativeRetriever
+import codec
+import metrics
+import tracing
+import watchdog
 from tools.cookbook import CookbookMixin
 from tools.timer import TimerMixin
 from tools.shopping import ShoppingListMixin
@@ -40,6 +51,7 @@ Your tools:
 1. search_cookbook - Search the user's uploaded cookbook/PDF for recipes and info
    - Use when the user asks about their cookbook or references their uploaded PDF
    - Use proactively when a cookbook is uploaded AND the user asks for specific recipes
+   - If the user names a specific book or file ("my grandma's recipe card"), pass it as book
    - DON'T use for general cooking questions you can answer from knowledge (like "how to boil water")
    - If no cookbook is uploaded, just use your general knowledge
 
@@ -59,10 +71,12 @@ Your tools:
 6. clear_shopping_list - Clear the entire shopping list
     
 7. reload_cookbook - Reload after user uploads a new PDF (called automatically)
+   remove_cookbook_document - Remove one uploaded book or file, keeping the rest
 
 8. generate_recipe_plan - Create a step-by-step plan for a specific recipe
    - Use when user wants to cook something specific from the cookbook
    - e.g. "I want to make the lasagna from my book"
+   - Pass book when the user says which book or file the recipe is from
 
 9. start_cooking_mode - Start the interactive cooking session
    - Use ONLY when user confirms they are ready to start cooking the generated plan
@@ -78,6 +92,11 @@ Your tools:
     - Use when user says "go to step 3", "skip to step 5", "let's move to the next step"
     - For "next step" calculate: current step + 1
 
+13. plan_meal - Plan several cookbook recipes cooked together as one meal
+    - Use when the user wants to make more than one dish at once, e.g. "roast chicken with rice and green beans"
+    - Interleaves the steps so everything finishes together; cooking mode then walks the merged steps
+    - Timers for baking, simmering and resting steps start automatically, so don't set them again
+
 Guidelines:
 - Keep responses concise and conversational since this is voice
 - Don't use complex formatting, lists, or bullet points in speech
@@ -109,6 +128,65 @@ class SousChefAgent(Agent, CookbookMixin, TimerMixin, ShoppingListMixin, Cooking
              self.rag = get_rag()
         self._session = session
         self._room = room
+        # All UI messages go through one queue per session
+        self._publisher = DataPublisher(room) if room else None
+        # Plan id -> version the UI holds, so known plans go out as id plus step state
+        self._ui_plans: dict[str, str] = {}
+        # Set once we know who the user is (see souschef_session)
+        self._state_store: SessionStateStore | None = None
+        self._state_key: str | None = None
+        # Current voice turn, for tracing
+        self._turn_trace_id: str | None = None
+        self._turn_started_at: float | None = None
+
+    def _checkpoint(self) -> None:
+        """Queue a save of the cooking state; cheap enough to call after every change."""
+        if self._state_store and self._state_key:
+            self._state_store.checkpoint(self._state_key, self.export_state)
+
+    def export_state(self) -> dict:
+        return {
+            "recipe": self.current_recipe.to_dict() if self.current_recipe else None,
+            "cooking_mode_active": self.cooking_mode_active,
+            "shopping_list": getattr(self, '_shopping_list', []),
+            "timers": [{k: v for k, v in t.items() if k != "remaining_seconds"} for t in self.active_timers()],
+            "meal_timeline": self.meal_timeline.to_dict() if self.meal_timeline else None,
+        }
+
+    async def restore_state(self, state: dict) -> None:
+        """Rehydrate a saved session and push it to the UI. No model calls."""
+        if state.get("recipe"):
+            self.current_recipe = RecipePlan.from_dict(state["recipe"])
+        if state.get("meal_timeline") and self.current_recipe:
+            self.meal_timeline = MealTimeline.from_dict(state["meal_timeline"])
+        self.cooking_mode_active = bool(state.get("cooking_mode_active")) and self.current_recipe is not None
+        self._shopping_list = state.get("shopping_list") or []
+        self._timers = state.get("timers") or []
+        active_timers = self.active_timers()
+        self._timers = [{k: v for k, v in t.items() if k != "remaining_seconds"} for t in active_timers]
+        for timer in active_timers:
+            self._schedule_expiry(timer["id"], timer["remaining_seconds"])
+
+        if not self._publisher:
+            return
+        if self.current_recipe:
+            await self._publish_plan(self.current_recipe)
+            if self.meal_timeline:
+                await self._publisher.publish({"type": "meal_timeline", "timeline": self.meal_timeline.to_dict()})
+            if self.cooking_mode_active:
+                await self._publisher.publish({"type": "cooking_mode", "action": "start"})
+                await self._publisher.publish({"type": "step_update", "step_index": self.current_recipe.current_step_index})
+        if self._shopping_list:
+            await self._publisher.publish({"type": "shopping_list", "action": "update", "items": list(self._shopping_list)})
+        for timer in active_timers:
+            await self._publisher.publish({
+                "type": "timer",
+                "action": "start",
+                "minutes": max(1, timer["remaining_seconds"] // 60),
+                "seconds": timer["remaining_seconds"],
+                "label": timer["label"],
+                "id": timer["id"],
+            })
 
 
 server = AgentServer()
@@ -117,6 +195,8 @@ server = AgentServer()
 @server.rtc_session() # makes sure runs after !
 async def souschef_session(ctx: agents.JobContext):
     """Main entry point for the SousChef voice agent session."""
+    metrics.start_exporters()
+    watchdog.start()
 
     voice_preference = DEFAULT_VOICE    
     room_name = ctx.room.name
@@ -131,11 +211,15 @@ async def souschef_session(ctx: agents.JobContext):
                 print(f"Voice from room name: {voice_preference}")
     
     api_key = None
+    data_encoding = codec.ENCODING_JSON
+    ui_plans = None
     if ctx.room.metadata:
         try:
             metadata = json.loads(ctx.room.metadata)
             voice_preference = metadata.get("voice", voice_preference)
             api_key = metadata.get("apiKey")
+            data_encoding = codec.negotiate(metadata.get("encodings"))
+            ui_plans = metadata.get("plans")
             if api_key:
                 print("Received custom API key from client")
         except (json.JSONDecodeError, Exception) as e:
@@ -170,6 +254,26 @@ async def souschef_session(ctx: agents.JobContext):
     
     # agent with session and room reference now for data publishing
     agent = SousChefAgent(session=session, room=ctx.room, api_key=api_key)
+    agent._publisher.encoding = data_encoding
+    # Plans the browser has cached; a resumed plan is then sent by id
+    agent.remember_ui_plans(ui_plans)
+    ctx.add_shutdown_callback(agent._publisher.aclose)
+
+    # Start likely cookbook retrievals while the user is still talking
+    speculator = SpeculativeRetriever(agent.rag)
+    ctx.add_shutdown_callback(speculator.aclose)
+
+    # Each finished user utterance starts a new trace; tool spans join it
+    @session.on("user_input_transcribed")
+    @watchdog.watched("event:user_input_transcribed")
+    def on_user_input(ev):
+        speculator.on_transcript(ev.transcript, ev.is_final)
+        if not ev.is_final:
+            return
+        agent._turn_trace_id = tracing.new_trace_id()
+        agent._turn_started_at = time.perf_counter()
+        tracing.event("turn.user_input", trace_id=agent._turn_trace_id, transcript_chars=len(ev.transcript))
+
     # session before registering RPC !
     await session.start(
         room=ctx.room,
@@ -185,45 +289,54 @@ async def souschef_session(ctx: agents.JobContext):
         ),
     )
     
-    # Handle UI step navigation clicks to sync agent state
-    def handle_data_received(payload: bytes, participant: rtc.Participant | None = None, kind: rtc.DataPacketKind | None = None, topic: str | None = None):
-        try:
-            payload_data = payload.data if hasattr(payload, 'data') else payload
-            if isinstance(payload_data, bytes):
-                data = json.loads(payload_data.decode('utf-8'))
-            else:
-                data = json.loads(str(payload_data))
-            if data.get("type") == "ui_step_change":
-                action = data.get("action")
-                step_index = data.get("step_index")
-                
-                # Update agent's internal state to match UI
-                if agent.current_recipe and agent.cooking_mode_active:
-                    if action == "next" and step_index < len(agent.current_recipe.steps):
-                        # Mark current step as completed
-                        current_idx = agent.current_recipe.current_step_index
-                        if current_idx < len(agent.current_recipe.steps):
-                            agent.current_recipe.steps[current_idx].completed = True
-                        agent.current_recipe.current_step_index = step_index
-                        print(f"UI navigated to step {step_index + 1}")
-                    elif action == "previous" and step_index >= 0:
-                        agent.current_recipe.current_step_index = step_index
-                        print(f"UI navigated back to step {step_index + 1}")
-            
-            if data.get("type") == "request_recipe":
-                recipe_title = data.get("title")
-                if recipe_title:
-                    print(f"UI requested recipe: {recipe_title}")
-                    import asyncio
-                    asyncio.create_task(agent.generate_recipe_plan(None, recipe_title))
+    # Inbound UI messages: one decode per packet, bounded background work
+    dispatcher = DataDispatcher()
+
+    @dispatcher.on("hello", rate=1, burst=3)
+    async def handle_hello(data: dict):
+        # UI announces which encodings it can decode
+        encoding = codec.negotiate(data.get("encodings"))
+        agent._publisher.encoding = encoding
+        # Plans the UI has cached are sent to it by id from now on
+        agent.remember_ui_plans(data.get("plans"))
+        print(f"Data channel encoding: {encoding}")
+        await agent._publisher.publish({"type": "hello_ack", "encoding": encoding})
 
-        except (json.JSONDecodeError, Exception) as e:
-            print(f"Error handling UI step change: {e}")
-    
-    ctx.room.on("data_received", handle_data_received)
+    # Handle UI step navigation clicks to sync agent state
+    @dispatcher.on("ui_step_change", rate=20, burst=10)
+    async def handle_ui_step_change(data: dict):
+        step_index = data.get("step_index")
+        if isinstance(step_index, int):
+            await agent.ui_step_change(data.get("action"), step_index)
+
+    # The user dismissed a timer in the UI
+    @dispatcher.on("timer_cancel", rate=5, burst=10)
+    def handle_timer_cancel(data: dict):
+        timer_id = data.get("id")
+        if isinstance(timer_id, str):
+            agent.remove_timer(timer_id)
+
+    # The UI was sent a plan by id that isn't in its cache
+    @dispatcher.on("plan_missing", rate=1, burst=3)
+    async def handle_plan_missing(data: dict):
+        plan_id = data.get("id")
+        if isinstance(plan_id, str):
+            await agent.resend_plan(plan_id)
+
+    # Each request is a retrieval plus a Gemini parse, so keep these rare
+    @dispatcher.on("request_recipe", rate=0.2, burst=2)
+    async def handle_request_recipe(data: dict):
+        recipe_title = data.get("title")
+        if recipe_title:
+            print(f"UI requested recipe: {recipe_title}")
+            await agent.generate_recipe_plan(None, recipe_title, data.get("book") or "")
+
+    ctx.room.on("data_received", dispatcher.handle_packet)
+    ctx.add_shutdown_callback(dispatcher.aclose)
     
     # Register RPC handler for cookbook reload (AFTER)
     @ctx.room.local_participant.register_rpc_method("reload_cookbook")
+    @watchdog.watched("rpc:reload_cookbook")
     async def handle_reload_cookbook(data: rtc.RpcInvocationData) -> str:
         """Handle RPC call from frontend to reload cookbook."""
         print("Received reload_cookbook RPC call")
@@ -251,7 +364,14 @@ async def souschef_session(ctx: agents.JobContext):
         asyncio.create_task(process_reload())
         return "Indexing started in background"
     
+    @ctx.room.local_participant.register_rpc_method("get_index_stats")
+    @watchdog.watched("rpc:get_index_stats")
+    async def handle_get_index_stats(data: rtc.RpcInvocationData) -> str:
+        """Return cookbook index statistics as JSON (counts, bytes, build time, version)."""
+        return json.dumps(agent.rag.get_index_stats())
+
     @ctx.room.local_participant.register_rpc_method("clear_cookbook")
+    @watchdog.watched("rpc:clear_cookbook")
     async def handle_clear_cookbook(data: rtc.RpcInvocationData) -> str:
         """Handle RPC call from frontend to clear cookbook."""
         import asyncio
@@ -270,6 +390,7 @@ async def souschef_session(ctx: agents.JobContext):
         return message
     
     @ctx.room.local_participant.register_rpc_method("clear_cookbook_silent")
+    @watchdog.watched("rpc:clear_cookbook_silent")
     async def handle_clear_cookbook_silent(data: rtc.RpcInvocationData) -> str:
         """Silent clear on disconnect - no voice response."""
         import asyncio
@@ -277,9 +398,37 @@ async def souschef_session(ctx: agents.JobContext):
         success, message = await asyncio.to_thread(agent.rag.clear_index)
         return message
 
-    await session.generate_reply(
-        instructions="Greet the user warmly as SousChef, their personal cooking assistant. Keep it brief and friendly, and ask what they'd like help with today."
-    )
+    # Resume any saved cooking state for this user (SQLite read, no model calls)
+    resumed = False
+    try:
+        participant = await ctx.wait_for_participant()
+        agent._state_key = state_key(participant.identity)
+        if agent._state_key is None:
+            print(f"Participant '{participant.identity}' has no per-browser id, not saving session state")
+        else:
+            agent._state_store = get_state_store()
+            ctx.add_shutdown_callback(agent._state_store.flush)
+        saved = agent._state_store.load(agent._state_key) if agent._state_store else None
+        if saved and (saved.get("recipe") or saved.get("shopping_list") or saved.get("timers")):
+            await agent.restore_state(saved)
+            resumed = True
+            print(f"Resumed saved session for {agent._state_key}")
+    except Exception as e:
+        print(f"Could not restore session state: {e}")
+
+    if resumed and agent.cooking_mode_active:
+        step = agent.current_recipe.current_step_index + 1
+        await session.generate_reply(
+            instructions=f"The user just reconnected in the middle of cooking {agent.current_recipe.name}. Welcome them back briefly and remind them they're on step {step}."
+        )
+    elif resumed and agent.current_recipe and not all(s.completed for s in agent.current_recipe.steps):
+        await session.generate_reply(
+            instructions=f"The user just reconnected. Welcome them back briefly and mention their {agent.current_recipe.name} plan is still ready whenever they want to start cooking."
+        )
+    else:
+        await session.generate_reply(
+            instructions="Greet the user warmly as SousChef, their personal cooking assistant. Keep it brief and friendly, and ask what they'd like help with today."
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,219 @@
+"""
+Merge several recipes into one meal timeline.
+
+Each recipe is a chain of steps, or a small DAG when steps list what they
+depend on. Hands-on steps need the cook, so only one runs at a time;
+hands-off steps (baking, simmering, resting) run alongside whatever the
+cook does next. Steps are list-scheduled by critical path: whenever the
+cook is free, the ready step with the longest chain of work behind it goes
+first, which keeps the total close to the longest single recipe.
+
+The schedule is built backwards from serving time and then mirrored, so
+every dish finishes as late as possible - together, instead of the first
+one going cold while the last one cooks.
+"""
+import re
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+from recipe_parser import Ingredient, RecipePlan, RecipeStep
+
+# Assumed length of a step the parser gave no duration
+DEFAULT_STEP_MINUTES = 3
+# Shorter steps are treated as hands-on even if they say "rest" or "bake"
+MIN_HANDS_OFF_MINUTES = 5
+
+_HANDS_OFF_RE = re.compile(
+    r"\b(?:bake|baking|roast|roasting|simmer|simmering|braise|rest|chill|refrigerate|marinate|"
+    r"rise|proof|soak|steep|cool|slow[- ]cook|pressure[- ]cook|in the oven|"
+    r"let (?:it |them |the \w+ )?(?:sit|stand|rest|cool))\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class TimelineStep:
+    recipe: str
+    step_number: int
+    instruction: str
+    start_minute: int
+    end_minute: int
+    hands_off: bool
+    duration_minutes: Optional[int] = None
+    tips: Optional[str] = None
+    timer_started: bool = False
+
+
+@dataclass
+class MealTimeline:
+    recipes: List[str]
+    # Ordered by start time; index i is step i of the merged cooking plan
+    steps: List[TimelineStep] = field(default_factory=list)
+    total_minutes: int = 0
+    sequential_minutes: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MealTimeline":
+        return cls(
+            recipes=list(data.get("recipes", [])),
+            steps=[TimelineStep(**s) for s in data.get("steps", [])],
+            total_minutes=data.get("total_minutes", 0),
+            sequential_minutes=data.get("sequential_minutes", 0),
+        )
+
+    def to_recipe_plan(self, plans: List[RecipePlan]) -> RecipePlan:
+        """One plan whose steps follow the timeline, so cooking mode can walk it as usual."""
+        steps = []
+        for i, s in enumerate(self.steps):
+            tips = [f"Starts at minute {s.start_minute}."]
+            if s.hands_off:
+                tips.append("This one looks after itself, so move on to the next step while it cooks.")
+            if s.tips:
+                tips.append(s.tips)
+            steps.append(RecipeStep(
+                step_number=i + 1,
+                instruction=f"{s.recipe}: {s.instruction}",
+                duration_minutes=s.duration_minutes,
+                tips=" ".join(tips),
+            ))
+        return RecipePlan(
+            name=" + ".join(self.recipes),
+            servings=", ".join(dict.fromkeys(p.servings for p in plans if p.servings)),
+            prep_time="Interleaved",
+            cook_time=f"{self.total_minutes} mins",
+            ingredients=[
+                Ingredient(name=i.name, quantity=i.quantity, emoji=i.emoji)
+                for p in plans for i in p.ingredients
+            ],
+            steps=steps,
+        )
+
+
+def step_minutes(step: RecipeStep) -> int:
+    return step.duration_minutes if step.duration_minutes and step.duration_minutes > 0 else DEFAULT_STEP_MINUTES
+
+
+def is_hands_off(step: RecipeStep) -> bool:
+    """True for timed steps the cook can walk away from (bake, simmer, rest...)."""
+    return (step.duration_minutes or 0) >= MIN_HANDS_OFF_MINUTES and bool(_HANDS_OFF_RE.search(step.instruction))
+
+
+def _step_predecessors(plan: RecipePlan) -> List[List[int]]:
+    """
+    Indices of the steps each step waits for. Steps without `depends_on`
+    follow the previous step; references to later or unknown steps are
+    ignored so the graph stays acyclic.
+    """
+    index_of = {s.step_number: i for i, s in enumerate(plan.steps)}
+    preds = []
+    for i, step in enumerate(plan.steps):
+        if step.depends_on is None:
+            preds.append([i - 1] if i else [])
+        else:
+            preds.append(sorted({index_of[n] for n in step.depends_on if index_of.get(n, i) < i}))
+    return preds
+
+
+def _list_schedule(durations: List[int], hands_on: List[bool], preds: List[List[int]]) -> List[int]:
+    """
+    Start times for a DAG of tasks where hands-on tasks share a single cook
+    and hands-off tasks start as soon as their predecessors finish.
+    """
+    n = len(durations)
+    succs = [[] for _ in range(n)]
+    waiting = [len(p) for p in preds]
+    for t, ps in enumerate(preds):
+        for p in ps:
+            succs[p].append(t)
+
+    # Critical path: the longest chain of work from each task to the end
+    order, indegree = [], list(waiting)
+    stack = [t for t in range(n) if not indegree[t]]
+    while stack:
+        t = stack.pop()
+        order.append(t)
+        for s in succs[t]:
+            indegree[s] -= 1
+            if not indegree[s]:
+                stack.append(s)
+    tail = [0] * n
+    for t in reversed(order):
+        tail[t] = durations[t] + max((tail[s] for s in succs[t]), default=0)
+
+    start: List[Optional[int]] = [None] * n
+    ready_at = [0] * n
+    ready = [t for t in range(n) if not waiting[t]]
+    cook_free = 0
+    while ready:
+        hands_off = [t for t in ready if not hands_on[t]]
+        if hands_off:
+            t = hands_off[0]
+            start[t] = ready_at[t]
+        else:
+            now = max(cook_free, min(ready_at[t] for t in ready))
+            t = max((t for t in ready if ready_at[t] <= now), key=lambda t: (tail[t], -t))
+            start[t] = now
+            cook_free = now + durations[t]
+        ready.remove(t)
+        end = start[t] + durations[t]
+        for s in succs[t]:
+            ready_at[s] = max(ready_at[s], end)
+            waiting[s] -= 1
+            if not waiting[s]:
+                ready.append(s)
+    return start
+
+
+def schedule_meal(plans: List[RecipePlan]) -> MealTimeline:
+    """
+    Interleave the steps of several recipes so the meal takes as little
+    wall-clock time as possible and all dishes finish together.
+
+    Args:
+        plans: The recipes in the meal (main and sides, in any order)
+
+    Returns:
+        A MealTimeline with every step's start and end minute
+    """
+    tasks: List[tuple] = []  # (plan, step)
+    preds: List[List[int]] = []
+    for plan in plans:
+        offset = len(tasks)
+        preds.extend([[offset + p for p in ps] for ps in _step_predecessors(plan)])
+        tasks.extend((plan, step) for step in plan.steps)
+
+    durations = [step_minutes(step) for _, step in tasks]
+    hands_on = [not is_hands_off(step) for _, step in tasks]
+
+    # Schedule the reversed graph from serving time, then mirror it
+    reversed_preds = [[] for _ in tasks]
+    for t, ps in enumerate(preds):
+        for p in ps:
+            reversed_preds[p].append(t)
+    reversed_start = _list_schedule(durations, hands_on, reversed_preds)
+    total = max((s + d for s, d in zip(reversed_start, durations)), default=0)
+
+    steps = []
+    for t, (plan, step) in enumerate(tasks):
+        end = total - reversed_start[t]
+        steps.append(TimelineStep(
+            recipe=plan.name,
+            step_number=step.step_number,
+            instruction=step.instruction,
+            start_minute=end - durations[t],
+            end_minute=end,
+            hands_off=not hands_on[t],
+            duration_minutes=step.duration_minutes,
+            tips=step.tips,
+        ))
+    # Ties keep recipe order, and a recipe's own steps stay in sequence
+    order = sorted(range(len(steps)), key=lambda t: (steps[t].start_minute, steps[t].end_minute, t))
+    return MealTimeline(
+        recipes=[p.name for p in plans],
+        steps=[steps[t] for t in order],
+        total_minutes=total,
+        sequential_minutes=sum(durations),
+    )
@@ -0,0 +1,256 @@
+"""
+Process-wide latency and throughput metrics.
+
+Histograms and counters are cheap to update from any thread. They can be
+exposed as a Prometheus text endpoint (METRICS_PORT) and/or printed as a
+periodic JSON log line (METRICS_LOG_INTERVAL seconds).
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import tracing
+
+# Seconds; covers sub-millisecond local work up to slow model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: Optional[tuple] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {_format_labels(key) or "total": value for key, value in self._values.items()}
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., +Inf count], sum
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[idx] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, counts: list[int], q: float) -> float:
+        total = sum(counts)
+        if not total:
+            return 0.0
+        target = q * total
+        running = 0
+        for i, c in enumerate(counts):
+            running += c
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, counts in self._counts.items():
+                running = 0
+                for bound, c in zip(self.buckets, counts):
+                    running += c
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', bound))} {running}")
+                running += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {running}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {self._sums[key]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {running}")
+        return lines
+
+    def snapshot(self) -> dict:
+        out = {}
+        with self._lock:
+            for key, counts in self._counts.items():
+                total = sum(counts)
+                out[_format_labels(key) or "all"] = {
+                    "count": total,
+                    "mean": round(self._sums[key] / total, 6) if total else 0.0,
+                    "p50_le": self._quantile(counts, 0.5),
+                    "p99_le": self._quantile(counts, 0.99),
+                }
+        return out
+
+
+_registry: dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, help: str) -> Counter:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, help)
+        return _registry[name]
+
+
+def histogram(name: str, help: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, help, buckets)
+        return _registry[name]
+
+
+def render_prometheus() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> dict:
+    with _registry_lock:
+        metrics = dict(_registry)
+    return {name: metric.snapshot() for name, metric in metrics.items()}
+
+
+# Metrics shared across modules
+TOOL_LATENCY = histogram("souschef_tool_seconds", "Latency of each function_tool call")
+EMBED_LATENCY = histogram("souschef_embed_request_seconds", "Latency of embedding requests")
+CHUNKS_EMBEDDED = counter("souschef_chunks_embedded_total", "Texts embedded for the index")
+GENAI_LATENCY = histogram("souschef_genai_request_seconds", "Latency of Gemini generation requests")
+RAG_QUERY_LATENCY = histogram("souschef_rag_query_seconds", "Latency of CookbookRAG.query")
+INDEX_BUILD_LATENCY = histogram("souschef_index_build_seconds", "Duration of cookbook index builds",
+                                buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+CACHE_REQUESTS = counter("souschef_cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+RECIPE_PARSE_PATH = counter("souschef_recipe_parse_total", "Recipe parses by the path that produced them (primary/hedge/rules/failed)")
+PUBLISH_LATENCY = histogram("souschef_publish_seconds", "Latency of data-channel publish_data calls")
+PUBLISH_QUEUE_WAIT = histogram("souschef_publish_queue_wait_seconds", "Time a UI message waited in the publish queue")
+
+
+def timed_tool(fn):
+    """
+    Record the latency of a function_tool call and trace it as a span in the
+    agent's current voice turn, and mark it running for the loop watchdog.
+    Apply under @function_tool().
+    """
+    import watchdog  # imports this module, so not at the top
+
+    @functools.wraps(fn)
+    async def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        attrs = {"tool": fn.__name__}
+        turn_started = getattr(self, '_turn_started_at', None)
+        if turn_started:
+            # Time the realtime model spent deciding to call this tool. Only the
+            # first call after user input gets it; later calls (including ones
+            # the UI triggers) would otherwise report time since an old turn.
+            attrs["since_user_input_ms"] = round((start - turn_started) * 1000, 1)
+            self._turn_started_at = None
+        try:
+            with tracing.span(f"tool.{fn.__name__}", trace_id=getattr(self, '_turn_trace_id', None), **attrs), \
+                    watchdog.activity(f"tool:{fn.__name__}"):
+                result = await fn(self, *args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            TOOL_LATENCY.observe(time.perf_counter() - start, tool=fn.__name__, status=status)
+    return wrapper
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporters_started = False
+
+
+def start_exporters() -> None:
+    """
+    Start the optional exporters configured by env vars. Safe to call more
+    than once; each process starts them at most once.
+
+    METRICS_PORT: serve Prometheus text format on 127.0.0.1:<port>/metrics
+    METRICS_LOG_INTERVAL: print a JSON metrics line every N seconds
+    """
+    global _exporters_started
+    if _exporters_started:
+        return
+    _exporters_started = True
+
+    port = os.getenv("METRICS_PORT")
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", int(port)), _Handler)
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"Metrics endpoint on http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            # Another job process on this worker already serves the port
+            print(f"Metrics endpoint not started: {e}")
+
+    interval = float(os.getenv("METRICS_LOG_INTERVAL", "0") or 0)
+    if interval > 0:
+        def log_loop():
+            while True:
+                time.sleep(interval)
+                print(json.dumps({"metrics": snapshot(), "pid": os.getpid(), "ts": time.time()}))
+
+        threading.Thread(target=log_loop, name="metrics-log", daemon=True).start()
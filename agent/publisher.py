@@ -0,0 +1,147 @@
+import asyncio
+import time
+from typing import Optional
+
+from codec import ENCODING_JSON, encode
+from metrics import PUBLISH_LATENCY, PUBLISH_QUEUE_WAIT
+
+# Message types whose payload is full state: a newer one makes any queued,
+# unsent one obsolete, so only the latest is ever put on the wire. The newer
+# one takes a fresh place at the back of the queue, so it can't overtake
+# anything that was published before it.
+COALESCE_TYPES = {"step_update", "shopping_list", "recipe_plan", "recipe_plan_ref", "recipe_plan_status"}
+# Types that replace each other: a plan sent by reference supersedes a queued full plan
+# of another plan. A reference to the queued plan itself only updates its step state
+# (see _merge), since the UI doesn't hold that plan until it has been sent.
+COALESCE_KEYS = {"recipe_plan_ref": "recipe_plan"}
+
+DEFAULT_MAX_PENDING = 64
+
+
+def _merge(queued: dict, message: dict) -> dict:
+    """The message that replaces `queued`: `message`, unless it refers to a full plan still in the queue."""
+    plan = queued.get("plan") if queued.get("type") == "recipe_plan" else None
+    if message.get("type") != "recipe_plan_ref" or not plan or plan.get("id") != message.get("id") \
+            or plan.get("version") != message.get("version"):
+        return message
+    completed = set(message.get("completed_steps") or [])
+    steps = [{**step, "completed": i in completed} for i, step in enumerate(plan.get("steps") or [])]
+    return {**queued, "plan": {**plan, "steps": steps, "current_step_index": message.get("current_step_index")}}
+
+
+class _Slot:
+    __slots__ = ("message", "key", "queued_at")
+
+    def __init__(self, message: dict, key: Optional[str]):
+        self.message = message
+        self.key = key
+        self.queued_at = time.perf_counter()
+
+
+class DataPublisher:
+    """
+    Per-session outbound queue for agent -> UI data messages.
+
+    Tools enqueue and return immediately; a single drain task does the actual
+    `publish_data` calls, in the order messages were published. Everything
+    goes on the reliable channel: each message is state the UI keeps, and the
+    UI runs timers itself, so there is no stream of ticks worth sending lossy.
+    A queued message is dropped when a newer one of the same coalescing type
+    arrives. When more than `max_pending` messages are waiting, `publish`
+    blocks until the drain task catches up.
+
+    Messages are encoded at send time with `encoding`, which the session sets
+    once the UI has negotiated one (see codec.negotiate).
+    """
+
+    def __init__(self, room, max_pending: int = DEFAULT_MAX_PENDING):
+        self._room = room
+        self.encoding = ENCODING_JSON
+        self._max_pending = max_pending
+        self._queue: list[_Slot] = []
+        self._pending_by_key: dict[str, _Slot] = {}
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def _ensure_task(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    async def publish(self, message: dict) -> None:
+        """
+        Queue a message for the UI.
+
+        Args:
+            message: JSON-serializable payload with a "type" key
+        """
+        if self._closed:
+            return
+
+        msg_type = message.get("type")
+        key = COALESCE_KEYS.get(msg_type, msg_type) if msg_type in COALESCE_TYPES else None
+        stale = self._pending_by_key.get(key) if key is not None else None
+        if stale is not None:
+            # Takes the stale one's place in the count, so no need to wait for space
+            self._queue.remove(stale)
+            slot = _Slot(_merge(stale.message, message), key)
+            slot.queued_at = stale.queued_at
+        else:
+            async with self._space:
+                await self._space.wait_for(lambda: self._closed or len(self._queue) < self._max_pending)
+            if self._closed:
+                return
+            slot = _Slot(message, key)
+
+        self._queue.append(slot)
+        if key is not None:
+            self._pending_by_key[key] = slot
+
+        self._ensure_task()
+        self._wakeup.set()
+
+    def _pop(self) -> Optional[_Slot]:
+        if not self._queue:
+            return None
+        slot = self._queue.pop(0)
+        if slot.key is not None:
+            self._pending_by_key.pop(slot.key, None)
+        return slot
+
+    async def _drain(self) -> None:
+        while True:
+            slot = self._pop()
+            if slot is None:
+                if self._closed:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            async with self._space:
+                self._space.notify_all()
+
+            msg_type = slot.message.get("type")
+            start = time.perf_counter()
+            PUBLISH_QUEUE_WAIT.observe(start - slot.queued_at, type=msg_type)
+            try:
+                payload = encode(slot.message, self.encoding)
+                await self._room.local_participant.publish_data(payload, reliable=True)
+                PUBLISH_LATENCY.observe(time.perf_counter() - start, type=msg_type)
+            except Exception as e:
+                print(f"Error publishing {slot.message.get('type')} message: {e}")
+
+    async def aclose(self) -> None:
+        """Send what's queued, then stop the drain task."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        async with self._space:
+            self._space.notify_all()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=2.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
@@ -0,0 +1,114 @@
+"""
+Cache of cookbook retrieval results, shared by tool calls and speculative
+prefetching (see speculative.py).
+
+Entries are keyed by a normalized question so "the lasagna recipe" and
+"lasagna" share one entry. An entry fetched with a larger top_k also serves
+smaller ones, and a caller asking for a key that is still being fetched
+waits for that result instead of retrieving it again.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable, Optional
+
+from metrics import CACHE_REQUESTS
+
+# Words that don't change what a cookbook search is about
+_FILLER = {
+    "a", "an", "the", "my", "your", "some", "please", "recipe", "recipes", "how", "to",
+    "do", "i", "you", "make", "cook", "of", "for", "me", "us", "again",
+}
+
+
+def normalize_query(question: str) -> str:
+    """Lowercase, drop punctuation and filler words: 'The Lasagna recipe!' -> 'lasagna'."""
+    words = "".join(c if c.isalnum() else " " for c in question.lower()).split()
+    content = [w for w in words if w not in _FILLER]
+    return " ".join(content or words)
+
+
+class _Entry:
+    __slots__ = ("nodes", "top_k", "expires_at", "source")
+
+    def __init__(self, nodes: list, top_k: int, expires_at: float, source: str):
+        self.nodes = nodes
+        self.top_k = top_k
+        self.expires_at = expires_at
+        self.source = source
+
+
+class QueryCache:
+    """Thread-safe LRU with a TTL and in-flight sharing."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 120.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: dict[Hashable, tuple[Future, int]] = {}
+        self._lock = threading.Lock()
+
+    def contains(self, key: Hashable, top_k: int) -> bool:
+        """True if `key` is cached or being fetched with at least `top_k` results."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at > time.monotonic() and entry.top_k >= top_k:
+                return True
+            inflight = self._inflight.get(key)
+            return inflight is not None and inflight[1] >= top_k
+
+    def get_or_compute(self, key: Hashable, top_k: int, compute: Callable[[int], list], source: str = "tool") -> list:
+        """
+        Return up to `top_k` cached results for `key`, computing them with
+        `compute(top_k)` on a miss.
+
+        Args:
+            key: Cache key (normalized question plus scope)
+            top_k: Results wanted
+            compute: Runs the retrieval; its exceptions propagate to every waiter
+            source: "tool" or "speculative", for hit-rate metrics
+        """
+        owner: Optional[Future] = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at > time.monotonic() and entry.top_k >= top_k:
+                self._entries.move_to_end(key)
+                result = "speculative_hit" if entry.source == "speculative" and source == "tool" else "hit"
+                CACHE_REQUESTS.inc(cache="rag_query", result=result, source=source)
+                return entry.nodes[:top_k]
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[1] >= top_k:
+                future = inflight[0]
+            else:
+                future = owner = Future()
+                self._inflight[key] = (owner, top_k)
+
+        if owner is None:
+            CACHE_REQUESTS.inc(cache="rag_query", result="inflight", source=source)
+            return future.result()[:top_k]
+
+        CACHE_REQUESTS.inc(cache="rag_query", result="miss", source=source)
+        try:
+            nodes = compute(top_k)
+        except BaseException as e:
+            with self._lock:
+                self._release(key, owner)
+            owner.set_exception(e)
+            raise
+        with self._lock:
+            self._entries[key] = _Entry(nodes, top_k, time.monotonic() + self.ttl, source)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._release(key, owner)
+        owner.set_result(nodes)
+        return nodes
+
+    def _release(self, key: Hashable, owner: Future) -> None:
+        if self._inflight.get(key, (None,))[0] is owner:
+            del self._inflight[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,26 +1,59 @@
+import hashlib
+import json
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
 from pathlib import Path
 from typing import Optional, List
 
 from llama_index.core import (
     VectorStoreIndex,
-    SimpleDirectoryReader,
     Settings,
 )
 
 from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
 from google import genai
 from google.genai import types
 
+import tracing
+from embed_scheduler import EMBED_INGEST_SHARE, EMBED_RPM, EmbeddingError, get_embed_scheduler
+from metrics import CHUNKS_EMBEDDED, EMBED_LATENCY, INDEX_BUILD_LATENCY, RAG_QUERY_LATENCY
+from query_cache import QueryCache, normalize_query
+from rerank import RAG_RERANK, rerank_nodes
+from text_cache import content_hash, load_document_cached
+from vector_store import DOCUMENT_KEY, MANIFEST_FILE, NumpyVectorStore, ShardedVectorStore
+
+# Texts per embed_content request
+EMBED_REQUEST_BATCH = 100
+
+
 class GeminiEmbedding(BaseEmbedding):
     """Custom Embedding class using the new Google GenAI SDK."""
     
     _client: genai.Client = None
     _model_name: str = "models/gemini-embedding-001"
+    _output_dimensionality: Optional[int] = None
 
-    def __init__(self, model_name: str = "models/gemini-embedding-001", api_key: Optional[str] = None, **kwargs):
+    def __init__(
+        self,
+        model_name: str = "models/gemini-embedding-001",
+        api_key: Optional[str] = None,
+        output_dimensionality: Optional[int] = None,
+        **kwargs,
+    ):
+        # Large batches from LlamaIndex are split into concurrent requests by the scheduler
+        kwargs.setdefault("embed_batch_size", EMBED_REQUEST_BATCH * 8)
         super().__init__(model_name=model_name, **kwargs)
         self._model_name = model_name
+        # Truncated (Matryoshka) vectors, e.g. 768 instead of 3072; None = model default
+        self._output_dimensionality = output_dimensionality
         # use provided api_key or fall back to env var
         if not api_key:
             api_key = os.getenv("GEMINI_API_KEY")
@@ -33,55 +66,269 @@ class GeminiEmbedding(BaseEmbedding):
 
         self._client = genai.Client(api_key=api_key)
 
-    def _get_query_embedding(self, query: str) -> List[float]:
-        try:
+    @property
+    def output_dimensionality(self) -> Optional[int]:
+        return self._output_dimensionality
+
+    def _embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """One embed_content request. Raises on any failure or missing vector."""
+        with EMBED_LATENCY.time(backend="gemini", task=task_type), \
+                tracing.span("genai.embed", task=task_type, model=self._model_name, texts=len(texts),
+                             chars=sum(len(t) for t in texts)):
             response = self._client.models.embed_content(
                 model=self._model_name,
-                contents=query,
+                contents=texts,
                 config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_QUERY"
+                    task_type=task_type,
+                    output_dimensionality=self._output_dimensionality,
                 )
             )
-            return response.embeddings[0].values
-        except Exception as e:
-            print(f"Error getting query embedding: {e}")
-            return []
+        vectors = [e.values for e in (response.embeddings or [])]
+        if len(vectors) != len(texts) or any(not v for v in vectors):
+            raise EmbeddingError(f"Expected {len(texts)} embeddings, got {sum(1 for v in vectors if v)}")
+        if self._output_dimensionality and any(len(v) != self._output_dimensionality for v in vectors):
+            raise EmbeddingError(f"Expected {self._output_dimensionality}-dimensional embeddings, got {len(vectors[0])}")
+        return vectors
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        # Live user query: don't queue behind ingestion, and give up quickly
+        return get_embed_scheduler().call(
+            lambda: self._embed([query], "RETRIEVAL_QUERY")[0], priority=True, max_retries=2
+        )
 
     async def _aget_query_embedding(self, query: str) -> List[float]:
         return self._get_query_embedding(query)
 
     def _get_text_embedding(self, text: str) -> List[float]:
-        try:
-            response = self._client.models.embed_content(
-                model=self._model_name,
-                contents=text,
-                config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_DOCUMENT"
-                )
-            )
-            return response.embeddings[0].values
-        except Exception as e:
-             print(f"Error getting text embedding: {e}")
-             return []
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed document chunks through the rate-limited scheduler, several
+        requests in flight at once. Raises EmbeddingError rather than letting
+        an empty vector into the index.
+        """
+        batches = [texts[i:i + EMBED_REQUEST_BATCH] for i in range(0, len(texts), EMBED_REQUEST_BATCH)]
+        results = get_embed_scheduler().map(lambda batch: self._embed(batch, "RETRIEVAL_DOCUMENT"), batches)
+        CHUNKS_EMBEDDED.inc(len(texts), backend="gemini")
+        return [vector for batch in results for vector in batch]
 
     async def _aget_text_embedding(self, text: str) -> List[float]:
         return self._get_text_embedding(text)
 
 
-Settings.embed_model = GeminiEmbedding(model_name="models/gemini-embedding-001")
+# Embedding backend: "gemini" (default), "local" (hashing, no network) or "onnx"
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "gemini").lower()
+# Reduced Gemini embedding size (e.g. 768 or 1536); unset = full-size vectors
+EMBED_OUTPUT_DIM = int(os.getenv("EMBED_OUTPUT_DIM", "0") or 0) or None
+
+
+def make_embed_model(api_key: Optional[str] = None, output_dimensionality: Optional[int] = None) -> BaseEmbedding:
+    """
+    Build the embedding model for the configured backend.
+
+    Args:
+        api_key: Gemini key for the "gemini" backend; ignored by local ones
+        output_dimensionality: Gemini vector size; defaults to EMBED_OUTPUT_DIM
+
+    Returns:
+        A LlamaIndex embedding model used both for indexing and for queries
+    """
+    if EMBED_BACKEND in ("local", "onnx"):
+        from local_embedding import HashingEmbedding, OnnxEmbedding
+
+        if EMBED_BACKEND == "onnx":
+            model_dir = os.getenv("ONNX_EMBED_MODEL_DIR")
+            try:
+                return OnnxEmbedding(model_dir=model_dir)
+            except Exception as e:
+                print(f"ONNX embedding unavailable ({e}), falling back to local hashing embedding")
+        return HashingEmbedding(dim=int(os.getenv("LOCAL_EMBED_DIM", "1024")))
+    return GeminiEmbedding(
+        model_name="models/gemini-embedding-001",
+        api_key=api_key,
+        output_dimensionality=output_dimensionality or EMBED_OUTPUT_DIM,
+    )
+
+
+def embedding_signature(embed_model: BaseEmbedding) -> dict:
+    """Index metadata that must match between index and query time."""
+    return {
+        "embed_model": embed_model.model_name,
+        "output_dimensionality": getattr(embed_model, "output_dimensionality", None),
+    }
+
+
+Settings.embed_model = make_embed_model()
 
 # Paths
 DATA_DIR = Path(__file__).parent / "data"
+INDEX_DIR = Path(__file__).parent / ".index"   # Indexes handed back by the ingestion worker
+
+# Parse/chunk/embed in a separate process so indexing never holds this process's GIL
+INGEST_OUT_OF_PROCESS = os.getenv("INGEST_OUT_OF_PROCESS", "1") != "0"
+INGEST_TIMEOUT = float(os.getenv("INGEST_TIMEOUT", "1800"))
+
+# Search copy of the vectors: "int8" (4x smaller than float32), "float16" (2x) or
+# "none" (exact float32). Quantized searches rescore their shortlist against the
+# exact vectors, kept mapped on disk, so only the search copy stays resident.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "int8").lower()
+
+# Search structure: "flat" (exhaustive scan) or "ivf" (approximate, for large libraries).
+# ANN_NLIST is fixed at build time (0 = 4*sqrt(vectors)); ANN_NPROBE is the lists searched per query.
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "flat").lower()
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0") or 0) or None
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+
+
+# Seconds a retrieval result (including speculative ones) stays reusable
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "120"))
+
+
+def vector_index_options() -> dict:
+    return {"index_type": VECTOR_INDEX, "nlist": ANN_NLIST, "nprobe": ANN_NPROBE}
+
+
+SUPPORTED_EXTS = (".pdf", ".txt", ".md")
+SHARDS_DIR = INDEX_DIR / "shards"  # One saved vector store per source document
+
+_BOOK_STOPWORDS = {"my", "the", "a", "an", "from", "in", "of", "book", "cookbook", "pdf", "file", "document"}
+
+
+def list_documents(data_dir: Path) -> dict[str, Path]:
+    """Cookbook files under `data_dir`, keyed by their relative path."""
+    if not data_dir.exists():
+        return {}
+    return {
+        p.relative_to(data_dir).as_posix(): p
+        for p in sorted(data_dir.rglob("*"))
+        if p.is_file() and p.suffix.lower() in SUPPORTED_EXTS
+    }
+
+
+def file_fingerprint(path: Path) -> str:
+    """Content hash of a file: re-uploading the same bytes doesn't re-index it."""
+    return content_hash(path)
+
+
+def shard_dir_name(document: str, fingerprint: str) -> str:
+    """Shard directories are named by document and file version, so unchanged files are reused."""
+    return hashlib.sha1(f"{document}\0{fingerprint}".encode("utf-8")).hexdigest()[:16]
+
+
+# Shard directories are shared by every CookbookRAG in the process (one per API key):
+# a directory is only deleted once no instance maps it and no current file needs it
+_shard_dir_refs: Counter = Counter()
+_shard_dir_lock = threading.Lock()
+
+
+def _is_current_shard(document: str, shard_dir: Path) -> bool:
+    """True if `shard_dir` holds the version of `document` that is in DATA_DIR now."""
+    path = DATA_DIR / document
+    try:
+        return path.is_file() and shard_dir.name == shard_dir_name(document, file_fingerprint(path))
+    except OSError:
+        return False
+
+
+def _acquire_shard_dir(shard_dir: Path) -> None:
+    with _shard_dir_lock:
+        _shard_dir_refs[shard_dir] += 1
+
+
+def _release_shard_dir(document: str, shard_dir: Path) -> None:
+    """Drop one reference; delete the directory if it was the last one and the file moved on."""
+    with _shard_dir_lock:
+        _shard_dir_refs[shard_dir] -= 1
+        if _shard_dir_refs[shard_dir] > 0:
+            return
+        del _shard_dir_refs[shard_dir]
+        # Other sessions (and restarts) load the current version from disk
+        if not _is_current_shard(document, shard_dir):
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+def _discard_shard_dir(shard_dir: Path) -> bool:
+    """Delete an unusable shard directory unless some instance is serving it. Returns True if deleted."""
+    with _shard_dir_lock:
+        if _shard_dir_refs[shard_dir] > 0:
+            return False
+        del _shard_dir_refs[shard_dir]
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        return True
+
+
+def _collect_shard_dirs(current: set[str]) -> None:
+    """Delete shard directories for file versions that are gone, unless an instance still maps them."""
+    if not SHARDS_DIR.exists():
+        return
+    with _shard_dir_lock:
+        for shard_dir in SHARDS_DIR.iterdir():
+            # Dot-prefixed directories are builds in progress (see save_shard)
+            if shard_dir.name.startswith(".") or shard_dir.name in current or _shard_dir_refs[shard_dir] > 0:
+                continue
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+def load_document(path: Path) -> list:
+    """Read one cookbook file into LlamaIndex documents (a PDF yields one per page)."""
+    return load_document_cached(path)
+
+
+def build_vector_store(documents: list, embed_model: BaseEmbedding, document: str) -> NumpyVectorStore:
+    """Chunk documents the same way VectorStoreIndex.from_documents does and embed the chunks."""
+    for doc in documents:
+        doc.metadata[DOCUMENT_KEY] = document
+        for excluded in (doc.excluded_embed_metadata_keys, doc.excluded_llm_metadata_keys):
+            if DOCUMENT_KEY not in excluded:
+                excluded.append(DOCUMENT_KEY)
+    nodes = Settings.node_parser.get_nodes_from_documents(documents)
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    embeddings = embed_model.get_text_embedding_batch(texts)
+    store = NumpyVectorStore.from_nodes(nodes, embeddings, **vector_index_options())
+    store.manifest.update(embedding_signature(embed_model))
+    return store
+
+
+def save_shard(store: NumpyVectorStore, shards_dir: Path, document: str, fingerprint: str, **manifest) -> Path:
+    """Save a document's store under its shard directory name and return the directory."""
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    final = shards_dir / shard_dir_name(document, fingerprint)
+    tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=shards_dir))
+    store.save(tmp, document=document, fingerprint=fingerprint, **manifest)
+    try:
+        tmp.rename(final)
+    except OSError:
+        # Another process already built this exact file version
+        shutil.rmtree(tmp, ignore_errors=True)
+    return final
+
+
+def _book_tokens(text: str) -> set[str]:
+    words = "".join(c if c.isalnum() else " " for c in text.lower().replace("'", "")).split()
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words if w not in _BOOK_STOPWORDS}
 
 
 class CookbookRAG:
-    """In-memory RAG for cookbook documents. No external vector DB required."""
+    """
+    In-memory RAG for cookbook documents. No external vector DB required.
+
+    The index is sharded per source file (see ShardedVectorStore), so adding
+    or removing a cookbook only embeds or drops that file, and queries can be
+    scoped to specific documents.
+    """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, output_dimensionality: Optional[int] = None):
         self.api_key = api_key
+        self.output_dimensionality = output_dimensionality or EMBED_OUTPUT_DIM
         self.index: Optional[VectorStoreIndex] = None
+        self.vector_store = ShardedVectorStore()
+        self._embed_model_instance: Optional[BaseEmbedding] = None
+        self._shard_dirs: dict[str, Path] = {}   # document -> directory its shard is mapped from
         self.recipe_gallery: List[dict] = []  # Cached gallery items
         self._gallery_cache_key: str = ""    # To detect file changes
+        self.index_version: int = 0          # Bumped whenever the index is rebuilt or cleared
+        self._query_cache = QueryCache(ttl=QUERY_CACHE_TTL)  # Keyed by index_version, so rebuilds invalidate it
         self._load_documents_on_startup()
     
     def _load_documents_on_startup(self) -> None:
@@ -96,53 +343,260 @@ class CookbookRAG:
             return
         pass
     
-    def _build_index(self) -> None:
-        """Build a fresh in-memory index from documents."""
-        if not DATA_DIR.exists() or not any(DATA_DIR.iterdir()):
-            print("No documents to index.")
-            return
-        
-        print(f"Building in-memory index from {DATA_DIR}...")
-        
+    def _embed_model(self) -> BaseEmbedding:
+        if self._embed_model_instance is None:
+            if self.api_key or self.output_dimensionality != EMBED_OUTPUT_DIM:
+                self._embed_model_instance = make_embed_model(self.api_key, self.output_dimensionality)
+            else:
+                self._embed_model_instance = Settings.embed_model
+        return self._embed_model_instance
+
+    def _load_shard(self, document: str, shard_dir: Path) -> None:
+        """Map a saved shard and serve it. Raises ValueError if it was embedded differently."""
+        store = NumpyVectorStore.load(shard_dir, quantization=VECTOR_QUANTIZATION, **vector_index_options())
+        expected = embedding_signature(self._embed_model())
+        for key, value in expected.items():
+            if key in store.manifest and store.manifest[key] != value:
+                raise ValueError(
+                    f"Index was built with {key}={store.manifest[key]!r} but queries use {value!r}; rebuild the index"
+                )
+        self.vector_store.set_shard(document, store)
+        self.index_version += 1
+        _acquire_shard_dir(shard_dir)
+        # Mapped files stay readable after unlink, so the old version can go as soon as no one else maps it
+        old_dir, self._shard_dirs[document] = self._shard_dirs.get(document), shard_dir
+        if old_dir:
+            _release_shard_dir(document, old_dir)
+
+    def _drop_shard(self, document: str) -> None:
+        """Stop serving a document. Its directory goes only once nothing uses it (see _release_shard_dir)."""
+        if self.vector_store.remove_shard(document) is not None:
+            self.index_version += 1
+        shard_dir = self._shard_dirs.pop(document, None)
+        if shard_dir:
+            _release_shard_dir(document, shard_dir)
+
+    def _refresh_index(self) -> None:
+        if self.vector_store.shard_keys():
+            self.index = VectorStoreIndex.from_vector_store(self.vector_store, embed_model=self._embed_model())
+        else:
+            self.index = None
+
+    def _build_shards(self, documents: dict[str, Path]) -> dict[str, Path]:
+        """Parse, chunk and embed each document in this process. Returns the saved shard dirs."""
+        built = {}
+        for key, path in documents.items():
+            try:
+                start = time.perf_counter()
+                with INDEX_BUILD_LATENCY.time(), tracing.span("rag.build_shard", document=key):
+                    docs = load_document(path)
+                    if not docs:
+                        print(f"No text found in {key}")
+                        continue
+                    store = build_vector_store(docs, self._embed_model(), document=key)
+                built[key] = save_shard(
+                    store, SHARDS_DIR, key, file_fingerprint(path),
+                    documents=len(docs), build_s=round(time.perf_counter() - start, 3),
+                )
+            except Exception as e:
+                print(f"Error indexing {key}: {e}")
+        return built
+
+    def _build_shards_out_of_process(self, documents: dict[str, Path]) -> dict[str, Path]:
+        """
+        Build shards in the ingestion worker process, then return their dirs.
+        The current shards keep serving queries until the new ones are loaded.
+        """
+        env = dict(os.environ)
+        if self.api_key:
+            env["SOUSCHEF_INGEST_API_KEY"] = self.api_key
+        if self.output_dimensionality:
+            env["EMBED_OUTPUT_DIM"] = str(self.output_dimensionality)
+        # The worker has its own scheduler: give it part of the quota, not all of it
+        env["GEMINI_EMBED_RPM"] = str(EMBED_RPM * EMBED_INGEST_SHARE)
+
+        print(f"Indexing {len(documents)} document(s) in ingestion worker...")
         try:
-            documents = SimpleDirectoryReader(
-                input_dir=str(DATA_DIR),
-                recursive=True,
-                required_exts=[".pdf", ".txt", ".md"],
-            ).load_data()
-            
-            if not documents:
-                print("No documents found to index.")
-                return
-            
-            print(f"Loaded {len(documents)} document chunks")
-            embed_model = GeminiEmbedding(api_key=self.api_key) if self.api_key else Settings.embed_model
-            self.index = VectorStoreIndex.from_documents(documents, embed_model=embed_model)
-            print(f"In-memory index created successfully!")
-            
+            with tracing.span("rag.build_index", out_of_process=True, documents=len(documents)) as span:
+                proc = subprocess.run(
+                    [sys.executable, str(Path(__file__).parent / "ingest_worker.py"),
+                     "--data-dir", str(DATA_DIR), "--out-dir", str(SHARDS_DIR), "--files", *documents],
+                    env=env, capture_output=True, text=True, timeout=INGEST_TIMEOUT,
+                )
+                if proc.returncode != 0:
+                    print(f"Ingestion worker failed ({proc.returncode}): {proc.stderr.strip()[-2000:]}")
+                    return {}
+                report = json.loads(proc.stdout.strip().splitlines()[-1])
+                span.set(built=len(report["built"]), failed=len(report["failed"]))
         except Exception as e:
-            print(f"Error building index: {e}")
-            self.index = None
+            print(f"Error building index out of process: {e}")
+            return {}
+
+        for key, error in report["failed"].items():
+            print(f"Error indexing {key}: {error}")
+        for key, info in report["built"].items():
+            INDEX_BUILD_LATENCY.observe(info.get("build_s", 0.0))
+        return {key: SHARDS_DIR / info["dir"] for key, info in report["built"].items()}
+
+    def sync_documents(self) -> tuple[list[str], list[str], list[str], dict[str, str]]:
+        """
+        Bring the shards in line with DATA_DIR: index new or changed files,
+        drop removed ones, and keep everything else untouched. A file with the
+        same bytes as another one is reported as a duplicate and not indexed.
+
+        Returns:
+            Tuple of (indexed, removed, failed, duplicates) where duplicates maps
+            a skipped document to the document it duplicates
+        """
+        files = {key: (path, file_fingerprint(path)) for key, path in list_documents(DATA_DIR).items()}
+
+        # Prefer keeping the copy that is already indexed
+        wanted, duplicates, by_hash = {}, {}, {}
+        for key in sorted(files, key=lambda k: (k not in self._shard_dirs, k)):
+            fingerprint = files[key][1]
+            if fingerprint in by_hash:
+                duplicates[key] = by_hash[fingerprint]
+                continue
+            by_hash[fingerprint] = key
+            wanted[key] = files[key]
+
+        removed = [key for key in self.vector_store.shard_keys() if key not in wanted]
+        for key in removed:
+            self._drop_shard(key)
+
+        _collect_shard_dirs({shard_dir_name(key, fingerprint) for key, (_, fingerprint) in files.items()})
+
+        to_build, in_use = {}, []
+        for key, (path, fingerprint) in wanted.items():
+            shard_dir = SHARDS_DIR / shard_dir_name(key, fingerprint)
+            if self._shard_dirs.get(key) == shard_dir:
+                continue
+            if (shard_dir / MANIFEST_FILE).exists():
+                # Already built for this file version (e.g. before a restart)
+                try:
+                    self._load_shard(key, shard_dir)
+                    continue
+                except Exception as e:
+                    if not _discard_shard_dir(shard_dir):
+                        print(f"Can't load shard for {key} ({e}) and another session is using it")
+                        in_use.append(key)
+                        continue
+                    print(f"Rebuilding shard for {key}: {e}")
+            to_build[key] = path
+
+        built = {}
+        if to_build:
+            build = self._build_shards_out_of_process if INGEST_OUT_OF_PROCESS else self._build_shards
+            built = build(to_build)
+        indexed, failed = [], in_use + [key for key in to_build if key not in built]
+        for key, shard_dir in built.items():
+            try:
+                self._load_shard(key, shard_dir)
+                indexed.append(key)
+            except Exception as e:
+                print(f"Error loading shard for {key}: {e}")
+                failed.append(key)
+
+        self._refresh_index()
+        return indexed, removed, failed, duplicates
+
+    def document_names(self) -> list[str]:
+        """Indexed documents, as paths relative to the data directory."""
+        return self.vector_store.shard_keys()
+
+    def resolve_documents(self, book: str) -> list[str]:
+        """
+        Match a spoken book reference ("my grandma's recipe card") to indexed
+        documents by the words in their file names. Returns the best matches.
+        """
+        wanted = _book_tokens(book)
+        if not wanted:
+            return []
+        scores = {}
+        for key in self.document_names():
+            overlap = len(wanted & _book_tokens(Path(key).stem))
+            if overlap:
+                scores[key] = overlap / len(wanted)
+        if not scores:
+            return []
+        best = max(scores.values())
+        return [key for key, score in scores.items() if score == best and score >= 0.5]
     
-    def query(self, question: str, top_k: int = 3) -> str:
+    def _query_key(self, question: str, documents: Optional[list[str]]) -> tuple:
+        return (normalize_query(question), tuple(sorted(documents or ())), self.index_version)
+
+    def retrieve(self, question: str, top_k: int = 3, documents: Optional[list[str]] = None,
+                 source: str = "tool") -> list:
+        """
+        Retrieve the top_k chunks for a question, through the query cache.
+
+        Args:
+            question: The question to ask
+            top_k: Number of relevant chunks to retrieve
+            documents: Only search these documents (see resolve_documents)
+            source: "tool" or "speculative", for cache metrics
+
+        Returns:
+            Nodes with scores, best first. Raises EmbeddingError if the query can't be embedded.
+        """
+        index = self.index
+        if index is None:
+            return []
+
+        def compute(k: int) -> list:
+            filters = None
+            if documents:
+                filters = MetadataFilters(filters=[
+                    MetadataFilter(key=DOCUMENT_KEY, value=list(documents), operator=FilterOperator.IN)
+                ])
+            retriever = index.as_retriever(similarity_top_k=k, filters=filters)
+            with RAG_QUERY_LATENCY.time(top_k=k), \
+                    tracing.span("rag.query", top_k=k, question_chars=len(question), source=source,
+                                 documents=len(documents) if documents else 0) as span:
+                nodes = retriever.retrieve(question)
+                span.set(chunks=len(nodes))
+            return nodes
+
+        return self._query_cache.get_or_compute(self._query_key(question, documents), top_k, compute, source=source)
+
+    def prefetch(self, question: str, top_k: int = 5) -> None:
+        """Warm the query cache for a question the user is likely about to ask."""
+        try:
+            self.retrieve(question, top_k, source="speculative")
+        except EmbeddingError as e:
+            print(f"Speculative retrieval for '{question}' failed: {e}")
+
+    def is_cached(self, question: str, top_k: int = 5) -> bool:
+        return self._query_cache.contains(self._query_key(question, None), top_k)
+
+    def query(self, question: str, top_k: int = 3, documents: Optional[list[str]] = None,
+              rerank: bool = False) -> str:
         """
         Query the cookbook knowledge base.
         
         Args:
             question: The question to ask
             top_k: Number of relevant chunks to retrieve
+            documents: Only search these documents (see resolve_documents)
+            rerank: Keep only the chunks that cover the recipe asked for (see rerank.py)
             
         Returns:
-            Retrieved context relevant to the question
+            Retrieved context relevant to the question. Raises EmbeddingError if the
+            query can't be embedded (e.g. the embedding quota is exhausted).
         """
         if self.index is None:
             return "I don't have access to any cookbook documents right now. Please upload a cooking PDF first."
         
-        retriever = self.index.as_retriever(similarity_top_k=top_k)
-        nodes = retriever.retrieve(question)
+        # EmbeddingError (quota exhausted) propagates: callers report "busy", not "not found"
+        nodes = self.retrieve(question, top_k, documents)
         
         if not nodes:
             return "I couldn't find any relevant information about that in my cookbook."
+
+        if rerank and RAG_RERANK:
+            with tracing.span("rag.rerank", candidates=len(nodes)) as span:
+                nodes = rerank_nodes(question, nodes)
+                span.set(kept=len(nodes))
         
         context_parts = []
         for i, node in enumerate(nodes, 1):
@@ -155,18 +609,46 @@ class CookbookRAG:
         return self.index is not None
     
     def get_vector_count(self) -> int:
-        """Get approximate document count (in-memory doesn't track vectors directly)."""
-        if self.index is None:
-            return 0
-        try:
-            # For in-memory, we can check if there are any nodes
-            return len(list(DATA_DIR.glob("**/*.pdf"))) + len(list(DATA_DIR.glob("**/*.txt")))
-        except:
-            return 0
+        """Number of vectors across all indexed documents."""
+        return len(self.vector_store)
+
+    def get_index_stats(self) -> dict:
+        """
+        Index size and build numbers for capacity planning.
+
+        Returns:
+            Dict with index_version, documents, nodes, vectors, dim, bytes held by
+            vectors (heap vs memory-mapped), quantized copies, ANN lists and text,
+            build_s (sum over shards) and per-document details
+        """
+        # One snapshot, so a shard dropped meanwhile can't go missing halfway through
+        snapshot = self.vector_store.shards()
+        stats = self.vector_store.stats(snapshot)
+        shards = stats.pop("shards")
+        documents = {}
+        for key, shard in shards.items():
+            manifest = snapshot[key].manifest
+            documents[key] = {
+                **shard,
+                "build_s": manifest.get("build_s"),
+                "built_at": manifest.get("created_at"),
+            }
+        heap_vectors = stats["vector_bytes"] - stats["vector_bytes_mapped"]
+        return {
+            "index_version": self.index_version,
+            "documents": len(documents),
+            **stats,
+            "resident_bytes": heap_vectors + stats["quantized_bytes"] + stats["ann_bytes"] + stats["text_bytes"],
+            "build_s": round(sum(d["build_s"] or 0.0 for d in documents.values()), 3),
+            "quantization": VECTOR_QUANTIZATION,
+            "index_type": VECTOR_INDEX,
+            "embedding": embedding_signature(self._embed_model()),
+            "per_document": documents,
+        }
     
     def reload_index(self) -> tuple[bool, str]:
         """
-        Rebuild the index from documents in the data directory.
+        Index new or changed documents in the data directory and drop removed ones.
         Called when new PDFs are uploaded.
         
         Returns:
@@ -176,35 +658,63 @@ class CookbookRAG:
             if not DATA_DIR.exists() or not any(DATA_DIR.iterdir()):
                 return False, "No documents found in the data directory."
             
-            # Clear existing index
-            self.index = None
-            
-            # Rebuild
-            self._build_index()
+            # Unchanged documents keep their shards; the rest keep answering until swapped
+            indexed, removed, failed, duplicates = self.sync_documents()
             
             # Clear gallery cache too on reload
             self.recipe_gallery = []
             self._gallery_cache_key = ""
             
             if self.index is not None:
-                pdf_count = len(list(DATA_DIR.glob("**/*.pdf")))
-                txt_count = len(list(DATA_DIR.glob("**/*.txt")))
-                doc_count = pdf_count + txt_count
-                return True, f"Successfully indexed {doc_count} document(s) ({pdf_count} PDFs, {txt_count} text files). I'm ready to answer questions!"
+                doc_count = len(self.document_names())
+                message = f"Successfully indexed {doc_count} document(s) ({len(indexed)} new or updated). I'm ready to answer questions!"
+                if failed:
+                    message += f" I couldn't read {', '.join(failed)}."
+                for duplicate, original in duplicates.items():
+                    message += f" {duplicate} is the same file as {original}, so I skipped it."
+                return True, message
             else:
                 return False, "Failed to create index."
         except Exception as e:
             return False, f"Error reloading index: {str(e)}"
+
+    def remove_document(self, document: str) -> tuple[bool, str]:
+        """
+        Delete one uploaded document and drop its shard; other books are untouched.
+
+        Args:
+            document: Document name as returned by document_names()
+
+        Returns:
+            Tuple of (success, message)
+        """
+        try:
+            if document not in self._shard_dirs and document not in list_documents(DATA_DIR):
+                return False, f"There's no document called {document}."
+            path = DATA_DIR / document
+            if path.is_file():
+                path.unlink()
+            self._drop_shard(document)
+            self._refresh_index()
+            self.recipe_gallery = []
+            self._gallery_cache_key = ""
+            return True, f"Removed {document} from the cookbook."
+        except Exception as e:
+            return False, f"Error removing document: {str(e)}"
     
     def clear_index(self) -> tuple[bool, str]:
         """
-        Clear the in-memory index.
+        Clear the in-memory index. Shard directories stay on disk for other
+        sessions and the next reload.
         
         Returns:
             Tuple of (success, message)
         """
         try:
+            for document in self.vector_store.shard_keys():
+                self._drop_shard(document)
             self.index = None
+            self.index_version += 1
             self.recipe_gallery = []
             self._gallery_cache_key = ""
             
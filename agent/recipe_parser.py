@@ -1,8 +1,13 @@
 import os
 import asyncio
+import hashlib
+import json
 from dataclasses import dataclass
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+import tracing
+from metrics import GENAI_LATENCY, RECIPE_PARSE_PATH
 
 
 # Pydantic models for Gemini structured output
@@ -17,6 +22,11 @@ class RecipeStepSchema(BaseModel):
     instruction: str = Field(description="The cooking instruction for this step")
     duration_minutes: Optional[int] = Field(default=None, description="Time in minutes if applicable")
     tips: Optional[str] = Field(default=None, description="Helpful tips for this step")
+    depends_on: Optional[List[int]] = Field(
+        default=None,
+        description="Step numbers that must be finished before this step can start; "
+                    "omit if it simply follows the previous step, empty if it can start right away",
+    )
 
 
 class RecipePlanSchema(BaseModel):
@@ -28,6 +38,13 @@ class RecipePlanSchema(BaseModel):
     steps: List[RecipeStepSchema] = Field(description="Step-by-step cooking instructions")
 
 
+_RECIPE_LIST = TypeAdapter(List[RecipePlanSchema])
+
+
+class _BatchMismatch(ValueError):
+    """A batch reply that parsed but doesn't answer the request (count, empty recipes)."""
+
+
 @dataclass
 class Ingredient:
     name: str
@@ -43,6 +60,8 @@ class RecipeStep:
     duration_minutes: Optional[int] = None
     tips: Optional[str] = None
     completed: bool = False
+    # Step numbers this step waits for; None means just the previous step
+    depends_on: Optional[List[int]] = None
 
 
 @dataclass
@@ -54,11 +73,45 @@ class RecipePlan:
     ingredients: List[Ingredient]
     steps: List[RecipeStep]
     current_step_index: int = 0
+    # Which parse path produced this plan: "primary", "hedge" or "rules" (not serialized)
+    parsed_by: Optional[str] = None
     
+    def _content(self) -> dict:
+        """Everything that defines the recipe, without cooking progress."""
+        return {
+            "name": self.name,
+            "servings": self.servings,
+            "prep_time": self.prep_time,
+            "cook_time": self.cook_time,
+            "ingredients": [[i.name, i.quantity, i.emoji] for i in self.ingredients],
+            "steps": [[s.step_number, s.instruction, s.duration_minutes, s.tips, s.depends_on] for s in self.steps],
+        }
+
+    @property
+    def plan_id(self) -> str:
+        """Stable id for this recipe: the same dish gets the same id every time it's sent."""
+        name = " ".join(self.name.lower().split())
+        return "plan-" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def plan_version(self) -> str:
+        """Changes whenever the recipe content does, so the UI knows when its copy is stale."""
+        content = json.dumps(self._content(), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+
+    def step_state(self) -> dict:
+        """Id plus cooking progress: all the UI needs for a plan it already holds."""
+        return {
+            "id": self.plan_id,
+            "version": self.plan_version,
+            "current_step_index": self.current_step_index,
+            "completed_steps": [i for i, s in enumerate(self.steps) if s.completed],
+        }
+
     def to_dict(self):
-        import uuid
         return {
-            "id": str(uuid.uuid4()),  # Generate unique ID for frontend
+            "id": self.plan_id,
+            "version": self.plan_version,
             "title": self.name,  # Frontend expects 'title', not 'name'
             "name": self.name,  # Keep for backwards compatibility
             "servings": self.servings,
@@ -78,93 +131,353 @@ class RecipePlan:
                     "instruction": s.instruction,
                     "duration_minutes": s.duration_minutes,
                     "tips": s.tips,
-                    "completed": s.completed
+                    "completed": s.completed,
+                    "depends_on": s.depends_on
                 }
                 for s in self.steps
             ],
             "current_step_index": self.current_step_index
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "RecipePlan":
+        """Rebuild a plan from `to_dict` output (e.g. a saved session)."""
+        return cls(
+            name=data.get("name") or data.get("title", ""),
+            servings=data.get("servings", ""),
+            prep_time=data.get("prep_time", ""),
+            cook_time=data.get("cook_time", ""),
+            ingredients=[
+                Ingredient(name=i["name"], quantity=i["quantity"], emoji=i["emoji"])
+                for i in data.get("ingredients", [])
+            ],
+            steps=[
+                RecipeStep(
+                    step_number=s["step_number"],
+                    instruction=s["instruction"],
+                    duration_minutes=s.get("duration_minutes"),
+                    tips=s.get("tips"),
+                    completed=s.get("completed", False),
+                    depends_on=s.get("depends_on")
+                )
+                for s in data.get("steps", [])
+            ],
+            current_step_index=data.get("current_step_index", 0)
+        )
 
-async def parse_recipe_from_rag(rag_content: str, recipe_query: str) -> Optional[RecipePlan]:
-    """
-    Parse raw RAG content into a structured RecipePlan using Gemini with native structured output.
-    """
-    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-    
-    if not api_key:
-        print("Error: GOOGLE_API_KEY not found for recipe parsing.")
-        return None
 
-    try:
-        from google import genai
-        
-        client = genai.Client(api_key=api_key)
-        
-        prompt = f"""
-Extract the recipe from the following cookbook content.
+# Batch parsing packs recipes into one request up to this much cookbook context...
+RECIPE_BATCH_MAX_CHARS = int(os.getenv("RECIPE_BATCH_MAX_CHARS", "24000"))
+# ...and at most this many recipes, which bounds the size of the JSON reply
+RECIPE_BATCH_MAX_RECIPES = int(os.getenv("RECIPE_BATCH_MAX_RECIPES", "6"))
 
-User wants to make: {recipe_query}
-
-Cookbook content:
-{rag_content}
+PARSE_MODEL = "gemini-3-flash-preview"
+# Latency SLO for parsing one recipe (one request when batched), in seconds; 0 waits for
+# the model however long it takes. Past it, the recipe is pulled out with rule_parser.
+RECIPE_PARSE_DEADLINE = float(os.getenv("RECIPE_PARSE_DEADLINE", "12"))
+# Without a reply after this long, also ask the faster model tier (never if >= the deadline)
+RECIPE_PARSE_HEDGE_AFTER = float(os.getenv("RECIPE_PARSE_HEDGE_AFTER", "4"))
+FAST_PARSE_MODEL = os.getenv("RECIPE_PARSE_FAST_MODEL", "gemini-2.5-flash-lite")
+# With less time than this left before the deadline, don't start another model request
+MIN_MODEL_SECONDS = 2.0
 
+_GUIDELINES = """
 Strict Guidelines for Extraction:
 1. Ingredients: Extract EACH actual ingredient with its exact quantity and unit. 
    - Clean up noisy text.
    - Assign a relevant emoji to each ingredient. 
 2. Steps: Extract clear, sequential cooking instructions.
+   - If a step can run alongside earlier ones (e.g. making a sauce while pasta boils), list the steps it really needs in depends_on.
 3. Estimations: Estimate prep_time and cook_time if not explicitly stated.
-
-Extract the recipe with all ingredients and step-by-step instructions.
 """
-        
+
+
+def _genai_client():
+    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        print("Error: GOOGLE_API_KEY not found for recipe parsing.")
+        return None
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+
+def _plan_from_schema(parsed: RecipePlanSchema) -> RecipePlan:
+    """Convert Gemini's structured output to the internal dataclass format."""
+    ingredients = [
+        Ingredient(
+            name=i.name,
+            quantity=i.quantity,
+            emoji=i.emoji
+        )
+        for i in parsed.ingredients
+    ]
+    
+    steps = [
+        RecipeStep(
+            step_number=s.step_number,
+            instruction=s.instruction,
+            duration_minutes=s.duration_minutes,
+            tips=s.tips,
+            depends_on=s.depends_on
+        )
+        for s in parsed.steps
+    ]
+    
+    return RecipePlan(
+        name=parsed.name,
+        servings=parsed.servings,
+        prep_time=parsed.prep_time,
+        cook_time=parsed.cook_time,
+        ingredients=ingredients,
+        steps=steps
+    )
+
+
+async def _generate(client, op: str, prompt: str, schema, context_chars: int,
+                    model: str = PARSE_MODEL, **span_fields) -> str:
+    """One structured-output request; returns the JSON text."""
+    with GENAI_LATENCY.time(op=op, model=model), \
+            tracing.span("genai.generate", op=op, model=model,
+                         prompt_chars=len(prompt), context_chars=context_chars, **span_fields) as span:
         # Use asyncio.to_thread for the synchronous Gemini call
         response = await asyncio.to_thread(
             lambda: client.models.generate_content(
-                model="gemini-3-flash-preview",
+                model=model,
                 contents=prompt,
                 config={
                     "response_mime_type": "application/json",
-                    "response_schema": RecipePlanSchema,
+                    "response_schema": schema,
                 },
             )
         )
+        span.set(response_chars=len(response.text or ""))
+    return response.text
+
+
+async def _parse_with_model(client, model: str, prompt: str, context_chars: int) -> Optional[RecipePlan]:
+    try:
+        text = await _generate(client, "parse_recipe", prompt, RecipePlanSchema, context_chars, model=model)
         
         # Parse with Pydantic
-        parsed = RecipePlanSchema.model_validate_json(response.text)
-        
-        # Convert to internal dataclass format
-        ingredients = [
-            Ingredient(
-                name=i.name,
-                quantity=i.quantity,
-                emoji=i.emoji
-            )
-            for i in parsed.ingredients
-        ]
-        
-        steps = [
-            RecipeStep(
-                step_number=s.step_number,
-                instruction=s.instruction,
-                duration_minutes=s.duration_minutes,
-                tips=s.tips
-            )
-            for s in parsed.steps
-        ]
-        
-        return RecipePlan(
-            name=parsed.name,
-            servings=parsed.servings,
-            prep_time=parsed.prep_time,
-            cook_time=parsed.cook_time,
-            ingredients=ingredients,
-            steps=steps
-        )
+        return _plan_from_schema(RecipePlanSchema.model_validate_json(text))
         
     except Exception as e:
-        print(f"Error parsing recipe: {e}")
+        print(f"Error parsing recipe with {model}: {e}")
         import traceback
         traceback.print_exc()
         return None
+
+
+def _parse_with_rules(rag_content: str, recipe_query: str) -> Optional[RecipePlan]:
+    from rule_parser import extract_recipe  # imports this module, so not at the top
+    return extract_recipe(rag_content, recipe_query)
+
+
+def _record_path(plan: Optional[RecipePlan], path: str) -> Optional[RecipePlan]:
+    path = path if plan else "failed"
+    RECIPE_PARSE_PATH.inc(path=path)
+    if plan:
+        plan.parsed_by = path
+    return plan
+
+
+async def _parse_hedged(client, prompt: str, rag_content: str, recipe_query: str,
+                        deadline: float) -> tuple[Optional[RecipePlan], str]:
+    """
+    Race the primary model against a hedged request to the fast tier, sent
+    after RECIPE_PARSE_HEDGE_AFTER (or as soon as the primary fails). The
+    first valid plan wins; at `deadline` (event loop time) the requests are
+    abandoned and the rule-based extractor takes over.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    if deadline - start < MIN_MODEL_SECONDS:
+        print(f"No time left to parse '{recipe_query}' with a model, extracting it with rules")
+        return _parse_with_rules(rag_content, recipe_query), "rules"
+    hedge_at = start + RECIPE_PARSE_HEDGE_AFTER
+    hedged = hedge_at >= deadline
+
+    tasks = {asyncio.create_task(_parse_with_model(client, PARSE_MODEL, prompt, len(rag_content))): "primary"}
+    try:
+        while tasks or not hedged:
+            if not hedged and (not tasks or loop.time() >= hedge_at):
+                hedged = True
+                reason = "is slow" if tasks else "failed"
+                print(f"Recipe parse for '{recipe_query}' {reason}, hedging with {FAST_PARSE_MODEL}")
+                task = asyncio.create_task(_parse_with_model(client, FAST_PARSE_MODEL, prompt, len(rag_content)))
+                tasks[task] = "hedge"
+            now = loop.time()
+            if now >= deadline:
+                break
+            timeout = deadline - now if hedged else min(deadline, hedge_at) - now
+            done, _ = await asyncio.wait(tasks, timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                path = tasks.pop(task)
+                if task.result():
+                    return task.result(), path
+    finally:
+        # The Gemini calls themselves run in threads and finish in the background
+        for task in tasks:
+            task.cancel()
+
+    print(f"No model parse for '{recipe_query}' after {loop.time() - start:.1f}s, extracting it with rules")
+    return _parse_with_rules(rag_content, recipe_query), "rules"
+
+
+async def parse_recipe_from_rag(rag_content: str, recipe_query: str,
+                                deadline: Optional[float] = None) -> Optional[RecipePlan]:
+    """
+    Parse raw RAG content into a structured RecipePlan using Gemini with native structured output.
+
+    With RECIPE_PARSE_DEADLINE set this returns within the deadline: a
+    hedged request to the faster model tier races a slow primary, and the
+    rule-based extractor fills in if neither answers in time. The path
+    that produced the plan is in `plan.parsed_by`.
+
+    Args:
+        rag_content: Retrieved cookbook text
+        recipe_query: The recipe the user asked for
+        deadline: Absolute event-loop time to finish by, when this parse is part
+            of a larger one (see parse_recipes_from_rag); default now + RECIPE_PARSE_DEADLINE
+    """
+    client = _genai_client()
+    if client is None:
+        return None
+
+    prompt = f"""
+Extract the recipe from the following cookbook content.
+
+User wants to make: {recipe_query}
+
+Cookbook content:
+{rag_content}
+{_GUIDELINES}
+Extract the recipe with all ingredients and step-by-step instructions.
+"""
+    if deadline is None:
+        if RECIPE_PARSE_DEADLINE <= 0:
+            return _record_path(await _parse_with_model(client, PARSE_MODEL, prompt, len(rag_content)), "primary")
+        deadline = asyncio.get_running_loop().time() + RECIPE_PARSE_DEADLINE
+
+    with tracing.span("recipe.parse", deadline_s=round(deadline - asyncio.get_running_loop().time(), 3),
+                      context_chars=len(rag_content)) as span:
+        plan, path = await _parse_hedged(client, prompt, rag_content, recipe_query, deadline)
+        span.set(path=path if plan else "failed")
+    return _record_path(plan, path)
+
+
+def split_batches(requests: List[Tuple[str, str]], max_chars: int = RECIPE_BATCH_MAX_CHARS,
+                  max_recipes: int = RECIPE_BATCH_MAX_RECIPES) -> List[List[int]]:
+    """
+    Group recipe requests into batches, in order, so no batch goes over
+    max_chars of cookbook content or max_recipes recipes. A recipe bigger
+    than max_chars gets a batch of its own.
+
+    Returns:
+        Lists of indexes into `requests`
+    """
+    batches: List[List[int]] = []
+    chars = 0
+    for i, (rag_content, _) in enumerate(requests):
+        if batches and len(batches[-1]) < max_recipes and chars + len(rag_content) <= max_chars:
+            batches[-1].append(i)
+            chars += len(rag_content)
+        else:
+            batches.append([i])
+            chars = len(rag_content)
+    return batches
+
+
+def _rules_for(requests: List[Tuple[str, str]]) -> List[Optional[RecipePlan]]:
+    return [_record_path(_parse_with_rules(*r), "rules") for r in requests]
+
+
+async def _parse_batch(client, requests: List[Tuple[str, str]],
+                       deadline: Optional[float]) -> List[Optional[RecipePlan]]:
+    """
+    Parse several recipes with one request. If the reply doesn't validate
+    (bad JSON, wrong number of recipes, a recipe without steps) the batch is
+    halved and retried, down to single-recipe calls; if the request itself
+    fails (quota, server error) it isn't retried and the recipes are
+    extracted with rules. Every retry shares the
+    same absolute `deadline`; once it's too close for another model round
+    trip, the remaining recipes are extracted with rules.
+    """
+    loop = asyncio.get_running_loop()
+    if deadline is not None and deadline - loop.time() < MIN_MODEL_SECONDS:
+        print(f"No time left to parse {len(requests)} recipes with a model, extracting with rules")
+        return _rules_for(requests)
+    if len(requests) == 1:
+        return [await parse_recipe_from_rag(*requests[0], deadline=deadline)]
+
+    sections = "\n".join(
+        f"=== Recipe {n} ===\nUser wants to make: {recipe_query}\n\nCookbook content:\n{rag_content}\n"
+        for n, (rag_content, recipe_query) in enumerate(requests, 1)
+    )
+    prompt = f"""
+Extract each of the following {len(requests)} recipes from its own cookbook content.
+Return a list with exactly one recipe per section, in the same order.
+
+{sections}
+{_GUIDELINES}
+Extract every recipe with all ingredients and step-by-step instructions.
+"""
+    try:
+        request = _generate(client, "parse_recipe_batch", prompt, List[RecipePlanSchema],
+                            sum(len(c) for c, _ in requests), recipes=len(requests))
+        text = await asyncio.wait_for(request, deadline - loop.time()) if deadline is not None else await request
+        if not text:
+            raise _BatchMismatch("empty reply")
+        parsed = _RECIPE_LIST.validate_json(text)
+        if len(parsed) != len(requests):
+            raise _BatchMismatch(f"expected {len(requests)} recipes, got {len(parsed)}")
+        if not all(p.steps for p in parsed):
+            raise _BatchMismatch("recipe without steps")
+        return [_record_path(_plan_from_schema(p), "primary") for p in parsed]
+    except asyncio.TimeoutError:
+        # Out of time for another model round trip
+        print(f"Batch of {len(requests)} recipes missed the parse deadline, extracting with rules")
+        return _rules_for(requests)
+    except (ValidationError, _BatchMismatch) as e:
+        print(f"Batch of {len(requests)} recipes didn't validate ({e}), splitting it")
+        half = len(requests) // 2
+        first, second = await asyncio.gather(
+            _parse_batch(client, requests[:half], deadline), _parse_batch(client, requests[half:], deadline)
+        )
+        return first + second
+    except Exception as e:
+        # Throttling or a server error: more, smaller requests would only hit the same quota
+        print(f"Batch of {len(requests)} recipes failed ({e}), extracting with rules")
+        return _rules_for(requests)
+
+
+async def parse_recipes_from_rag(requests: List[Tuple[str, str]]) -> List[Optional[RecipePlan]]:
+    """
+    Parse several recipes with as few Gemini requests as possible, e.g. for a
+    meal plan. Requests are packed into batches by prompt size (see
+    split_batches) and the batches run concurrently, all within one
+    RECIPE_PARSE_DEADLINE.
+
+    Args:
+        requests: (rag_content, recipe_query) pairs, as for parse_recipe_from_rag
+
+    Returns:
+        A RecipePlan or None per request, in the same order
+    """
+    if len(requests) <= 1:
+        return [await parse_recipe_from_rag(*r) for r in requests]
+    client = _genai_client()
+    if client is None:
+        return [None] * len(requests)
+
+    # One deadline for the whole call, however the batches end up split
+    deadline = asyncio.get_running_loop().time() + RECIPE_PARSE_DEADLINE if RECIPE_PARSE_DEADLINE > 0 else None
+    batches = split_batches(requests)
+    results = await asyncio.gather(
+        *(_parse_batch(client, [requests[i] for i in batch], deadline) for batch in batches)
+    )
+    plans: List[Optional[RecipePlan]] = [None] * len(requests)
+    for batch, batch_plans in zip(batches, results):
+        for i, plan in zip(batch, batch_plans):
+            plans[i] = plan
+    return plans
@@ -0,0 +1,157 @@
+"""
+Local reranking of retrieved cookbook chunks before recipe parsing.
+
+Vector search returns the top_k chunks whether or not they belong to the
+recipe asked for. This scores each candidate on vector similarity, query
+term overlap, a title match against its heading lines, and which recipe
+sections (ingredients, method) it contains, then keeps the smallest set
+that covers the recipe: the best chunk, plus chunks from the same document
+that add a missing section or continue it onto the following pages.
+Candidates whose own heading names a different recipe are not used to fill
+gaps.
+
+When no candidate shows any recipe structure there is nothing to judge
+coverage by, and the chunks are returned unchanged.
+"""
+import os
+import re
+from typing import List
+
+import numpy as np
+
+from query_cache import normalize_query
+from vector_store import DOCUMENT_KEY
+
+RAG_RERANK = os.getenv("RAG_RERANK", "1") != "0"
+
+# Weights of the per-chunk relevance score
+VECTOR_WEIGHT = 0.35
+OVERLAP_WEIGHT = 0.35
+TITLE_WEIGHT = 0.30
+# Heading lines are short and don't end like a sentence
+MAX_HEADING_WORDS = 8
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_INGREDIENTS_HEADING_RE = re.compile(r"^\s*(?:ingredients|you will need|you'll need)\b", re.IGNORECASE | re.MULTILINE)
+_METHOD_HEADING_RE = re.compile(r"^\s*(?:method|instructions|directions|preparation|steps)\b", re.IGNORECASE | re.MULTILINE)
+_QUANTITY_LINE_RE = re.compile(
+    r"^\s*[-*•]?\s*(?:\d+(?:[./,]\d+)?|[¼½¾⅓⅔])\s*"
+    r"(?:g|kg|ml|l|cups?|tbsp|tsp|tablespoons?|teaspoons?|oz|lbs?|cloves?|pinch)?\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+_NUMBERED_STEP_RE = re.compile(r"^\s*\d+[.)]\s+[A-Za-z]", re.MULTILINE)
+
+
+def _tokens(text: str) -> set[str]:
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+def _is_heading(line: str) -> bool:
+    return (
+        len(line.split()) <= MAX_HEADING_WORDS and not line.endswith((".", ",", ":", ";"))
+        and not _QUANTITY_LINE_RE.match(line) and not _NUMBERED_STEP_RE.match(line)
+    )
+
+
+def _heading_lines(text: str) -> tuple[List[str], bool]:
+    """Heading-like lines of a chunk, and whether the chunk starts with one."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    headings = [line for line in lines if _is_heading(line)]
+    return headings, bool(lines) and _is_heading(lines[0])
+
+
+def _sections(text: str) -> tuple[bool, bool]:
+    """(has ingredients, has method) for one chunk."""
+    ingredients = bool(_INGREDIENTS_HEADING_RE.search(text)) or len(_QUANTITY_LINE_RE.findall(text)) >= 3
+    method = bool(_METHOD_HEADING_RE.search(text)) or len(_NUMBERED_STEP_RE.findall(text)) >= 2
+    return ingredients, method
+
+
+def _page(node) -> int:
+    try:
+        return int(node.metadata.get("page_label", -1))
+    except (TypeError, ValueError):
+        return -1
+
+
+def rerank_nodes(question: str, nodes: list) -> list:
+    """
+    The smallest subset of retrieved `nodes` that covers the recipe in
+    `question`, in document order.
+
+    Args:
+        question: The recipe query the nodes were retrieved for
+        nodes: NodeWithScore results, best first
+
+    Returns:
+        A subset of `nodes` (all of them if none look like recipe text)
+    """
+    if len(nodes) <= 1:
+        return list(nodes)
+    terms = sorted(_tokens(normalize_query(question)))
+    if not terms:
+        return list(nodes)
+
+    texts = [n.node.get_content() for n in nodes]
+    headings = [_heading_lines(t) for t in texts]
+    sections = np.array([_sections(t) for t in texts], dtype=bool)
+    if not sections.any():
+        return list(nodes)
+
+    # Candidates x query terms incidence for the chunk body, and per chunk for each heading line
+    body = np.array([[term in toks for term in terms] for toks in map(_tokens, texts)], dtype=np.float32)
+    heading_hits = [
+        np.array([[term in toks for term in terms] for toks in map(_tokens, lines)], dtype=np.float32).reshape(-1, len(terms))
+        for lines, _ in headings
+    ]
+    # Terms found in fewer candidates tell them apart ("195" in "spicy gumbo no. 195")
+    df = body.sum(axis=0)
+    weights = np.where(df > 0, np.log1p(len(nodes) / np.maximum(df, 1)), 0.0)
+    weights = weights / weights.sum() if weights.sum() > 0 else np.full(len(terms), 1 / len(terms))
+
+    overlap = body @ weights
+    title = np.array([(hits @ weights).max(initial=0.0) for hits in heading_hits], dtype=np.float32)
+    starts_with_heading = np.array([starts for _, starts in headings], dtype=bool)
+    first_heading_match = np.array([
+        hits[0] @ weights if starts else 0.0 for hits, (_, starts) in zip(heading_hits, headings)
+    ], dtype=np.float32)
+
+    vec = np.array([n.score or 0.0 for n in nodes], dtype=np.float32)
+    spread = vec.max() - vec.min()
+    vec = (vec - vec.min()) / spread if spread > 0 else np.ones_like(vec)
+    score = VECTOR_WEIGHT * vec + OVERLAP_WEIGHT * overlap + TITLE_WEIGHT * title
+
+    anchor = int(np.argmax(score))
+    selected = [anchor]
+    missing = ~sections[anchor]
+    document = nodes[anchor].metadata.get(DOCUMENT_KEY)
+    anchor_page = _page(nodes[anchor])
+    # A chunk that starts with some other recipe's title is that recipe, not the rest of ours
+    foreign = starts_with_heading & (first_heading_match == 0) & (title[anchor] > 0)
+
+    candidates = [
+        i for i in range(len(nodes))
+        if i != anchor and nodes[i].metadata.get(DOCUMENT_KEY) == document and not foreign[i]
+    ]
+    # Neighbouring pages first (a recipe running over a page break), then by score
+    candidates.sort(key=lambda i: (abs(_page(nodes[i]) - anchor_page) > 1, -score[i]))
+    for i in candidates:
+        if not missing.any():
+            break
+        if (sections[i] & missing).any():
+            selected.append(i)
+            missing &= ~sections[i]
+
+    # A complete-looking anchor can still run onto the next page (steps 4-6 after 1-3):
+    # keep following pages of the same document that open without a heading of their own
+    if anchor_page >= 0:
+        last_page = anchor_page
+        for i in sorted(range(len(nodes)), key=lambda i: _page(nodes[i])):
+            if i in selected or nodes[i].metadata.get(DOCUMENT_KEY) != document or starts_with_heading[i]:
+                continue
+            if _page(nodes[i]) == last_page + 1:
+                selected.append(i)
+                last_page += 1
+
+    selected.sort(key=lambda i: (_page(nodes[i]), i))
+    return [nodes[i] for i in selected]
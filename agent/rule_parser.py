@@ -0,0 +1,162 @@
+"""
+Rule-based recipe extraction from retrieved cookbook text.
+
+The last resort when Gemini can't parse a recipe in time (see
+recipe_parser's deadline): ingredient and step regexes over the RAG
+context. The result is rougher than the model's (no cleanup, generic
+emojis, no step dependencies) but arrives in milliseconds.
+"""
+import re
+from typing import List, Optional
+
+from query_cache import normalize_query
+from recipe_parser import Ingredient, RecipePlan, RecipeStep
+
+_SOURCE_PREFIX_RE = re.compile(r"^\[Source \d+\]:\s*")
+_INGREDIENTS_HEADING_RE = re.compile(r"^(?:ingredients|you will need|you'll need)\b", re.IGNORECASE)
+_METHOD_HEADING_RE = re.compile(r"^(?:method|instructions|directions|preparation|steps)\b", re.IGNORECASE)
+_INGREDIENT_RE = re.compile(
+    r"^[-*•]?\s*(?P<quantity>(?:\d+(?:[./]\d+)?|[¼½¾⅓⅔])(?:\s*-\s*\d+)?\s*"
+    r"(?:g|kg|ml|l|cups?|tbsp|tsp|tablespoons?|teaspoons?|oz|lbs?|cloves?|pinch(?:es)?|cans?|slices?)?\.?)"
+    r"\s+(?:of\s+)?(?P<name>[^\d].*)$",
+    re.IGNORECASE,
+)
+_BULLET_RE = re.compile(r"^[-*•]\s*(?P<name>.+)$")
+_NOTES_RE = re.compile(r"^(?:notes?|tips?|variations?|to serve)\b", re.IGNORECASE)
+_NUMBERED_STEP_RE = re.compile(r"^(?P<number>\d+)[.)]\s+(?P<instruction>[A-Za-z].*)$")
+_DURATION_RE = re.compile(r"(\d+)\s*(?:-\s*\d+\s*)?(minutes?|mins?|hours?|hrs?)\b", re.IGNORECASE)
+_SERVES_RE = re.compile(r"\b(?:serves|servings?:?|makes)\s+(\d+(?:\s*-\s*\d+)?)", re.IGNORECASE)
+_PREP_RE = re.compile(r"\bprep(?:aration)?(?: time)?:?\s+(\d+\s*(?:minutes?|mins?|hours?|hrs?))", re.IGNORECASE)
+_COOK_RE = re.compile(r"\bcook(?:ing)?(?: time)?:?\s+(\d+\s*(?:minutes?|mins?|hours?|hrs?))", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_EMOJIS = {
+    "onion": "🧅", "garlic": "🧄", "tomato": "🍅", "carrot": "🥕", "potato": "🥔", "chili": "🌶️",
+    "pepper": "🫑", "lemon": "🍋", "lime": "🍋", "egg": "🥚", "milk": "🥛", "cream": "🥛",
+    "butter": "🧈", "cheese": "🧀", "parmesan": "🧀", "chicken": "🍗", "beef": "🥩", "pork": "🥓",
+    "fish": "🐟", "salmon": "🐟", "prawn": "🦐", "shrimp": "🦐", "rice": "🍚", "pasta": "🍝",
+    "noodle": "🍜", "flour": "🌾", "bread": "🍞", "oil": "🫒", "salt": "🧂", "sugar": "🍬",
+    "mushroom": "🍄", "basil": "🌿", "parsley": "🌿", "coriander": "🌿", "herb": "🌿",
+    "ginger": "🫚", "apple": "🍎", "banana": "🍌", "stock": "🍲", "water": "💧", "wine": "🍷",
+}
+DEFAULT_EMOJI = "🥄"
+# A step without a number is any sentence-like line in the method section this long
+MIN_STEP_CHARS = 20
+
+
+def _emoji(name: str) -> str:
+    lowered = name.lower()
+    for word, emoji in _EMOJIS.items():
+        if word in lowered:
+            return emoji
+    return DEFAULT_EMOJI
+
+
+def _duration_minutes(text: str) -> Optional[int]:
+    match = _DURATION_RE.search(text)
+    if not match:
+        return None
+    amount = int(match.group(1))
+    return amount * 60 if match.group(2).lower().startswith(("hour", "hr")) else amount
+
+
+def _is_title(line: str) -> bool:
+    return (
+        len(line.split()) <= 8 and not line.endswith((".", ",", ":", ";"))
+        and not _INGREDIENT_RE.match(line) and not _NUMBERED_STEP_RE.match(line)
+        and not _BULLET_RE.match(line)
+    )
+
+
+def _recipe_lines(lines: List[str], recipe_query: str) -> tuple[List[str], Optional[str]]:
+    """The lines of the recipe matching the query, and its title if one was found."""
+    terms = set(_TOKEN_RE.findall(normalize_query(recipe_query)))
+    best, best_score = None, 0.0
+    for i, line in enumerate(lines):
+        if _is_title(line) and terms:
+            score = len(terms & set(_TOKEN_RE.findall(line.lower()))) / len(terms)
+            if score > best_score:
+                best, best_score = i, score
+    if best is None:
+        return lines, None
+
+    # From the title to the next title after the recipe has some steps
+    end = len(lines)
+    seen_steps = False
+    for i in range(best + 1, len(lines)):
+        line = lines[i]
+        if _NUMBERED_STEP_RE.match(line):
+            seen_steps = True
+        elif seen_steps and _is_title(line) and not _METHOD_HEADING_RE.match(line) \
+                and not _INGREDIENTS_HEADING_RE.match(line):
+            end = i
+            break
+    return lines[best + 1:end], lines[best]
+
+
+def extract_recipe(rag_content: str, recipe_query: str) -> Optional[RecipePlan]:
+    """
+    Pull a recipe out of retrieved cookbook text with regexes.
+
+    Args:
+        rag_content: CookbookRAG.query output
+        recipe_query: The recipe the user asked for
+
+    Returns:
+        A RecipePlan, or None if no steps could be found
+    """
+    lines = [_SOURCE_PREFIX_RE.sub("", line).strip() for line in rag_content.splitlines()]
+    lines = [line for line in lines if line]
+    lines, title = _recipe_lines(lines, recipe_query)
+    text = "\n".join(lines)
+
+    ingredients: List[Ingredient] = []
+    steps: List[RecipeStep] = []
+    section = None
+    for line in lines:
+        if _INGREDIENTS_HEADING_RE.match(line):
+            section = "ingredients"
+            continue
+        if _METHOD_HEADING_RE.match(line):
+            section = "method"
+            continue
+        if _NOTES_RE.match(line):
+            section = None
+            continue
+
+        step = _NUMBERED_STEP_RE.match(line)
+        if step:
+            section = "method"
+            instruction = step.group("instruction")
+            steps.append(RecipeStep(step_number=len(steps) + 1, instruction=instruction,
+                                    duration_minutes=_duration_minutes(instruction)))
+            continue
+        ingredient = _INGREDIENT_RE.match(line)
+        if ingredient and section != "method":
+            name = ingredient.group("name").strip()
+            ingredients.append(Ingredient(name=name, quantity=ingredient.group("quantity").strip(),
+                                          emoji=_emoji(name)))
+            continue
+        bullet = _BULLET_RE.match(line)
+        if bullet and section == "ingredients":
+            name = bullet.group("name").strip()
+            ingredients.append(Ingredient(name=name, quantity="", emoji=_emoji(name)))
+        elif section == "method" and len(line) >= MIN_STEP_CHARS and not _is_title(line):
+            steps.append(RecipeStep(step_number=len(steps) + 1, instruction=line,
+                                    duration_minutes=_duration_minutes(line)))
+
+    if not steps:
+        return None
+
+    serves = _SERVES_RE.search(text)
+    prep = _PREP_RE.search(text)
+    cook = _COOK_RE.search(text)
+    cook_minutes = sum(s.duration_minutes or 0 for s in steps)
+    return RecipePlan(
+        name=title or recipe_query.title(),
+        servings=f"{serves.group(1)} servings" if serves else "",
+        prep_time=prep.group(1) if prep else "",
+        cook_time=cook.group(1) if cook else (f"{cook_minutes} mins" if cook_minutes else ""),
+        ingredients=ingredients,
+        steps=steps,
+    )
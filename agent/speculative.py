@@ -0,0 +1,163 @@
+"""
+Speculative cookbook retrieval from user speech.
+
+While the user is still talking, interim transcripts are scanned for likely
+recipe or ingredient phrases ("I want to make the lasagna" -> "lasagna") and
+CookbookRAG retrieval for them is started into the query cache. By the time
+the realtime model calls search_cookbook or generate_recipe_plan, the result
+is usually already there.
+
+Each guess waits out a short cancellation window first: interim transcripts
+get revised as the user keeps talking, and a guess that no longer appears in
+the latest transcript is cancelled before it costs an embedding request.
+"""
+import asyncio
+import os
+import re
+
+from metrics import counter
+
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") != "0"
+# Seconds an interim guess must survive before retrieval starts
+SPECULATIVE_WINDOW = float(os.getenv("SPECULATIVE_WINDOW", "0.3"))
+# generate_recipe_plan retrieves 5 chunks; a 5-chunk entry also serves search_cookbook's 3
+SPECULATIVE_TOP_K = 5
+MAX_PHRASES = 2
+MAX_PHRASE_WORDS = 4
+
+SPECULATIONS = counter("souschef_speculative_retrievals_total", "Speculative retrievals by outcome")
+
+# Cooking verbs after which the user usually names a dish or ingredient. Plain
+# prepositions ("about", "with") are not triggers: they start most everyday
+# sentences, and every guess costs an embedding request from the shared quota.
+_TRIGGER_RE = re.compile(
+    r"\b(?:make|making|cook|cooking|bake|baking|prepare|grill|roast|recipe for|recipes for)\s+(?=([^,.?!;]+))"
+)
+# "the lasagna recipe", "grandma's apple pie recipe": the words just before "recipe"
+_RECIPE_NOUN_RE = re.compile(r"([a-z' -]+?)\s+recipes?\b")
+_WORD_RE = re.compile(r"[a-z][a-z'-]*")
+# A phrase ends at the first of these
+_CLAUSE_BREAK = {
+    "and", "then", "for", "because", "so", "but", "please", "tonight", "today", "tomorrow",
+    "now", "later", "if", "from", "in", "that", "which", "is", "it", "right",
+}
+_SKIP = {
+    "a", "an", "the", "my", "your", "some", "to", "that", "this", "me", "us",
+    "recipe", "recipes", "dish", "something", "like", "um", "uh",
+}
+# May open the phrase after a verb: "make something with chicken", "cook using leftovers"
+_LEADING_SKIP = {"with", "using"}
+# Short replies that steer the conversation rather than name food
+_COMMANDS = {
+    "yes", "yeah", "yep", "no", "nope", "ok", "okay", "sure", "thanks", "thank", "you", "next", "back",
+    "previous", "done", "start", "stop", "go", "step", "repeat", "again", "let's", "hi", "hello", "hey",
+    "wait", "pause", "cancel", "timer", "what", "how", "why", "help", "cool", "great", "nice",
+}
+# Words that describe a recipe or the conversation rather than name a dish
+_NOT_FOOD = {
+    "good", "quick", "easy", "simple", "favorite", "favourite", "new", "other", "another", "same",
+    "first", "last", "whole", "different", "any", "one", "sense", "progress", "time", "mistake",
+    "i", "we", "love", "need", "want", "have", "got", "find", "found", "read", "follow", "following",
+    "of", "at", "on", "about", "all", "more", "much", "sure", "better", "worse", "out",
+}
+
+
+def _is_food_phrase(words: list[str]) -> bool:
+    return any(w not in _COMMANDS and w not in _NOT_FOOD for w in words)
+
+
+def _recipe_noun_phrase(before: str) -> list[str]:
+    """Up to MAX_PHRASE_WORDS words right before "recipe", stopping at the first non-dish word."""
+    words = []
+    for word in reversed(_WORD_RE.findall(before)):
+        if word in _SKIP or word in _CLAUSE_BREAK or word in _COMMANDS or word in _NOT_FOOD:
+            break
+        words.insert(0, word)
+        if len(words) == MAX_PHRASE_WORDS:
+            break
+    return words
+
+
+def extract_phrases(transcript: str) -> list[str]:
+    """
+    Likely dish or ingredient phrases in a (possibly partial) transcript,
+    most recent last. Returns [] if nothing looks like a cookbook query.
+    """
+    text = transcript.lower()
+    found = []  # (position, phrase)
+    for match in _TRIGGER_RE.finditer(text):
+        words = []
+        for word in _WORD_RE.findall(match.group(1)):
+            if word in _CLAUSE_BREAK:
+                break
+            if word in _SKIP or (not words and word in _LEADING_SKIP):
+                continue
+            words.append(word)
+            if len(words) == MAX_PHRASE_WORDS:
+                break
+        if words and _is_food_phrase(words):
+            found.append((match.start(), " ".join(words)))
+    for match in _RECIPE_NOUN_RE.finditer(text):
+        words = _recipe_noun_phrase(match.group(1))
+        if words and _is_food_phrase(words):
+            found.append((match.end(), " ".join(words)))
+    phrases = [phrase for _, phrase in sorted(found)]
+
+    if not phrases:
+        # A bare answer like "lasagna" or "chicken tikka masala"
+        words = [w for w in _WORD_RE.findall(text) if w not in _SKIP]
+        if 0 < len(words) <= 3 and not any(w in _CLAUSE_BREAK or w in _COMMANDS or w in _NOT_FOOD for w in words):
+            phrases.append(" ".join(words))
+
+    return list(dict.fromkeys(phrases))[-MAX_PHRASES:]
+
+
+class SpeculativeRetriever:
+    """Feeds user transcripts into speculative CookbookRAG.prefetch calls."""
+
+    def __init__(self, rag, window: float = SPECULATIVE_WINDOW, top_k: int = SPECULATIVE_TOP_K):
+        self.rag = rag
+        self.window = window
+        self.top_k = top_k
+        self._pending: dict[str, asyncio.Task] = {}
+
+    def on_transcript(self, transcript: str, is_final: bool) -> None:
+        """Call from the event loop for every interim and final user transcript."""
+        if not SPECULATIVE_RETRIEVAL or not self.rag.is_available():
+            return
+        phrases = extract_phrases(transcript)
+
+        # The user kept talking and the guess is gone from the transcript
+        for phrase, task in list(self._pending.items()):
+            if phrase not in phrases:
+                task.cancel()
+                del self._pending[phrase]
+
+        for phrase in phrases:
+            if phrase in self._pending or self.rag.is_cached(phrase, self.top_k):
+                continue
+            # A final transcript won't be revised, so there's nothing to wait for
+            delay = 0.0 if is_final else self.window
+            self._pending[phrase] = asyncio.create_task(self._prefetch(phrase, delay))
+
+    async def _prefetch(self, phrase: str, delay: float) -> None:
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            SPECULATIONS.inc(result="cancelled")
+            raise
+        # Past the window; from here the query cache tracks it as in flight
+        if self._pending.get(phrase) is asyncio.current_task():
+            del self._pending[phrase]
+        SPECULATIONS.inc(result="started")
+        try:
+            await asyncio.to_thread(self.rag.prefetch, phrase, self.top_k)
+        except Exception as e:
+            SPECULATIONS.inc(result="failed")
+            print(f"Speculative retrieval for '{phrase}' failed: {e}")
+
+    async def aclose(self) -> None:
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
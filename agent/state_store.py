@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+STATE_DB = Path(os.getenv("SOUSCHEF_STATE_DB", Path(__file__).parent / ".state" / "sessions.sqlite3"))
+FLUSH_INTERVAL = 0.5          # seconds between write-behind batches
+STATE_TTL = 12 * 60 * 60      # saved sessions older than this are not resumed
+# Identities every visitor can share (the token route's default): never used as state keys
+SHARED_IDENTITIES = {"", "user"}
+
+
+class SessionStateStore:
+    """
+    Local SQLite store for per-user cooking state (recipe progress, shopping
+    list, timers) so a reconnecting user resumes without any model calls.
+
+    `checkpoint` only marks a key dirty; a background task snapshots and writes
+    all dirty keys in one transaction every FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self, path: Path = STATE_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            " key TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._dirty: dict[str, Callable[[], dict]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def load(self, key: str) -> Optional[dict]:
+        """Return the saved state for `key`, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, updated_at FROM session_state WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        state, updated_at = row
+        if time.time() - updated_at > STATE_TTL:
+            return None
+        try:
+            return json.loads(state)
+        except json.JSONDecodeError:
+            return None
+
+    def checkpoint(self, key: str, snapshot: Callable[[], dict]) -> None:
+        """
+        Schedule `key` to be saved. `snapshot` is called at flush time, so a
+        burst of changes costs a single serialization and write.
+        """
+        self._dirty[key] = snapshot
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write all pending checkpoints now."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        now = time.time()
+        rows = []
+        for key, snapshot in dirty.items():
+            try:
+                rows.append((key, json.dumps(snapshot()), now))
+            except Exception as e:
+                print(f"Error snapshotting session state for {key}: {e}")
+        if rows:
+            await asyncio.to_thread(self._write, rows)
+
+    def _write(self, rows: list[tuple]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO session_state (key, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                rows,
+            )
+
+
+def state_key(identity: Optional[str]) -> Optional[str]:
+    """
+    The saved-state key for a participant, or None if the identity doesn't
+    name one browser (the frontend sends a per-browser id as its username).
+    """
+    if not identity or identity in SHARED_IDENTITIES:
+        return None
+    return identity
+
+
+_store_instance: Optional[SessionStateStore] = None
+
+def get_state_store() -> SessionStateStore:
+    """Get or create the process-wide state store."""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = SessionStateStore()
+    return _store_instance
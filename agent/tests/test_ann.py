@@ -0,0 +1,63 @@
+import numpy as np
+
+from ann import IVFIndex, auto_nlist
+
+DIM = 64
+
+
+def _clustered(n: int = 4000, clusters: int = 40, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIM))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, DIM))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def test_every_row_is_in_exactly_one_list():
+    vectors = _clustered()
+    index = IVFIndex.train(vectors)
+    assert index.nlist == auto_nlist(len(vectors))
+    everything = index.candidates(vectors[0], nprobe=index.nlist)
+    assert np.array_equal(everything, np.arange(len(vectors)))
+
+
+def test_probing_a_few_lists_finds_the_true_neighbours():
+    vectors = _clustered()
+    index = IVFIndex.train(vectors, nprobe=8)
+    queries = vectors[:50]
+    found = 0
+    for q in queries:
+        exact = set(np.argsort(-(vectors @ q))[:10])
+        candidates = index.candidates(q)
+        assert len(candidates) < len(vectors) / 2
+        found += len(exact & set(candidates))
+    assert found / (10 * len(queries)) >= 0.9
+
+
+def test_added_rows_continue_the_ids_and_trigger_a_retrain():
+    vectors = _clustered(1000)
+    index = IVFIndex.train(vectors[:200])
+    index.add(vectors[200:])
+    assert len(index.assignments) == 1000
+    assert index.needs_retrain()
+    assert 999 in index.candidates(vectors[999], nprobe=index.nlist)
+
+
+def test_keep_renumbers_rows_like_the_compacted_store():
+    vectors = _clustered(500)
+    index = IVFIndex.train(vectors)
+    keep = np.arange(0, 500, 2)
+    index.keep(keep)
+    everything = index.candidates(vectors[0], nprobe=index.nlist)
+    assert np.array_equal(everything, np.arange(len(keep)))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    vectors = _clustered(500)
+    index = IVFIndex.train(vectors, nprobe=4)
+    index.save(tmp_path)
+    loaded = IVFIndex.load(tmp_path)
+    assert loaded.params() == index.params()
+    assert np.array_equal(loaded.candidates(vectors[3]), index.candidates(vectors[3]))
+    assert IVFIndex.load(tmp_path, nprobe=2).nprobe == 2
+    assert IVFIndex.load(tmp_path / "missing") is None
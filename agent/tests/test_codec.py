@@ -0,0 +1,54 @@
+import re
+from pathlib import Path
+
+import pytest
+
+import codec
+
+# One representative message per type the session's DataDispatcher handles
+DISPATCHED = {
+    "hello": {"encodings": ["msgpack", "json"], "plans": [{"id": "p1", "version": "v1"}]},
+    "ui_step_change": {"action": "next", "step_index": 3},
+    "plan_missing": {"id": "p1"},
+    "timer_cancel": {"id": "timer-1700000000000"},
+    "request_recipe": {"title": "Chicken Curry", "book": "Grandma's cards"},
+}
+
+
+def _dispatched_types() -> set[str]:
+    source = (Path(__file__).parent.parent / "main.py").read_text()
+    return set(re.findall(r'@dispatcher\.on\("([a-z_]+)"', source))
+
+
+def test_every_dispatched_type_has_a_schema_and_a_case_here():
+    types = _dispatched_types()
+    assert types == set(DISPATCHED)
+    assert types <= set(codec.MESSAGE_SCHEMAS)
+
+
+@pytest.mark.parametrize("msg_type", sorted(DISPATCHED))
+def test_schema_keeps_every_field(msg_type):
+    message = DISPATCHED[msg_type]
+    schema = codec.MESSAGE_SCHEMAS[msg_type]
+    assert codec._unpack(codec._pack(message, schema), schema) == message
+
+
+@pytest.mark.parametrize("msg_type", sorted(DISPATCHED))
+@pytest.mark.parametrize("encoding", [codec.ENCODING_JSON, codec.ENCODING_MSGPACK])
+def test_wire_round_trip(msg_type, encoding):
+    if encoding == codec.ENCODING_MSGPACK and codec.msgpack is None:
+        pytest.skip("msgpack not installed")
+    message = {"type": msg_type, **DISPATCHED[msg_type]}
+    assert codec.decode(codec.encode(message, encoding)) == message
+
+
+def test_negotiate_prefers_compact_only_when_both_sides_support_it():
+    assert codec.negotiate(None) == codec.ENCODING_JSON
+    assert codec.negotiate(["json"]) == codec.ENCODING_JSON
+    expected = codec.ENCODING_MSGPACK if codec.msgpack is not None else codec.ENCODING_JSON
+    assert codec.negotiate(["msgpack", "json"]) == expected
+
+
+def test_ui_schemas_are_up_to_date():
+    generated = Path(__file__).parent.parent.parent / "frontend" / "lib" / "messageSchemas.ts"
+    assert generated.read_text() == codec.typescript_schemas(), f"Regenerate with `{codec.TS_SCHEMA_COMMAND}`"
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from meal_scheduler import schedule_meal
+from recipe_parser import RecipePlan, RecipeStep
+from tools.cooking import CookingMixin
+from tools.timer import TimerMixin
+
+
+class _Publisher:
+    def __init__(self):
+        self.sent = []
+
+    async def publish(self, message: dict) -> None:
+        self.sent.append(message)
+
+
+class _Agent(CookingMixin, TimerMixin):
+    def __init__(self):
+        self._publisher = _Publisher()
+        self.checkpoints = 0
+
+    def _checkpoint(self) -> None:
+        self.checkpoints += 1
+
+
+def _plan(name: str, steps: list[tuple]) -> RecipePlan:
+    return RecipePlan(
+        name=name, servings="", prep_time="", cook_time="", ingredients=[],
+        steps=[RecipeStep(step_number=i + 1, instruction=text, duration_minutes=minutes)
+               for i, (text, minutes) in enumerate(steps)],
+    )
+
+
+def _cooking_meal() -> _Agent:
+    plans = [
+        _plan("Stew", [("Brown the beef.", 10), ("Simmer the stew for 90 minutes.", 90)]),
+        _plan("Bread", [("Knead the dough.", 10), ("Bake in the oven for 30 minutes.", 30)]),
+    ]
+    agent = _Agent()
+    agent.meal_timeline = schedule_meal(plans)
+    agent.current_recipe = agent.meal_timeline.to_recipe_plan(plans)
+    agent.cooking_mode_active = True
+    return agent
+
+
+def test_ui_advance_starts_the_timer_of_a_hands_off_meal_step():
+    agent = _cooking_meal()
+    index = next(i for i, s in enumerate(agent.meal_timeline.steps) if s.hands_off)
+
+    asyncio.run(agent.ui_step_change("next", index))
+
+    assert agent.current_recipe.current_step_index == index
+    assert agent.current_recipe.steps[0].completed
+    timers = [m for m in agent._publisher.sent if m["type"] == "timer"]
+    assert len(timers) == 1 and timers[0]["action"] == "start"
+    assert timers[0]["label"] == agent.meal_timeline.steps[index].recipe
+    assert agent.checkpoints >= 1
+
+    # Going back and forward again doesn't start a second timer
+    asyncio.run(agent.ui_step_change("previous", 0))
+    asyncio.run(agent.ui_step_change("next", index))
+    assert len([m for m in agent._publisher.sent if m["type"] == "timer"]) == 1
+
+
+def test_ui_advance_outside_cooking_mode_is_ignored():
+    agent = _cooking_meal()
+    agent.cooking_mode_active = False
+    asyncio.run(agent.ui_step_change("next", 1))
+    assert agent.current_recipe.current_step_index == 0
+    assert agent._publisher.sent == []
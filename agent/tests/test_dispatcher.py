@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import codec
+from dispatcher import DataDispatcher
+
+
+def _packet(message: dict) -> bytes:
+    return json.dumps(message).encode()
+
+
+def test_each_packet_is_decoded_once(monkeypatch):
+    decoded = []
+    real_decode = codec.decode
+
+    def counting_decode(payload):
+        decoded.append(payload)
+        return real_decode(payload)
+
+    monkeypatch.setattr(codec, "decode", counting_decode)
+    dispatcher = DataDispatcher()
+    seen = []
+    dispatcher.on("hello")(seen.append)
+
+    dispatcher.handle_packet(_packet({"type": "hello", "encodings": ["json"]}))
+    assert len(decoded) == 1
+    assert seen == [{"type": "hello", "encodings": ["json"]}]
+
+
+def test_sync_handlers_run_inline_and_unknown_types_are_ignored():
+    dispatcher = DataDispatcher()
+    seen = []
+    dispatcher.on("timer_cancel")(seen.append)
+
+    dispatcher.handle_packet(_packet({"type": "timer_cancel", "id": "t1"}))
+    dispatcher.handle_packet(_packet({"type": "not_registered"}))
+    assert seen == [{"type": "timer_cancel", "id": "t1"}]
+
+
+def test_undecodable_packets_and_handler_errors_are_dropped():
+    dispatcher = DataDispatcher()
+
+    @dispatcher.on("boom")
+    def boom(data):
+        raise RuntimeError("handler failed")
+
+    dispatcher.handle_packet(b"\xff not a message")
+    dispatcher.handle_packet(_packet({"type": "boom"}))
+
+
+def test_rate_limited_messages_beyond_the_burst_are_dropped():
+    dispatcher = DataDispatcher()
+    seen = []
+    dispatcher.on("ui_step_change", rate=1, burst=2)(seen.append)
+
+    for i in range(5):
+        dispatcher.handle_packet(_packet({"type": "ui_step_change", "step_index": i}))
+    assert [m["step_index"] for m in seen] == [0, 1]
+
+
+def test_async_handlers_are_capped_and_extra_packets_dropped():
+    async def run():
+        dispatcher = DataDispatcher(max_tasks=2)
+        release = asyncio.Event()
+        started = []
+
+        @dispatcher.on("request_recipe")
+        async def handler(data):
+            started.append(data["title"])
+            await release.wait()
+
+        for title in ("a", "b", "c"):
+            dispatcher.handle_packet(_packet({"type": "request_recipe", "title": title}))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.sleep(0.01)
+        # The group has room again once the running handlers finish
+        dispatcher.handle_packet(_packet({"type": "request_recipe", "title": "d"}))
+        await asyncio.sleep(0)
+        await dispatcher.aclose()
+        return started
+
+    assert asyncio.run(run()) == ["a", "b", "d"]
+
+
+def test_aclose_cancels_running_handlers_and_ignores_later_packets():
+    async def run():
+        dispatcher = DataDispatcher()
+        cancelled = []
+        seen = []
+
+        @dispatcher.on("slow")
+        async def slow(data):
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(data["type"])
+                raise
+
+        dispatcher.on("fast")(seen.append)
+        dispatcher.handle_packet(_packet({"type": "slow"}))
+        await asyncio.sleep(0)
+        await dispatcher.aclose()
+        dispatcher.handle_packet(_packet({"type": "fast"}))
+        return cancelled, seen
+
+    assert asyncio.run(run()) == (["slow"], [])
@@ -0,0 +1,85 @@
+import pytest
+
+from embed_scheduler import EmbedScheduler, EmbeddingError, is_retryable
+
+httpx = pytest.importorskip("httpx")
+errors = pytest.importorskip("google.genai.errors")
+
+_REQUEST = httpx.Request("POST", "https://generativelanguage.googleapis.com/")
+
+
+def _api_error(code: int) -> Exception:
+    cls = errors.ServerError if code >= 500 else errors.ClientError
+    return cls(code, {"error": {"code": code, "message": "x", "status": "X"}})
+
+
+@pytest.mark.parametrize("error", [
+    ConnectionResetError(),
+    TimeoutError(),
+    httpx.ConnectTimeout("timed out", request=_REQUEST),
+    httpx.ReadTimeout("timed out", request=_REQUEST),
+    httpx.PoolTimeout("timed out", request=_REQUEST),
+    httpx.ConnectError("refused", request=_REQUEST),
+    httpx.ReadError("reset", request=_REQUEST),
+    httpx.WriteError("broken pipe", request=_REQUEST),
+    httpx.RemoteProtocolError("peer closed connection", request=_REQUEST),
+    _api_error(408),
+    _api_error(429),
+    _api_error(500),
+    _api_error(503),
+], ids=lambda e: f"{type(e).__name__}-{getattr(e, 'code', '')}")
+def test_transient_errors_are_retried(error):
+    assert is_retryable(error)
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("bad input"),
+    httpx.UnsupportedProtocol("ftp://", request=_REQUEST),
+    httpx.LocalProtocolError("bad header", request=_REQUEST),
+    _api_error(400),
+    _api_error(403),
+    _api_error(404),
+], ids=lambda e: f"{type(e).__name__}-{getattr(e, 'code', '')}")
+def test_permanent_errors_are_not_retried(error):
+    assert not is_retryable(error)
+
+
+def _scheduler() -> EmbedScheduler:
+    return EmbedScheduler(rpm=60000, max_concurrency=2, max_retries=3, base_delay=0, max_delay=0)
+
+
+def test_network_error_is_retried_until_it_succeeds():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise httpx.ReadTimeout("timed out", request=_REQUEST)
+        return [0.1]
+
+    assert _scheduler().call(flaky) == [0.1]
+    assert len(calls) == 3
+
+
+def test_permanent_error_fails_after_one_attempt():
+    calls = []
+
+    def bad():
+        calls.append(1)
+        raise _api_error(400)
+
+    with pytest.raises(EmbeddingError):
+        _scheduler().call(bad)
+    assert len(calls) == 1
+
+
+def test_quota_exhaustion_gives_up_after_the_retry_budget():
+    calls = []
+
+    def throttled():
+        calls.append(1)
+        raise _api_error(429)
+
+    with pytest.raises(EmbeddingError):
+        _scheduler().call(throttled, max_retries=2)
+    assert len(calls) == 3
@@ -0,0 +1,62 @@
+from meal_scheduler import schedule_meal
+from recipe_parser import RecipePlan, RecipeStep
+
+
+def _plan(name: str, steps: list[tuple]) -> RecipePlan:
+    return RecipePlan(
+        name=name,
+        servings="4 servings",
+        prep_time="",
+        cook_time="",
+        ingredients=[],
+        steps=[
+            RecipeStep(step_number=i + 1, instruction=text, duration_minutes=minutes, depends_on=depends_on)
+            for i, (text, minutes, depends_on) in enumerate(steps)
+        ],
+    )
+
+
+def _meal():
+    roast = _plan("Roast Chicken", [
+        ("Season the chicken.", 5, None),
+        ("Roast in the oven for 60 minutes.", 60, None),
+        ("Let it rest for 10 minutes.", 10, None),
+        ("Carve the chicken.", 5, None),
+    ])
+    # Gravy base and sauce can be made independently, then combined
+    sauce = _plan("Pan Sauce", [
+        ("Chop the shallots.", 4, []),
+        ("Reduce the stock by half.", 8, []),
+        ("Whisk the shallots into the stock.", 3, [1, 2]),
+    ])
+    potatoes = _plan("Mashed Potatoes", [
+        ("Peel and chop the potatoes.", 10, None),
+        ("Simmer the potatoes for 20 minutes.", 20, None),
+        ("Mash with butter.", 5, None),
+    ])
+    return [roast, sauce, potatoes]
+
+
+def test_hands_on_steps_never_overlap():
+    timeline = schedule_meal(_meal())
+    hands_on = sorted((s.start_minute, s.end_minute) for s in timeline.steps if not s.hands_off)
+    assert hands_on
+    for (_, end), (start, _) in zip(hands_on, hands_on[1:]):
+        assert start >= end
+
+
+def test_dependencies_are_respected():
+    plans = _meal()
+    timeline = schedule_meal(plans)
+    by_step = {(s.recipe, s.step_number): s for s in timeline.steps}
+    for plan in plans:
+        for i, step in enumerate(plan.steps):
+            needs = step.depends_on if step.depends_on is not None else ([step.step_number - 1] if i else [])
+            for n in needs:
+                assert by_step[(plan.name, step.step_number)].start_minute >= by_step[(plan.name, n)].end_minute
+
+
+def test_interleaving_is_never_slower_than_cooking_in_sequence():
+    timeline = schedule_meal(_meal())
+    assert timeline.total_minutes <= timeline.sequential_minutes
+    assert len(timeline.steps) == 10
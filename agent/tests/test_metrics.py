@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+import tracing
+from metrics import timed_tool
+
+
+class _Agent:
+    _turn_trace_id = None
+
+    def __init__(self):
+        self._turn_started_at = time.perf_counter()
+
+    @timed_tool
+    async def tool(self):
+        return "ok"
+
+
+def test_only_the_first_tool_call_after_user_input_measures_from_it(monkeypatch):
+    recorded = []
+    real_span = tracing.span
+
+    def span(name, trace_id=None, **attrs):
+        recorded.append(attrs)
+        return real_span(name, trace_id=trace_id, **attrs)
+
+    monkeypatch.setattr(tracing, "span", span)
+    agent = _Agent()
+    asyncio.run(agent.tool())
+    asyncio.run(agent.tool())
+
+    assert "since_user_input_ms" in recorded[0]
+    assert "since_user_input_ms" not in recorded[1]
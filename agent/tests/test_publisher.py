@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from publisher import DataPublisher
+
+
+class _Room:
+    def __init__(self):
+        self.sent = []
+        self.reliable = []
+        self.local_participant = self
+
+    async def publish_data(self, payload, reliable=True):
+        self.sent.append(json.loads(payload))
+        self.reliable.append(reliable)
+
+
+def _plan(plan_id: str = "p1", version: str = "v1") -> dict:
+    steps = [
+        {"step_number": n, "instruction": f"Step {n}", "duration_minutes": None, "tips": None,
+         "completed": False, "depends_on": None}
+        for n in (1, 2, 3)
+    ]
+    return {"type": "recipe_plan", "plan": {"id": plan_id, "version": version, "title": "Curry",
+                                            "steps": steps, "current_step_index": 0}}
+
+
+def _ref(plan_id: str = "p1", version: str = "v1", index: int = 2, completed=(0, 1)) -> dict:
+    return {"type": "recipe_plan_ref", "id": plan_id, "version": version,
+            "current_step_index": index, "completed_steps": list(completed)}
+
+
+def _publish_all(*messages) -> list[dict]:
+    async def run():
+        room = _Room()
+        publisher = DataPublisher(room)
+        for message in messages:
+            await publisher.publish(message)
+        await publisher.aclose()
+        return room.sent
+    return asyncio.run(run())
+
+
+def test_ref_to_a_queued_plan_updates_it_instead_of_replacing_it():
+    sent = _publish_all(_plan(), _ref())
+    assert [m["type"] for m in sent] == ["recipe_plan"]
+    plan = sent[0]["plan"]
+    assert plan["current_step_index"] == 2
+    assert [s["completed"] for s in plan["steps"]] == [True, True, False]
+
+
+def test_ref_to_another_plan_still_supersedes_the_queued_one():
+    sent = _publish_all(_plan("p1"), _ref("p2"))
+    assert [m["type"] for m in sent] == ["recipe_plan_ref"]
+    assert sent[0]["id"] == "p2"
+
+
+def test_newer_full_plan_replaces_a_queued_ref():
+    sent = _publish_all(_ref("p1"), _plan("p2"))
+    assert [m["type"] for m in sent] == ["recipe_plan"]
+    assert sent[0]["plan"]["id"] == "p2"
+
+
+def test_coalesced_message_does_not_overtake_later_ones():
+    sent = _publish_all(
+        {"type": "step_update", "step_index": 1},
+        {"type": "cooking_mode", "action": "complete"},
+        {"type": "step_update", "step_index": 2},
+    )
+    assert [(m["type"], m.get("step_index")) for m in sent] == [
+        ("cooking_mode", None), ("step_update", 2),
+    ]
+
+
+def test_ref_merged_into_a_queued_plan_keeps_causal_order():
+    sent = _publish_all(_plan(), {"type": "cooking_mode", "action": "start"}, _ref())
+    assert [m["type"] for m in sent] == ["cooking_mode", "recipe_plan"]
+    assert sent[1]["plan"]["current_step_index"] == 2
+
+
+def test_messages_go_out_in_publish_order_on_the_reliable_channel():
+    async def run():
+        room = _Room()
+        publisher = DataPublisher(room)
+        for i in range(5):
+            await publisher.publish({"type": "timer", "action": "start", "id": str(i)})
+        await publisher.aclose()
+        return room
+
+    room = asyncio.run(run())
+    assert [m["id"] for m in room.sent] == ["0", "1", "2", "3", "4"]
+    assert all(room.reliable)
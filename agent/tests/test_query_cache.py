@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from query_cache import QueryCache, normalize_query
+
+
+def test_normalize_query_drops_filler_and_punctuation():
+    assert normalize_query("The Lasagna recipe!") == "lasagna"
+    assert normalize_query("how do I make my mum's chicken curry?") == "mum s chicken curry"
+    # A question made only of filler keeps its words rather than becoming empty
+    assert normalize_query("the recipe") == "the recipe"
+
+
+def test_hits_reuse_results_and_larger_top_k_serves_smaller():
+    cache = QueryCache()
+    calls = []
+
+    def compute(top_k):
+        calls.append(top_k)
+        return list(range(top_k))
+
+    assert cache.get_or_compute("lasagna", 5, compute) == [0, 1, 2, 3, 4]
+    assert cache.get_or_compute("lasagna", 3, compute) == [0, 1, 2]
+    assert cache.contains("lasagna", 5)
+    assert not cache.contains("lasagna", 8)
+    assert cache.get_or_compute("lasagna", 8, compute) == list(range(8))
+    assert calls == [5, 8]
+
+
+def test_entries_expire_after_the_ttl():
+    cache = QueryCache(ttl=0.01)
+    calls = []
+    compute = lambda top_k: calls.append(top_k) or ["node"]
+
+    cache.get_or_compute("soup", 3, compute)
+    time.sleep(0.02)
+    assert not cache.contains("soup", 3)
+    cache.get_or_compute("soup", 3, compute)
+    assert calls == [3, 3]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(max_entries=2)
+    compute = lambda top_k: ["node"]
+    cache.get_or_compute("a", 1, compute)
+    cache.get_or_compute("b", 1, compute)
+    cache.get_or_compute("a", 1, compute)
+    cache.get_or_compute("c", 1, compute)
+    assert cache.contains("a", 1)
+    assert not cache.contains("b", 1)
+
+
+def test_index_version_in_the_key_keeps_old_results_out():
+    cache = QueryCache()
+    cache.get_or_compute(("lasagna", None, 1), 3, lambda top_k: ["old"])
+    assert cache.get_or_compute(("lasagna", None, 2), 3, lambda top_k: ["new"]) == ["new"]
+
+
+def test_waiters_share_an_in_flight_fetch():
+    cache = QueryCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow(top_k):
+        calls.append(top_k)
+        started.set()
+        release.wait(5)
+        return ["node"] * top_k
+
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute("curry", 3, slow, "speculative")))
+    owner.start()
+    started.wait(5)
+    assert cache.contains("curry", 3)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute("curry", 2, slow)))
+    waiter.start()
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert calls == [3]
+    assert sorted(results, key=len) == [["node"] * 2, ["node"] * 3]
+
+
+def test_failed_fetch_is_not_cached():
+    cache = QueryCache()
+
+    def fail(top_k):
+        raise RuntimeError("index unavailable")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("curry", 3, fail)
+    assert not cache.contains("curry", 3)
+    assert cache.get_or_compute("curry", 3, lambda top_k: ["node"]) == ["node"]
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+os.environ.setdefault("GEMINI_API_KEY", "test")  # rag builds its default embed model at import
+
+import rag
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    data, shards = tmp_path / "data", tmp_path / "shards"
+    data.mkdir()
+    shards.mkdir()
+    monkeypatch.setattr(rag, "DATA_DIR", data)
+    monkeypatch.setattr(rag, "SHARDS_DIR", shards)
+    monkeypatch.setattr(rag, "_shard_dir_refs", rag.Counter())
+    return data, shards
+
+
+def _shard_for(data, shards, document: str, text: str):
+    (data / document).write_text(text)
+    shard_dir = shards / rag.shard_dir_name(document, rag.file_fingerprint(data / document))
+    shard_dir.mkdir()
+    return shard_dir
+
+
+def test_current_shard_survives_every_session_letting_go(dirs):
+    data, shards = dirs
+    shard_dir = _shard_for(data, shards, "curry.txt", "v1")
+    rag._acquire_shard_dir(shard_dir)
+    rag._acquire_shard_dir(shard_dir)
+
+    rag._release_shard_dir("curry.txt", shard_dir)
+    rag._release_shard_dir("curry.txt", shard_dir)
+    # The file still has this version, so the next session or restart reuses it
+    assert shard_dir.exists()
+
+
+def test_stale_shard_is_deleted_only_after_the_last_session_lets_go(dirs):
+    data, shards = dirs
+    shard_dir = _shard_for(data, shards, "curry.txt", "v1")
+    rag._acquire_shard_dir(shard_dir)
+    rag._acquire_shard_dir(shard_dir)
+    (data / "curry.txt").write_text("v2, edited")
+
+    rag._release_shard_dir("curry.txt", shard_dir)
+    assert shard_dir.exists()
+    rag._release_shard_dir("curry.txt", shard_dir)
+    assert not shard_dir.exists()
+
+
+def test_unusable_shard_is_kept_while_another_session_serves_it(dirs):
+    data, shards = dirs
+    shard_dir = _shard_for(data, shards, "curry.txt", "v1")
+    rag._acquire_shard_dir(shard_dir)
+    assert not rag._discard_shard_dir(shard_dir)
+    assert shard_dir.exists()
+
+    rag._release_shard_dir("curry.txt", shard_dir)
+    assert rag._discard_shard_dir(shard_dir)
+    assert not shard_dir.exists()
+
+
+def test_collect_keeps_current_referenced_and_in_progress_dirs(dirs):
+    data, shards = dirs
+    current = _shard_for(data, shards, "curry.txt", "v1")
+    served = shards / "0123456789abcdef"
+    stale = shards / "fedcba9876543210"
+    building = shards / ".tmp-build"
+    for d in (served, stale, building):
+        d.mkdir()
+    rag._acquire_shard_dir(served)
+
+    rag._collect_shard_dirs({current.name})
+
+    assert current.exists() and served.exists() and building.exists()
+    assert not stale.exists()
+
+
+def test_clearing_one_session_keeps_the_files_another_one_maps(dirs):
+    data, shards = dirs
+    shard_dir = _shard_for(data, shards, "curry.txt", "v1")
+    sessions = [rag.CookbookRAG.__new__(rag.CookbookRAG) for _ in range(2)]
+    for session in sessions:
+        session.vector_store = rag.ShardedVectorStore()
+        session.vector_store.set_shard("curry.txt", rag.NumpyVectorStore())
+        session._shard_dirs = {"curry.txt": shard_dir}
+        session.index_version = 0
+        rag._acquire_shard_dir(shard_dir)
+
+    sessions[0].clear_index()
+    sessions[0].remove_document("curry.txt")
+
+    # The file is gone now, but the other session still maps its shard
+    assert not (data / "curry.txt").exists()
+    assert shard_dir.exists()
+    sessions[1].clear_index()
+    assert not shard_dir.exists()
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import time
+
+import recipe_parser
+from recipe_parser import RecipePlan, RecipeStep, _parse_batch, _parse_hedged
+
+COOKBOOK = "Pancakes\nMethod\n1. Whisk the flour, eggs and milk.\n2. Fry each pancake for 2 minutes.\n"
+
+
+def _plan(name: str) -> RecipePlan:
+    return RecipePlan(name=name, servings="", prep_time="", cook_time="", ingredients=[],
+                      steps=[RecipeStep(step_number=1, instruction="Cook it.")])
+
+
+def _schema(name: str, steps: int = 1) -> dict:
+    return {"name": name, "servings": "2 servings", "prep_time": "5 mins", "cook_time": "10 mins",
+            "ingredients": [], "steps": [{"step_number": n, "instruction": "Cook it."} for n in range(1, steps + 1)]}
+
+
+def _fake_models(monkeypatch, replies: dict):
+    """Replace the model call: each model sleeps then returns its plan (or None)."""
+    calls = []
+
+    async def parse_with_model(client, model, prompt, context_chars):
+        calls.append(model)
+        delay, plan = replies[model]
+        await asyncio.sleep(delay)
+        return plan
+
+    monkeypatch.setattr(recipe_parser, "_parse_with_model", parse_with_model)
+    monkeypatch.setattr(recipe_parser, "RECIPE_PARSE_HEDGE_AFTER", 0.05)
+    monkeypatch.setattr(recipe_parser, "MIN_MODEL_SECONDS", 0.1)
+    return calls
+
+
+def _hedged(seconds: float):
+    async def run():
+        deadline = asyncio.get_running_loop().time() + seconds
+        return await _parse_hedged(None, "prompt", COOKBOOK, "pancakes", deadline)
+    return asyncio.run(run())
+
+
+def test_fast_primary_wins_without_a_hedge(monkeypatch):
+    calls = _fake_models(monkeypatch, {recipe_parser.PARSE_MODEL: (0, _plan("primary"))})
+    plan, path = _hedged(1)
+    assert (plan.name, path) == ("primary", "primary")
+    assert calls == [recipe_parser.PARSE_MODEL]
+
+
+def test_slow_primary_is_hedged_with_the_fast_model(monkeypatch):
+    calls = _fake_models(monkeypatch, {
+        recipe_parser.PARSE_MODEL: (5, _plan("primary")),
+        recipe_parser.FAST_PARSE_MODEL: (0, _plan("hedge")),
+    })
+    plan, path = _hedged(1)
+    assert (plan.name, path) == ("hedge", "hedge")
+    assert calls == [recipe_parser.PARSE_MODEL, recipe_parser.FAST_PARSE_MODEL]
+
+
+def test_failed_primary_hedges_right_away(monkeypatch):
+    _fake_models(monkeypatch, {
+        recipe_parser.PARSE_MODEL: (0, None),
+        recipe_parser.FAST_PARSE_MODEL: (0, _plan("hedge")),
+    })
+    monkeypatch.setattr(recipe_parser, "RECIPE_PARSE_HEDGE_AFTER", 0.5)
+    start = time.monotonic()
+    plan, path = _hedged(2)
+    assert path == "hedge"
+    assert time.monotonic() - start < 0.5
+
+
+def test_rules_take_over_at_the_deadline(monkeypatch):
+    _fake_models(monkeypatch, {
+        recipe_parser.PARSE_MODEL: (5, _plan("primary")),
+        recipe_parser.FAST_PARSE_MODEL: (5, _plan("hedge")),
+    })
+    start = time.monotonic()
+    plan, path = _hedged(0.2)
+    assert path == "rules"
+    assert plan.name == "Pancakes"
+    assert time.monotonic() - start < 1
+
+
+def test_no_model_call_when_the_deadline_is_too_close(monkeypatch):
+    calls = _fake_models(monkeypatch, {})
+    plan, path = _hedged(0.05)
+    assert path == "rules"
+    assert calls == []
+
+
+def _fake_batches(monkeypatch, reply):
+    """Replace the batch request with `reply(recipe_count)` and single parses with a stub."""
+    batch_sizes = []
+    singles = []
+
+    async def generate(client, op, prompt, schema, context_chars, model=recipe_parser.PARSE_MODEL, **fields):
+        batch_sizes.append(fields["recipes"])
+        return await reply(fields["recipes"])
+
+    async def parse_one(rag_content, recipe_query, deadline=None):
+        singles.append(recipe_query)
+        return _plan(recipe_query)
+
+    monkeypatch.setattr(recipe_parser, "_generate", generate)
+    monkeypatch.setattr(recipe_parser, "parse_recipe_from_rag", parse_one)
+    monkeypatch.setattr(recipe_parser, "MIN_MODEL_SECONDS", 0.1)
+    return batch_sizes, singles
+
+
+def _batch(n: int, seconds: float = 1):
+    requests = [(COOKBOOK, f"recipe {i}") for i in range(n)]
+
+    async def run():
+        deadline = asyncio.get_running_loop().time() + seconds
+        return await _parse_batch(object(), requests, deadline)
+    return asyncio.run(run())
+
+
+def test_valid_batch_reply_parses_every_recipe_in_one_request(monkeypatch):
+    async def reply(n):
+        return json.dumps([_schema(f"Recipe {i}") for i in range(n)])
+
+    batch_sizes, singles = _fake_batches(monkeypatch, reply)
+    plans = _batch(3)
+    assert [p.name for p in plans] == ["Recipe 0", "Recipe 1", "Recipe 2"]
+    assert all(p.parsed_by == "primary" for p in plans)
+    assert batch_sizes == [3]
+    assert singles == []
+
+
+def test_mismatched_batch_is_split_down_to_single_parses(monkeypatch):
+    async def reply(n):
+        return json.dumps([_schema("Only one")])
+
+    batch_sizes, singles = _fake_batches(monkeypatch, reply)
+    plans = _batch(4)
+    assert batch_sizes == [4, 2, 2]
+    assert singles == ["recipe 0", "recipe 1", "recipe 2", "recipe 3"]
+    assert [p.name for p in plans] == singles
+
+
+def test_invalid_json_and_empty_steps_are_split_too(monkeypatch):
+    replies = iter(["not json"] + [json.dumps([_schema("A", steps=0), _schema("B")])] * 2)
+
+    async def reply(n):
+        return next(replies)
+
+    batch_sizes, singles = _fake_batches(monkeypatch, reply)
+    _batch(4)
+    assert batch_sizes == [4, 2, 2]
+    assert singles == ["recipe 0", "recipe 1", "recipe 2", "recipe 3"]
+
+
+def test_request_errors_fall_back_to_rules_without_retrying(monkeypatch):
+    async def reply(n):
+        raise RuntimeError("429 quota exhausted")
+
+    batch_sizes, singles = _fake_batches(monkeypatch, reply)
+    plans = _batch(4)
+    assert batch_sizes == [4]
+    assert singles == []
+    assert [p.parsed_by for p in plans] == ["rules"] * 4
+
+
+def test_batch_past_the_deadline_falls_back_to_rules(monkeypatch):
+    async def reply(n):
+        await asyncio.sleep(5)
+
+    batch_sizes, singles = _fake_batches(monkeypatch, reply)
+    plans = _batch(2, seconds=0.2)
+    assert batch_sizes == [2]
+    assert all(p.parsed_by == "rules" for p in plans)
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+from rerank import rerank_nodes
+
+
+def _node(text: str, score: float, page: int, document: str = "book.pdf"):
+    return SimpleNamespace(
+        node=SimpleNamespace(get_content=lambda: text),
+        text=text,
+        score=score,
+        metadata={"page_label": str(page), "document": document},
+    )
+
+
+def _pages(nodes) -> list[str]:
+    return [n.metadata["page_label"] for n in nodes]
+
+
+def test_recipe_split_across_pages_keeps_the_rest_of_the_method():
+    anchor = _node(
+        "Chicken Curry\nServes 4.\nIngredients:\n500 g chicken\n2 onions\n1 tbsp curry paste\n"
+        "Method:\n1. Fry the onions.\n2. Add the curry paste.\n3. Add the chicken.",
+        0.9, 12,
+    )
+    rest = _node("4. Pour in the stock.\n5. Simmer for 20 minutes.\n6. Serve with rice.", 0.5, 13)
+    other = _node(
+        "Beef Stew\nIngredients:\n1 kg beef\n3 carrots\n2 onions\nMethod:\n1. Brown the beef.\n2. Simmer.",
+        0.7, 14,
+    )
+    kept = rerank_nodes("chicken curry", [anchor, other, rest])
+    assert _pages(kept) == ["12", "13"]
+
+
+def test_missing_method_is_filled_from_the_same_document():
+    ingredients = _node("Classic Lasagna\nServes 4.\nIngredients:\n500 g beef\n2 onions\n1 tbsp oil", 0.8, 10)
+    method = _node("Method:\n1. Brown the beef\n2. Layer the pasta\n3. Bake 40 minutes", 0.7, 11)
+    other_recipe = _node("Chicken Curry\nIngredients:\n1 kg chicken\n2 tbsp curry\n3 onions", 0.75, 12)
+    other_book = _node("Method:\n1. Whisk the eggs\n2. Fold in the flour", 0.72, 11, document="other.pdf")
+    kept = rerank_nodes("how do I make lasagna", [ingredients, other_recipe, other_book, method])
+    assert kept == [ingredients, method]
+
+
+def test_unstructured_chunks_are_returned_unchanged():
+    nodes = [_node("A short history of pasta.", 0.8, 1), _node("Why we love tomatoes.", 0.6, 2)]
+    assert rerank_nodes("pasta", nodes) == nodes
@@ -0,0 +1,48 @@
+from rule_parser import extract_recipe
+
+COOKBOOK = """[Source 1]: Tomato Soup
+Serves 4
+Prep time: 10 minutes
+Ingredients
+2 tbsp olive oil
+1 onion, chopped
+500g tomatoes
+- a handful of basil
+Method
+1. Soften the onion in the oil for 5 minutes.
+2. Add the tomatoes and simmer for 20 minutes.
+3. Blend until smooth and stir in the basil.
+Notes
+Keeps for 3 days in the fridge.
+[Source 2]: Lemon Tart
+Ingredients
+100g butter
+Method
+1. Bake the pastry case for 15 minutes.
+"""
+
+
+def test_extracts_the_requested_recipe_from_several():
+    plan = extract_recipe(COOKBOOK, "the tomato soup recipe")
+    assert plan.name == "Tomato Soup"
+    assert [i.name for i in plan.ingredients] == ["olive oil", "onion, chopped", "tomatoes", "a handful of basil"]
+    assert plan.ingredients[0].quantity == "2 tbsp"
+    assert plan.ingredients[1].emoji == "🧅"
+    assert [s.step_number for s in plan.steps] == [1, 2, 3]
+    assert [s.duration_minutes for s in plan.steps] == [5, 20, None]
+    assert plan.servings == "4 servings"
+    assert plan.prep_time == "10 minutes"
+    assert plan.cook_time == "25 mins"
+
+
+def test_unnumbered_method_lines_become_steps():
+    text = "Flatbread\nMethod\nMix the flour, water and salt into a dough.\nCook each round in a hot pan for 2 minutes.\n"
+    plan = extract_recipe(text, "flatbread")
+    assert [s.instruction for s in plan.steps] == [
+        "Mix the flour, water and salt into a dough.",
+        "Cook each round in a hot pan for 2 minutes.",
+    ]
+
+
+def test_no_steps_means_no_plan():
+    assert extract_recipe("Tomato Soup\nIngredients\n500g tomatoes\n", "tomato soup") is None
@@ -0,0 +1,78 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return "curry"
+
+        waiters = [asyncio.create_task(flight.do("curry", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flight.in_flight("curry")
+        release.set()
+        results = await asyncio.gather(*waiters)
+        return calls, results, flight.in_flight("curry")
+
+    calls, results, still_in_flight = asyncio.run(run())
+    assert calls == [1]
+    assert results == ["curry"] * 3
+    assert not still_in_flight
+
+
+def test_different_keys_and_later_calls_run_separately():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            return key
+
+        await asyncio.gather(flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b")))
+        await flight.do("a", lambda: fetch("a"))
+        return calls
+
+    assert asyncio.run(run()) == ["a", "b", "a"]
+
+
+def test_cancelling_one_caller_leaves_the_shared_job_running():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return 42
+
+        first = asyncio.create_task(flight.do("k", fetch))
+        second = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        return await second, first
+
+    result, first = asyncio.run(run())
+    assert result == 42
+    assert first.cancelled()
+
+
+def test_errors_reach_every_waiter():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("no such recipe")
+
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [type(r) for r in results] == [ValueError, ValueError]
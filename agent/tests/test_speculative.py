@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from speculative import SpeculativeRetriever, extract_phrases
+
+
+@pytest.mark.parametrize("transcript, phrases", [
+    ("I want to make the lasagna", ["lasagna"]),
+    ("what can I make with chicken thighs", ["chicken thighs"]),
+    ("tell me about the lasagna recipe", ["lasagna"]),
+    ("grandma's apple pie recipe please", ["grandma's apple pie"]),
+    ("what's the recipe for banana bread", ["banana bread"]),
+    ("cook the pasta for 10 minutes", ["pasta"]),
+    ("I want to bake bread and make soup", ["bread", "soup"]),
+    ("chicken tikka masala", ["chicken tikka masala"]),
+])
+def test_recipe_and_ingredient_requests_trigger(transcript, phrases):
+    assert extract_phrases(transcript) == phrases
+
+
+@pytest.mark.parametrize("transcript", [
+    "how about we start",
+    "I am with you",
+    "what goes with it",
+    "can you tell me about my cookbook",
+    "I was thinking about dinner",
+    "using the oven now",
+    "thanks for the help",
+    "I love this recipe",
+    "give me a quick recipe",
+    "make sure it is hot",
+    "making progress",
+    "I'm cooking tonight",
+    "yes please",
+    "next step",
+    "",
+])
+def test_everyday_speech_does_not_trigger(transcript):
+    assert extract_phrases(transcript) == []
+
+
+class _Rag:
+    def __init__(self):
+        self.prefetched = []
+
+    def is_available(self):
+        return True
+
+    def is_cached(self, question, top_k):
+        return False
+
+    def prefetch(self, question, top_k):
+        self.prefetched.append(question)
+
+
+def test_revised_interim_guess_is_cancelled_before_it_costs_an_embedding():
+    async def run():
+        rag = _Rag()
+        speculator = SpeculativeRetriever(rag, window=0.05)
+        speculator.on_transcript("I want to make the lasagna", is_final=False)
+        speculator.on_transcript("I want to make the lamb stew", is_final=False)
+        await asyncio.sleep(0.2)
+        return rag.prefetched
+
+    assert asyncio.run(run()) == ["lamb stew"]
+
+
+def test_chit_chat_starts_no_retrieval():
+    async def run():
+        rag = _Rag()
+        speculator = SpeculativeRetriever(rag, window=0.0)
+        for transcript in ("how about we start", "I'm with you", "thanks for the help"):
+            speculator.on_transcript(transcript, is_final=True)
+        await asyncio.sleep(0.05)
+        return rag.prefetched
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,75 @@
+import asyncio
+import sqlite3
+import time
+
+import state_store
+from state_store import SessionStateStore, state_key
+
+
+def test_checkpoints_are_written_in_one_flush_with_the_latest_snapshot(tmp_path):
+    async def run():
+        store = SessionStateStore(tmp_path / "state.sqlite3")
+        snapshots = []
+
+        def snapshot(step):
+            def take():
+                snapshots.append(step)
+                return {"step": step}
+            return take
+
+        for step in range(3):
+            store.checkpoint("browser-1", snapshot(step))
+        assert store.load("browser-1") is None
+        await store.flush()
+        return store, snapshots
+
+    store, snapshots = asyncio.run(run())
+    assert snapshots == [2]
+    assert store.load("browser-1") == {"step": 2}
+
+
+def test_background_flush_writes_dirty_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(state_store, "FLUSH_INTERVAL", 0.01)
+
+    async def run():
+        store = SessionStateStore(tmp_path / "state.sqlite3")
+        store.checkpoint("a", lambda: {"timers": []})
+        store.checkpoint("b", lambda: {"timers": [1]})
+        await store._flush_task
+        return store
+
+    store = asyncio.run(run())
+    assert store.load("a") == {"timers": []}
+    assert store.load("b") == {"timers": [1]}
+
+
+def test_a_failing_snapshot_does_not_block_the_others(tmp_path):
+    async def run():
+        store = SessionStateStore(tmp_path / "state.sqlite3")
+        store.checkpoint("bad", lambda: {"value": object()})
+        store.checkpoint("good", lambda: {"value": 1})
+        await store.flush()
+        return store
+
+    store = asyncio.run(run())
+    assert store.load("bad") is None
+    assert store.load("good") == {"value": 1}
+
+
+def test_expired_and_missing_state_is_not_resumed(tmp_path):
+    path = tmp_path / "state.sqlite3"
+    store = SessionStateStore(path)
+    stale = time.time() - state_store.STATE_TTL - 1
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute("INSERT INTO session_state VALUES (?, ?, ?)", ("old", '{"step": 1}', stale))
+        conn.execute("INSERT INTO session_state VALUES (?, ?, ?)", ("corrupt", "{not json", time.time()))
+    assert store.load("old") is None
+    assert store.load("corrupt") is None
+    assert store.load("never-seen") is None
+
+
+def test_shared_identities_have_no_state_key():
+    assert state_key(None) is None
+    assert state_key("") is None
+    assert state_key("user") is None
+    assert state_key("browser-7f3a") == "browser-7f3a"
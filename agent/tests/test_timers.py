@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from tools.timer import TimerMixin
+
+
+class _Publisher:
+    def __init__(self):
+        self.sent = []
+
+    async def publish(self, message: dict) -> None:
+        self.sent.append(message)
+
+
+class _Agent(TimerMixin):
+    def __init__(self):
+        self._publisher = _Publisher()
+        self.checkpoints = 0
+
+    def _checkpoint(self) -> None:
+        self.checkpoints += 1
+
+
+def test_timer_dismissed_in_the_ui_is_not_saved_again():
+    async def run():
+        agent = _Agent()
+        first = await agent._start_timer(5, "Pasta")
+        await agent._start_timer(10, "Sauce")
+        timer_id = agent._timers[0]["id"]
+        saves = agent.checkpoints
+
+        assert agent.remove_timer(timer_id)
+        assert [t["label"] for t in agent._timers] == ["Sauce"]
+        assert agent.checkpoints == saves + 1
+        assert timer_id not in agent._timer_expiry
+        # Unknown ids (already gone) change nothing
+        assert not agent.remove_timer(timer_id)
+        assert agent.checkpoints == saves + 1
+        return first
+
+    assert asyncio.run(run())["timer_set"]
+
+
+def test_timer_is_forgotten_when_it_runs_out():
+    async def run():
+        agent = _Agent()
+        await agent._start_timer(1, "Eggs")
+        timer_id = agent._timers[0]["id"]
+        # Run it out early instead of waiting a minute
+        agent._schedule_expiry(timer_id, 0.01)
+        await asyncio.sleep(0.05)
+        return agent
+
+    agent = asyncio.run(run())
+    assert agent._timers == []
+    assert agent.active_timers() == []
+
+
+def test_clearing_timers_cancels_their_expiry():
+    async def run():
+        agent = _Agent()
+        await agent._start_timer(1, "Eggs")
+        handle = next(iter(agent._timer_expiry.values()))
+        await TimerMixin.clear_timers(agent, None)
+        return agent, handle
+
+    agent, handle = asyncio.run(run())
+    assert agent._timers == [] and agent._timer_expiry == {}
+    assert handle.cancelled()
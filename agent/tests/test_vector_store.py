@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("llama_index.core")
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from vector_store import NumpyVectorStore
+
+DIM = 256
+
+
+def _corpus(n: int = 2000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # Chunks cluster by topic, like real cookbook embeddings
+    centers = rng.normal(size=(40, DIM))
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.normal(size=(n, DIM))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    records = [{"id": f"n{i}", "text": f"chunk {i}", "metadata": {}, "ref_doc_id": f"d{i % 7}"} for i in range(n)]
+    queries = vectors[rng.integers(0, n, 50)] + 0.3 * rng.normal(size=(50, DIM)) / np.sqrt(DIM)
+    return vectors.astype(np.float32), records, queries
+
+
+def _top_ids(store: NumpyVectorStore, query: np.ndarray, k: int = 5) -> list[str]:
+    return store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=k)).ids
+
+
+@pytest.mark.parametrize("quantization", ["int8", "float16"])
+def test_quantized_search_returns_the_exact_results(quantization):
+    vectors, records, queries = _corpus()
+    exact = NumpyVectorStore(vectors=vectors, records=records)
+    quantized = NumpyVectorStore(vectors=vectors, records=records, quantization=quantization)
+    for q in queries:
+        assert _top_ids(quantized, q) == _top_ids(exact, q)
+
+
+def test_rescored_similarities_are_exact():
+    vectors, records, queries = _corpus()
+    exact = NumpyVectorStore(vectors=vectors, records=records)
+    quantized = NumpyVectorStore(vectors=vectors, records=records, quantization="int8")
+    q = VectorStoreQuery(query_embedding=queries[0].tolist(), similarity_top_k=5)
+    assert quantized.query(q).similarities == pytest.approx(exact.query(q).similarities, abs=1e-6)
+
+
+def test_int8_search_copy_is_a_quarter_of_float32():
+    vectors, records, _ = _corpus()
+    memory = NumpyVectorStore(vectors=vectors, records=records, quantization="int8").memory_bytes()
+    # One int8 per dimension plus a float32 scale per vector
+    assert memory["quantized"] == len(vectors) * (DIM + 4)
+    assert memory["exact"] / memory["quantized"] > 3.9
+
+
+def test_loaded_store_maps_exact_vectors_and_keeps_only_the_search_copy(tmp_path):
+    vectors, records, queries = _corpus(300)
+    NumpyVectorStore(vectors=vectors, records=records).save(tmp_path)
+    loaded = NumpyVectorStore.load(tmp_path, quantization="int8")
+    assert loaded.memory_bytes()["exact_mapped"]
+    assert _top_ids(loaded, queries[0]) == _top_ids(NumpyVectorStore(vectors=vectors, records=records), queries[0])
+
+
+def test_delete_keeps_quantized_copy_and_text_bytes_in_step():
+    vectors, records, queries = _corpus(300)
+    store = NumpyVectorStore(vectors=vectors, records=[dict(r) for r in records], quantization="int8")
+    store.delete("d3")
+    kept = [i for i, r in enumerate(records) if r["ref_doc_id"] != "d3"]
+    reference = NumpyVectorStore(vectors=vectors[kept], records=[records[i] for i in kept], quantization="int8")
+    assert store.memory_bytes() == reference.memory_bytes()
+    assert store.stats()["text_bytes"] == reference.stats()["text_bytes"]
+    for q in queries[:10]:
+        assert _top_ids(store, q) == _top_ids(reference, q)
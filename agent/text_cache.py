@@ -0,0 +1,104 @@
+"""
+On-disk cache of text extracted from cookbook files.
+
+Parsing (PDFs especially) is the most expensive CPU step of ingestion. The
+per-page text and metadata from SimpleDirectoryReader are saved under the
+file's content hash and the reader version, so a file that was parsed before,
+even under another name, is never parsed again. File-level metadata (name,
+path, dates) is re-derived from the current path on every load.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+
+from llama_index.core import Document, SimpleDirectoryReader
+from llama_index.core.readers.file.base import default_file_metadata_func
+
+from metrics import CACHE_REQUESTS
+
+TEXT_CACHE_DIR = Path(os.getenv("TEXT_CACHE_DIR", Path(__file__).parent / ".index" / "text"))
+
+# Bump when the cached page format changes
+CACHE_FORMAT = 1
+# Metadata describing the file rather than its content
+_FILE_METADATA_KEYS = {
+    "file_path", "file_name", "file_type", "file_size",
+    "creation_date", "last_modified_date", "last_accessed_date",
+}
+
+
+def _package_version(name: str) -> str:
+    try:
+        return importlib_metadata.version(name)
+    except importlib_metadata.PackageNotFoundError:
+        return "none"
+
+
+# Extraction output depends on the reader code, so it is part of the cache key
+READER_VERSION = f"{CACHE_FORMAT}/llama-index-core-{_package_version('llama-index-core')}/pypdf-{_package_version('pypdf')}"
+
+_hashes: dict[tuple, str] = {}
+
+
+def content_hash(path: Path) -> str:
+    """SHA-256 of the file's bytes, memoized per (path, size, mtime) so unchanged files aren't re-read."""
+    st = path.stat()
+    key = (str(path), st.st_size, st.st_mtime_ns)
+    digest = _hashes.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _hashes[key] = h.hexdigest()
+    return digest
+
+
+def _cache_file(digest: str) -> Path:
+    reader = hashlib.sha1(READER_VERSION.encode("utf-8")).hexdigest()[:8]
+    return TEXT_CACHE_DIR / f"{digest}-{reader}.json"
+
+
+def _extract(path: Path) -> list[dict]:
+    pages = []
+    for doc in SimpleDirectoryReader(input_files=[str(path)]).load_data():
+        pages.append({
+            "text": doc.text,
+            "metadata": {k: v for k, v in doc.metadata.items() if k not in _FILE_METADATA_KEYS},
+            "excluded_embed_metadata_keys": list(doc.excluded_embed_metadata_keys),
+            "excluded_llm_metadata_keys": list(doc.excluded_llm_metadata_keys),
+        })
+    return pages
+
+
+def load_document_cached(path: Path) -> list[Document]:
+    """
+    Read one cookbook file into LlamaIndex documents (a PDF yields one per page),
+    parsing it only if these bytes haven't been parsed by this reader version before.
+    """
+    cache_file = _cache_file(content_hash(path))
+    try:
+        pages = json.loads(cache_file.read_text(encoding="utf-8"))
+        CACHE_REQUESTS.inc(cache="document_text", result="hit")
+    except (OSError, ValueError):
+        CACHE_REQUESTS.inc(cache="document_text", result="miss")
+        pages = _extract(path)
+        TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=TEXT_CACHE_DIR)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(pages, f)
+        os.replace(tmp, cache_file)
+
+    file_metadata = default_file_metadata_func(str(path))
+    return [
+        Document(
+            text=page["text"],
+            metadata={**file_metadata, **page["metadata"]},
+            excluded_embed_metadata_keys=list(page["excluded_embed_metadata_keys"]),
+            excluded_llm_metadata_keys=list(page["excluded_llm_metadata_keys"]),
+        )
+        for page in pages
+    ]
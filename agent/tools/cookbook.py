@@ -1,4 +1,7 @@
+import asyncio
 from livekit.agents import RunContext, function_tool
+from embed_scheduler import EmbeddingError
+from metrics import timed_tool
 import sys
 import os
 
@@ -10,7 +13,21 @@ except ImportError:
     from ..rag import reload_rag
 
 class CookbookMixin:
+    def _resolve_book(self, book: str) -> tuple[list[str] | None, dict | None]:
+        """Map a spoken book reference to indexed documents. Returns (documents, None) or (None, error_response)."""
+        documents = self.rag.resolve_documents(book)
+        if documents:
+            return documents, None
+        available = self.rag.document_names()
+        return None, {
+            "found": False,
+            "has_cookbook": bool(available),
+            "available_documents": available,
+            "message": f"I couldn't find a document matching '{book}'. The uploaded documents are: {', '.join(available) or 'none'}."
+        }
+
     @function_tool()
+    @timed_tool
     async def reload_cookbook(
         self,
         context: RunContext,
@@ -19,20 +36,23 @@ class CookbookMixin:
         Reload the cookbook after a new PDF has been uploaded.
         Call this when the user mentions they've uploaded a new document.
         """
+        # Indexing waits on the ingestion worker; keep the event loop free meanwhile
         if hasattr(self, 'rag') and self.rag:
-            success, message = self.rag.reload_index()
+            success, message = await asyncio.to_thread(self.rag.reload_index)
         else:
-            success, message = reload_rag()
+            success, message = await asyncio.to_thread(reload_rag)
         return {
             "success": success,
             "message": message
         }
     
     @function_tool()
+    @timed_tool
     async def search_cookbook(
         self,
         context: RunContext,
         query: str,
+        book: str = "",
     ) -> dict:
         """
         Search the user's uploaded cookbook/PDF for specific cooking information.
@@ -50,6 +70,7 @@ class CookbookMixin:
         
         Args:
             query: What to search for in the cookbook (e.g., "pasta recipe", "chicken marinade")
+            book: Optional book or file the user named (e.g., "grandma's recipe card"); leave empty to search everything
         """
         # Assumes self.rag is available on the main instance
         if not self.rag.is_available():
@@ -59,7 +80,23 @@ class CookbookMixin:
                 "message": "No cookbook has been uploaded yet. I can still help with general cooking knowledge!"
             }
         
-        results = self.rag.query(query)
+        documents = None
+        if book:
+            documents, error = self._resolve_book(book)
+            if error:
+                return error
+
+        # Embedding the query is a network call; keep it off the loop serving audio
+        try:
+            results = await asyncio.to_thread(self.rag.query, query, documents=documents)
+        except EmbeddingError as e:
+            print(f"Cookbook search for '{query}' failed: {e}")
+            return {
+                "found": False,
+                "has_cookbook": True,
+                "busy": True,
+                "message": "The cookbook search is busy right now. Try again in a moment."
+            }
         
         if "couldn't find" in results.lower():
             return {
@@ -74,3 +111,33 @@ class CookbookMixin:
             "cookbook_content": results,
             "message": "Found relevant information in your cookbook."
         }
+
+    @function_tool()
+    @timed_tool
+    async def remove_cookbook_document(
+        self,
+        context: RunContext,
+        book: str,
+    ) -> dict:
+        """
+        Remove one uploaded cookbook or file, keeping the others.
+        Use when the user says "remove grandma's recipe card" or "delete that PDF".
+
+        Args:
+            book: The book or file the user wants removed (e.g., "grandma's recipe card")
+        """
+        documents, error = self._resolve_book(book)
+        if error:
+            return {"success": False, **error}
+        if len(documents) > 1:
+            return {
+                "success": False,
+                "matches": documents,
+                "message": f"Several documents match '{book}': {', '.join(documents)}. Which one should I remove?"
+            }
+
+        success, message = await asyncio.to_thread(self.rag.remove_document, documents[0])
+        return {
+            "success": success,
+            "message": message
+        }
@@ -1,17 +1,33 @@
-import json
+import asyncio
+
 from livekit.agents import RunContext, function_tool
-from recipe_parser import parse_recipe_from_rag, RecipePlan
+from embed_scheduler import EmbeddingError
+from meal_scheduler import MealTimeline, schedule_meal
+from metrics import CACHE_REQUESTS, timed_tool
+from recipe_parser import parse_recipe_from_rag, parse_recipes_from_rag, RecipePlan
+from singleflight import SingleFlight
+
+
+def _normalize_query(query: str) -> str:
+    """Lowercase and strip punctuation/extra spaces so 'Lasagna!' and 'lasagna' match."""
+    cleaned = "".join(c if c.isalnum() else " " for c in query.lower())
+    return " ".join(cleaned.split())
+
 
 class CookingMixin:
     # State to track current cooking session
     current_recipe: RecipePlan | None = None
     cooking_mode_active: bool = False
+    # Set when current_recipe is several recipes merged by plan_meal
+    meal_timeline: MealTimeline | None = None
 
     @function_tool()
+    @timed_tool
     async def generate_recipe_plan(
         self,
         context: RunContext,
         recipe_query: str,
+        book: str = "",
     ) -> dict:
         """
         Refined search and planning tool. Use this when the user wants to cook a specific 
@@ -24,6 +40,7 @@ class CookingMixin:
         
         Args:
             recipe_query: The name of the recipe to cook (e.g., "Eggs Benedict", "Lasagna")
+            book: Optional book or file the recipe is in (e.g., "grandma's recipe card"); leave empty to search everything
         """
         # 1. Check RAG availability
         if not self.rag.is_available():
@@ -32,58 +49,264 @@ class CookingMixin:
                 "message": "Please upload a cookbook first!"
             }
 
+        documents = None
+        if book:
+            documents, error = self._resolve_book(book)
+            if error:
+                return {"success": False, **error}
+
+        key = (_normalize_query(recipe_query), tuple(documents or ()), self.rag.index_version)
+        if not hasattr(self, '_plan_flights'):
+            self._plan_flights = SingleFlight()
+        # Latest request wins: anything still running for another key is stale
+        self._latest_plan_key = key
+
+        joining = self._plan_flights.in_flight(key)
+        CACHE_REQUESTS.inc(cache="recipe_plan_inflight", result="hit" if joining else "miss")
+
         # Notify frontend that we are starting to look (loading state)
-        if self._room:
-            payload = json.dumps({
+        if self._publisher and not joining:
+            await self._publisher.publish({
                 "type": "recipe_plan_status",
                 "action": "started"
             })
-            await self._room.local_participant.publish_data(payload.encode('utf-8'), reliable=True)
-        # 2. Search RAG
-        # We fetch a bit more context for full recipe extraction
-        rag_content = self.rag.query(recipe_query, top_k=5)
+
+        # 2-3. Search and parse, shared with any identical request already running
+        plan, error = await self._plan_flights.do(key, lambda: self._retrieve_and_parse(recipe_query, documents))
+        if error:
+            return error
+
+        if self._latest_plan_key != key:
+            print(f"Dropping plan for '{recipe_query}', a newer request replaced it")
+            return {
+                "success": False,
+                "superseded": True,
+                "message": "That request was replaced by a newer recipe request."
+            }
+
+        # 4. Store state
+        if self.current_recipe is not plan:
+            self.current_recipe = plan
+            self.meal_timeline = None
+            self._checkpoint()
+
+            # 5. Push to frontend
+            # Send the plan to the UI
+            await self._publish_plan(plan)
+        
+        message = f"I've found the recipe for {plan.name}. It has {len(plan.steps)} steps."
+        if plan.parsed_by == "rules":
+            message += " I read it straight off the cookbook page, so the steps may be a little rough."
+        return {
+            "success": True,
+            "found": True,
+            "recipe_name": plan.name,
+            "steps_count": len(plan.steps),
+            "parsed_by": plan.parsed_by,
+            "message": message + " Shall we start cooking?"
+        }
+
+    async def _publish_plan(self, plan: RecipePlan) -> None:
+        """Send a plan to the UI, or just its id and step state if the UI already holds this version."""
+        if not self._publisher:
+            return
+        if not hasattr(self, '_ui_plans'):
+            self._ui_plans = {}
+        if self._ui_plans.get(plan.plan_id) == plan.plan_version:
+            await self._publisher.publish({"type": "recipe_plan_ref", **plan.step_state()})
+            return
+        self._ui_plans[plan.plan_id] = plan.plan_version
+        await self._publisher.publish({"type": "recipe_plan", "plan": plan.to_dict()})
+
+    def remember_ui_plans(self, plans: list | None) -> None:
+        """Record the plan versions the UI reports having cached (sent in its hello message)."""
+        self._ui_plans = {
+            p["id"]: p["version"]
+            for p in plans or []
+            if isinstance(p, dict) and isinstance(p.get("id"), str) and isinstance(p.get("version"), str)
+        }
+
+    async def resend_plan(self, plan_id: str) -> None:
+        """The UI got a reference to a plan it doesn't have; send it in full."""
+        getattr(self, '_ui_plans', {}).pop(plan_id, None)
+        if self.current_recipe and self.current_recipe.plan_id == plan_id:
+            await self._publish_plan(self.current_recipe)
+
+    async def _retrieve_recipe(
+        self, recipe_query: str, documents: list[str] | None = None
+    ) -> tuple[str | None, dict | None]:
+        """Retrieve the cookbook text for one recipe. Returns (rag_content, None) or (None, error_response)."""
+        # We fetch a bit more context for full recipe extraction, then drop the chunks
+        # that aren't part of this recipe so Gemini parses less
+        try:
+            rag_content = await asyncio.to_thread(
+                self.rag.query, recipe_query, top_k=5, documents=documents, rerank=True
+            )
+        except EmbeddingError as e:
+            print(f"Cookbook search for '{recipe_query}' failed: {e}")
+            return None, {
+                "success": False,
+                "busy": True,
+                "message": "The cookbook search is busy right now. Try again in a moment."
+            }
         
         if "couldn't find" in rag_content.lower() and len(rag_content) < 100:
-            return {
+            return None, {
                 "success": False,
                 "found": False,
                 "message": f"I couldn't find a recipe for {recipe_query} in your cookbook."
             }
+        return rag_content, None
+
+    async def _retrieve_and_parse(
+        self, recipe_query: str, documents: list[str] | None = None
+    ) -> tuple[RecipePlan | None, dict | None]:
+        """Run retrieval and Gemini parsing. Returns (plan, None) or (None, error_response)."""
+        rag_content, error = await self._retrieve_recipe(recipe_query, documents)
+        if error:
+            return None, error
         
-        # 3. Parse with Gemini
         print(f"Parsing recipe for '{recipe_query}'...")
         plan = await parse_recipe_from_rag(rag_content, recipe_query)
         
         if not plan:
-            return {
+            return None, {
                 "success": False,
                 "message": "I found some info, but I couldn't extract a clear recipe structure from it."
             }
+        return plan, None
+
+    @function_tool()
+    @timed_tool
+    async def plan_meal(
+        self,
+        context: RunContext,
+        recipes: list[str],
+        book: str = "",
+    ) -> dict:
+        """
+        Plan a whole meal of several cookbook recipes cooked together (e.g. a main
+        and two sides). Interleaves their steps so everything is ready at the same
+        time, working on one dish while another bakes or simmers.
         
-        # 4. Store state
-        self.current_recipe = plan
-        
-        # 5. Push to frontend
-        if self._room:
-            # Send the plan to the UI
-            payload = json.dumps({
-                "type": "recipe_plan",
-                "plan": plan.to_dict()
+        Args:
+            recipes: Names of the recipes in the meal (e.g., ["Roast Chicken", "Rice Pilaf", "Green Beans"])
+            book: Optional book or file the recipes are in; leave empty to search everything
+        """
+        if not self.rag.is_available():
+            return {
+                "success": False,
+                "message": "Please upload a cookbook first!"
+            }
+        if len(recipes) < 2:
+            return {
+                "success": False,
+                "message": "A meal plan needs at least two recipes; use generate_recipe_plan for one."
+            }
+
+        documents = None
+        if book:
+            documents, error = self._resolve_book(book)
+            if error:
+                return {"success": False, **error}
+
+        if self._publisher:
+            await self._publisher.publish({
+                "type": "recipe_plan_status",
+                "action": "started"
             })
-            await self._room.local_participant.publish_data(
-                payload.encode('utf-8'),
-                reliable=True
-            )
-        
+
+        # Retrieve every recipe, then parse the ones found together in as few requests as possible
+        retrieved = await asyncio.gather(*(self._retrieve_recipe(q, documents) for q in recipes))
+        found = [(content, q) for q, (content, _) in zip(recipes, retrieved) if content]
+        busy = [q for q, (_, error) in zip(recipes, retrieved) if error and error.get("busy")]
+        if busy and not found:
+            return {
+                "success": False,
+                "busy": True,
+                "message": "The cookbook search is busy right now. Try again in a moment."
+            }
+        print(f"Parsing {len(found)} recipes for a meal: {', '.join(q for _, q in found)}")
+        parsed = dict(zip((q for _, q in found), await parse_recipes_from_rag(found)))
+        plans = [parsed[q] for q in recipes if parsed.get(q)]
+        missing = [q for q in recipes if not parsed.get(q) and q not in busy]
+        if not plans:
+            return {
+                "success": False,
+                "found": False,
+                "message": f"I couldn't find recipes for {', '.join(recipes)} in your cookbook."
+            }
+
+        timeline = schedule_meal(plans)
+        self.meal_timeline = timeline
+        self.current_recipe = timeline.to_recipe_plan(plans)
+        # Any single-recipe request still running is now stale
+        self._latest_plan_key = None
+        self._checkpoint()
+
+        await self._publish_plan(self.current_recipe)
+        if self._publisher:
+            await self._publisher.publish({
+                "type": "meal_timeline",
+                "timeline": timeline.to_dict()
+            })
+
+        saved = timeline.sequential_minutes - timeline.total_minutes
+        message = (
+            f"I've lined up {', '.join(timeline.recipes)} to finish together in about "
+            f"{timeline.total_minutes} minutes"
+            + (f", {saved} minutes less than cooking them one after another" if saved > 0 else "")
+            + ". I'll start timers for you as we go."
+        )
+        if missing:
+            message += f" I couldn't find {', '.join(missing)}, so I left that out."
+        if busy:
+            message += f" The cookbook search was too busy to look up {', '.join(busy)}; ask me again in a moment."
         return {
             "success": True,
             "found": True,
-            "recipe_name": plan.name,
-            "steps_count": len(plan.steps),
-            "message": f"I've found the recipe for {plan.name}. It has {len(plan.steps)} steps. Shall we start cooking?"
+            "recipe_name": self.current_recipe.name,
+            "steps_count": len(self.current_recipe.steps),
+            "total_minutes": timeline.total_minutes,
+            "saved_minutes": max(0, saved),
+            "missing": missing,
+            "message": message + " Shall we start cooking?"
         }
 
+    async def _start_step_timer(self, step_index: int) -> dict | None:
+        """In a meal plan, start a timer the first time a hands-off step is reached."""
+        timeline = self.meal_timeline
+        if not timeline or step_index >= len(timeline.steps):
+            return None
+        step = timeline.steps[step_index]
+        if not step.hands_off or step.timer_started:
+            return None
+        step.timer_started = True
+        return await self._start_timer(step.duration_minutes, step.recipe)
+
+    async def ui_step_change(self, action: str, step_index: int) -> None:
+        """
+        Follow a step change the user made in the UI. The UI has already moved,
+        so only agent state is updated, plus any timer a meal step starts.
+        """
+        if not self.current_recipe or not self.cooking_mode_active:
+            return
+        if action == "next" and step_index < len(self.current_recipe.steps):
+            # Mark current step as completed
+            current_idx = self.current_recipe.current_step_index
+            if current_idx < len(self.current_recipe.steps):
+                self.current_recipe.steps[current_idx].completed = True
+            self.current_recipe.current_step_index = step_index
+            print(f"UI navigated to step {step_index + 1}")
+            self._checkpoint()
+            await self._start_step_timer(step_index)
+        elif action == "previous" and step_index >= 0:
+            self.current_recipe.current_step_index = step_index
+            print(f"UI navigated back to step {step_index + 1}")
+            self._checkpoint()
+
     @function_tool()
+    @timed_tool
     async def start_cooking_mode(
         self,
         context: RunContext,
@@ -99,27 +322,28 @@ class CookingMixin:
             }
         
         self.cooking_mode_active = True
+        self._checkpoint()
         
-        if self._room:
-            payload = json.dumps({
+        if self._publisher:
+            await self._publisher.publish({
                 "type": "cooking_mode",
                 "action": "start"
             })
-            await self._room.local_participant.publish_data(
-                payload.encode('utf-8'),
-                reliable=True
-            )
             
         first_step = self.current_recipe.steps[0]
+        timer = await self._start_step_timer(0)
         
         return {
             "success": True,
             "mode": "cooking",
             "first_step": first_step.instruction,
+            "timer_started": bool(timer),
             "message": f"Great! Let's get started. Step 1: {first_step.instruction}"
+                       + (f" {timer['message']}." if timer else "")
         }
 
     @function_tool()
+    @timed_tool
     async def next_step(
         self,
         context: RunContext,
@@ -140,13 +364,14 @@ class CookingMixin:
         next_idx = current_idx + 1
         
         if next_idx >= len(self.current_recipe.steps):
-            # Recipe complete!
-            if self._room:
-                 payload = json.dumps({
+            # Recipe complete! Leave cooking mode so a reconnect doesn't resume it
+            self.cooking_mode_active = False
+            self._checkpoint()
+            if self._publisher:
+                await self._publisher.publish({
                     "type": "cooking_mode",
                     "action": "complete"
                 })
-                 await self._room.local_participant.publish_data(payload.encode('utf-8'), reliable=True)
 
             return {
                 "success": True,
@@ -156,27 +381,28 @@ class CookingMixin:
         
         self.current_recipe.current_step_index = next_idx
         next_step_obj = self.current_recipe.steps[next_idx]
+        self._checkpoint()
         
         # Update UI
-        if self._room:
-            payload = json.dumps({
+        if self._publisher:
+            await self._publisher.publish({
                 "type": "step_update",
                 "step_index": next_idx
             })
-            await self._room.local_participant.publish_data(
-                payload.encode('utf-8'),
-                reliable=True
-            )
+        timer = await self._start_step_timer(next_idx)
             
         return {
             "success": True,
             "step_number": next_step_obj.step_number,
             "instruction": next_step_obj.instruction,
             "tips": next_step_obj.tips,
+            "timer_started": bool(timer),
             "message": f"Step {next_step_obj.step_number}: {next_step_obj.instruction}"
+                       + (f" {timer['message']}." if timer else "")
         }
 
     @function_tool()
+    @timed_tool
     async def previous_step(
         self,
         context: RunContext,
@@ -192,17 +418,14 @@ class CookingMixin:
             self.current_recipe.current_step_index -= 1
             prev_idx = self.current_recipe.current_step_index
             prev_step_obj = self.current_recipe.steps[prev_idx]
+            self._checkpoint()
             
             # Update UI
-            if self._room:
-                payload = json.dumps({
+            if self._publisher:
+                await self._publisher.publish({
                     "type": "step_update",
                     "step_index": prev_idx
                 })
-                await self._room.local_participant.publish_data(
-                    payload.encode('utf-8'),
-                    reliable=True
-                )
             
             return {
                "success": True,
@@ -217,6 +440,7 @@ class CookingMixin:
             }
 
     @function_tool()
+    @timed_tool
     async def go_to_step(
         self,
         context: RunContext,
@@ -251,17 +475,16 @@ class CookingMixin:
         # Update current step
         self.current_recipe.current_step_index = target_idx
         target_step = self.current_recipe.steps[target_idx]
+        self._checkpoint()
         
         # Update UI
-        if self._room:
-            payload = json.dumps({
+        if self._publisher:
+            await self._publisher.publish({
                 "type": "step_update",
                 "step_index": target_idx
             })
-            await self._room.local_participant.publish_data(
-                payload.encode('utf-8'),
-                reliable=True
-            )
+        
+        timer = await self._start_step_timer(target_idx)
         
         # Check if this is the last step
         is_last = target_idx == len(self.current_recipe.steps) - 1
@@ -272,5 +495,7 @@ class CookingMixin:
             "instruction": target_step.instruction,
             "tips": target_step.tips,
             "is_last_step": is_last,
+            "timer_started": bool(timer),
             "message": f"Now on Step {target_step.step_number}: {target_step.instruction}"
+                       + (f" {timer['message']}." if timer else "")
         }
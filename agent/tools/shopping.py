@@ -1,9 +1,10 @@
-import json
 import time as time_module
 from livekit.agents import RunContext, function_tool
+from metrics import timed_tool
 
 class ShoppingListMixin:
     @function_tool()
+    @timed_tool
     async def add_to_shopping_list(
         self,
         context: RunContext,
@@ -65,16 +66,13 @@ class ShoppingListMixin:
                 self._shopping_list.append(new_item)
                 added.append(name)
         
-        if self._room:
-            list_data = json.dumps({
+        self._checkpoint()
+        if self._publisher:
+            await self._publisher.publish({
                 "type": "shopping_list",
                 "action": "update",
-                "items": self._shopping_list
+                "items": list(self._shopping_list)
             })
-            await self._room.local_participant.publish_data(
-                list_data.encode('utf-8'),
-                reliable=True,
-            )
             print(f"Shopping list updated: {[i['name'] for i in self._shopping_list]}")
         
         if added:
@@ -91,6 +89,7 @@ class ShoppingListMixin:
             }
     
     @function_tool()
+    @timed_tool
     async def remove_from_shopping_list(
         self,
         context: RunContext,
@@ -118,16 +117,13 @@ class ShoppingListMixin:
                     break
         
         # Send updated list to frontend
-        if self._room:
-            list_data = json.dumps({
+        self._checkpoint()
+        if self._publisher:
+            await self._publisher.publish({
                 "type": "shopping_list",
                 "action": "update",
-                "items": self._shopping_list
+                "items": list(self._shopping_list)
             })
-            await self._room.local_participant.publish_data(
-                list_data.encode('utf-8'),
-                reliable=True,
-            )
         
         if removed:
             return {
@@ -143,6 +139,7 @@ class ShoppingListMixin:
             }
     
     @function_tool()
+    @timed_tool
     async def clear_shopping_list(
         self,
         context: RunContext,
@@ -154,16 +151,13 @@ class ShoppingListMixin:
         if hasattr(self, '_shopping_list'):
             self._shopping_list = []
         
-        if self._room:
-            list_data = json.dumps({
+        self._checkpoint()
+        if self._publisher:
+            await self._publisher.publish({
                 "type": "shopping_list",
                 "action": "clear",
                 "items": []
             })
-            await self._room.local_participant.publish_data(
-                list_data.encode('utf-8'),
-                reliable=True,
-            )
         
         return {
             "success": True,
@@ -1,9 +1,11 @@
-import json
+import asyncio
 import time as time_module
 from livekit.agents import RunContext, function_tool
+from metrics import timed_tool
 
 class TimerMixin:
     @function_tool()
+    @timed_tool
     async def set_timer(
         self,
         context: RunContext,
@@ -20,23 +22,39 @@ class TimerMixin:
                    If the user provides context (e.g., "for the pasta"), use that.
                    If not provided, defaults to "Timer".
         """
+        return await self._start_timer(minutes, label)
+
+    async def _start_timer(self, minutes: int, label: str = "Timer") -> dict:
+        """Start a timer, remember it for reconnects and show it in the UI."""
         minutes = max(1, min(120, minutes))
         timer_label = label if label else "Timer"
         
-        if self._room:
-            timer_data = json.dumps({
+        # Track active timers so they survive a reconnect
+        if not hasattr(self, '_timers'):
+            self._timers = []
+        # Unique even when a meal step starts several in the same millisecond
+        self._timer_seq = getattr(self, '_timer_seq', 0) + 1
+        timer_id = f"timer-{int(time_module.time() * 1000)}-{self._timer_seq}"
+        self._timers.append({
+            "id": timer_id,
+            "label": timer_label,
+            "seconds": minutes * 60,
+            "started_at": time_module.time(),
+        })
+        self._schedule_expiry(timer_id, minutes * 60)
+        self._checkpoint()
+        
+        if self._publisher:
+            timer_data = {
                 "type": "timer",
                 "action": "start",
                 "minutes": minutes,
                 "seconds": minutes * 60,
                 "label": timer_label,
-                "id": f"timer-{int(time_module.time() * 1000)}"
-            })
-            await self._room.local_participant.publish_data(
-                timer_data.encode('utf-8'),
-                reliable=True,
-            )
-            print(f"Timer data published: {timer_data}")
+                "id": timer_id
+            }
+            await self._publisher.publish(timer_data)
+            print(f"Timer data queued: {timer_data}")
         
         return {
             "success": True,
@@ -47,6 +65,7 @@ class TimerMixin:
         }
     
     @function_tool()
+    @timed_tool
     async def clear_timers(
         self,
         context: RunContext,
@@ -55,17 +74,48 @@ class TimerMixin:
         Clear all active timers. Use when the user wants to stop/clear all timers,
         or says something like "cancel the timer" or "never mind about the timer".
         """
-        if self._room:
-            timer_data = json.dumps({
+        self._timers = []
+        for handle in getattr(self, '_timer_expiry', {}).values():
+            handle.cancel()
+        self._timer_expiry = {}
+        self._checkpoint()
+        
+        if self._publisher:
+            await self._publisher.publish({
                 "type": "timer",
                 "action": "clear_all"
             })
-            await self._room.local_participant.publish_data(
-                timer_data.encode('utf-8'),
-                reliable=True,
-            )
         
         return {
             "success": True,
             "message": "All timers cleared!"
         }
+    
+    def _schedule_expiry(self, timer_id: str, seconds: float) -> None:
+        """Forget the timer once it has run out, so a resumed session doesn't bring it back."""
+        if not hasattr(self, '_timer_expiry'):
+            self._timer_expiry = {}
+        self._timer_expiry[timer_id] = asyncio.get_running_loop().call_later(seconds, self.remove_timer, timer_id)
+
+    def remove_timer(self, timer_id: str) -> bool:
+        """Drop a timer that ran out or that the user dismissed in the UI. Returns False if unknown."""
+        handle = getattr(self, '_timer_expiry', {}).pop(timer_id, None)
+        if handle:
+            handle.cancel()
+        timers = getattr(self, '_timers', [])
+        kept = [t for t in timers if t["id"] != timer_id]
+        if len(kept) == len(timers):
+            return False
+        self._timers = kept
+        self._checkpoint()
+        return True
+
+    def active_timers(self) -> list[dict]:
+        """Timers that haven't run out yet, with their remaining seconds."""
+        now = time_module.time()
+        active = []
+        for timer in getattr(self, '_timers', []):
+            remaining = int(timer["seconds"] - (now - timer["started_at"]))
+            if remaining > 0:
+                active.append({**timer, "remaining_seconds": remaining})
+        return active
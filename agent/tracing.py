@@ -0,0 +1,202 @@
+"""
+Lightweight span tracing for voice turns.
+
+Spans nest through contextvars (which also follow asyncio.to_thread), so a
+tool call, the CookbookRAG work it triggers and the Gemini requests under it
+share one trace id. Tracing is off unless TRACE_EXPORT is set:
+
+    TRACE_EXPORT=jsonl   append one JSON span per line to TRACE_FILE
+    TRACE_EXPORT=otlp    POST OTLP/JSON batches to OTLP_ENDPOINT
+
+When off, `span()` returns a shared no-op context manager.
+"""
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "").lower()
+TRACE_FILE = Path(os.getenv("TRACE_FILE", Path(__file__).parent / "traces.jsonl"))
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+
+ENABLED = TRACE_EXPORT in ("jsonl", "otlp")
+
+_current_trace: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("span", default=None)
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _NoopContext:
+    def __enter__(self):
+        return _NOOP_SPAN
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopContext()
+
+
+def span(name: str, trace_id: Optional[str] = None, **attributes):
+    """
+    Context manager recording one span. Yields an object with `.set(**attrs)`
+    for attributes only known at the end (e.g. result sizes).
+
+    Args:
+        name: Span name, e.g. "rag.query"
+        trace_id: Start or join this trace instead of the one in context
+    """
+    if not ENABLED:
+        return _NOOP
+    return _span(name, trace_id, attributes)
+
+
+@contextmanager
+def _span(name: str, trace_id: Optional[str], attributes: dict):
+    parent = _current_span.get()
+    trace_id = trace_id or _current_trace.get() or new_trace_id()
+    s = Span(name, trace_id, parent.span_id if parent and parent.trace_id == trace_id else None, attributes)
+    trace_token = _current_trace.set(trace_id)
+    span_token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = f"error: {type(e).__name__}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        _exporter.submit(s)
+
+
+def event(name: str, trace_id: Optional[str] = None, **attributes) -> None:
+    """Record a zero-length span, e.g. the moment a user turn ends."""
+    if ENABLED:
+        with _span(name, trace_id, attributes):
+            pass
+
+
+class _Exporter:
+    """Background thread that writes finished spans, so callers never block on I/O."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, s: Span) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(s)
+        except queue.Full:
+            pass  # drop rather than slow down the caller
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + 1.0
+            while len(batch) < 512:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                if TRACE_EXPORT == "otlp":
+                    self._post_otlp(batch)
+                else:
+                    self._write_jsonl(batch)
+            except Exception as e:
+                print(f"Error exporting {len(batch)} spans: {e}")
+
+    def _write_jsonl(self, batch: list[Span]) -> None:
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            for s in batch:
+                f.write(json.dumps(s.to_dict()) + "\n")
+
+    def _post_otlp(self, batch: list[Span]) -> None:
+        spans = []
+        for s in batch:
+            spans.append({
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "status": {"code": 1 if s.status == "ok" else 2, "message": "" if s.status == "ok" else s.status},
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            })
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "souschef-agent"}}]},
+            "scopeSpans": [{"scope": {"name": "souschef"}, "spans": spans}],
+        }]}
+        req = urllib.request.Request(
+            OTLP_ENDPOINT, data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST",
+        )
+        urllib.request.urlopen(req, timeout=5).close()
+
+
+def _otlp_value(v) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+_exporter = _Exporter()
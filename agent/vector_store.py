@@ -0,0 +1,441 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from ann import DEFAULT_NPROBE, IVFIndex
+
+VECTORS_FILE = "vectors.npy"
+NODES_FILE = "nodes.json"
+MANIFEST_FILE = "manifest.json"
+
+# Node metadata naming the source document (its path relative to the data directory)
+DOCUMENT_KEY = "document"
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+# Coarse candidates per requested result that get rescored exactly
+RESCORE_FACTOR = 8
+MIN_RESCORE_CANDIDATES = 64
+# Rows dequantized at a time while scoring, to bound temporary memory
+SCORE_BLOCK_ROWS = 16384
+
+INDEX_TYPES = ("flat", "ivf")
+# Below this many vectors a shard is scanned exhaustively and IVF isn't built. IVF is
+# per shard (one per document), so this is low enough for an ordinary cookbook to get one.
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "1024"))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """
+    In-memory vector store holding L2-normalized float32 vectors in one NumPy
+    matrix, so a query is a single matrix-vector product (cosine similarity).
+
+    It persists to a directory as `vectors.npy` plus node text/metadata in
+    `nodes.json`. Loading maps the vectors file, so an index built by the
+    ingestion worker process can be picked up without copying or re-parsing.
+
+    With `quantization` set to "float16" or "int8", searches run on a compact
+    in-memory copy (2x / 4x smaller than float32) and only the top candidates
+    are rescored against the exact vectors. When the store was loaded with
+    `mmap`, the exact vectors stay on disk and only those candidate rows are read.
+
+    With `index_type="ivf"` (and at least ANN_MIN_VECTORS vectors), queries
+    only score the rows in the closest IVF lists (see ann.py) instead of
+    scanning every vector; the IVF index is saved next to the vectors.
+    """
+
+    stores_text: bool = True
+
+    _vectors: Any = PrivateAttr(default=None)
+    _records: List[dict] = PrivateAttr(default_factory=list)
+    _manifest: dict = PrivateAttr(default_factory=dict)
+    _quantization: str = PrivateAttr(default="none")
+    _qvectors: Any = PrivateAttr(default=None)
+    _qscales: Any = PrivateAttr(default=None)
+    _index_type: str = PrivateAttr(default="flat")
+    _nlist: Optional[int] = PrivateAttr(default=None)
+    _nprobe: int = PrivateAttr(default=DEFAULT_NPROBE)
+    _ivf: Optional[IVFIndex] = PrivateAttr(default=None)
+    _text_bytes: int = PrivateAttr(default=0)
+
+    def __init__(
+        self,
+        vectors: Optional[np.ndarray] = None,
+        records: Optional[List[dict]] = None,
+        manifest: Optional[dict] = None,
+        quantization: str = "none",
+        index_type: str = "flat",
+        nlist: Optional[int] = None,
+        nprobe: int = DEFAULT_NPROBE,
+        ivf: Optional[IVFIndex] = None,
+    ):
+        super().__init__()
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_MODES}")
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+        self._vectors = vectors if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+        self._records = records or []
+        self._manifest = manifest or {}
+        self._quantization = quantization
+        self._index_type = index_type
+        self._nlist = nlist
+        self._nprobe = nprobe
+        self._ivf = ivf
+        self._quantize()
+        self._text_bytes = self._record_bytes(self._records)
+        self._update_ann()
+
+    @classmethod
+    def from_nodes(cls, nodes: List[BaseNode], embeddings: List[List[float]], **options: Any) -> "NumpyVectorStore":
+        """Build a store from embedded nodes; `options` are constructor settings (quantization, index_type, ...)."""
+        store = cls(**options)
+        store._append(nodes, np.asarray(embeddings, dtype=np.float32))
+        return store
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def dim(self) -> int:
+        return int(self._vectors.shape[1]) if self._vectors.ndim == 2 else 0
+
+    @property
+    def manifest(self) -> dict:
+        return self._manifest
+
+    @property
+    def quantization(self) -> str:
+        return self._quantization
+
+    def _quantize(self) -> None:
+        """(Re)build the compact search copy of the vectors."""
+        self._qvectors = None
+        self._qscales = None
+        if self._quantization == "none" or len(self._records) == 0:
+            return
+        if self._quantization == "float16":
+            self._qvectors = np.asarray(self._vectors, dtype=np.float16)
+            return
+        # int8: symmetric per-vector scale
+        blocks, scales = [], []
+        for start in range(0, len(self._records), SCORE_BLOCK_ROWS):
+            block = np.asarray(self._vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            blocks.append(np.round(block / scale[:, None]).astype(np.int8))
+            scales.append(scale.astype(np.float32))
+        self._qvectors = np.vstack(blocks)
+        self._qscales = np.concatenate(scales)
+
+    def _coarse_scores(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate scores on the quantized copy, for all rows or just `rows`."""
+        if rows is not None:
+            scores = self._qvectors[rows].astype(np.float32) @ q
+            return scores * self._qscales[rows] if self._qscales is not None else scores
+        scores = np.empty(len(self._records), dtype=np.float32)
+        for start in range(0, len(scores), SCORE_BLOCK_ROWS):
+            block = self._qvectors[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[start:start + len(block)] = block @ q
+        if self._qscales is not None:
+            scores *= self._qscales
+        return scores
+
+    def _update_ann(self, added: Optional[np.ndarray] = None) -> None:
+        """Train, extend or retrain the IVF index after vectors were added."""
+        if self._index_type != "ivf" or len(self._records) < ANN_MIN_VECTORS:
+            self._ivf = None
+            return
+        if self._ivf is not None and added is not None:
+            self._ivf.add(added)
+        if self._ivf is None or self._ivf.needs_retrain() or len(self._ivf.assignments) != len(self._records):
+            self._ivf = IVFIndex.train(self._vectors, nlist=self._nlist, nprobe=self._nprobe)
+
+    def ann_params(self) -> Optional[dict]:
+        return self._ivf.params() if self._ivf is not None else None
+
+    def memory_bytes(self) -> dict:
+        """Bytes held by vectors: the exact matrix (heap or mapped) and the quantized copy."""
+        exact = int(self._vectors.nbytes) if self._vectors is not None else 0
+        quantized = 0
+        if self._qvectors is not None:
+            quantized += int(self._qvectors.nbytes)
+        if self._qscales is not None:
+            quantized += int(self._qscales.nbytes)
+        return {
+            "exact": exact,
+            "exact_mapped": isinstance(self._vectors, np.memmap),
+            "quantized": quantized,
+        }
+
+    @staticmethod
+    def _record_bytes(records: List[dict]) -> int:
+        return sum(len(r["text"].encode("utf-8")) + len(json.dumps(r["metadata"])) for r in records)
+
+    def stats(self) -> dict:
+        """Counts, dimensionality and bytes held, by kind, for capacity planning."""
+        memory = self.memory_bytes()
+        return {
+            "nodes": len(self._records),
+            "vectors": int(self._vectors.shape[0]) if self._vectors.ndim == 2 else 0,
+            "dim": self.dim,
+            "vector_bytes": memory["exact"],
+            "vector_bytes_mapped": memory["exact"] if memory["exact_mapped"] else 0,
+            "quantized_bytes": memory["quantized"],
+            "ann_bytes": self._ivf.nbytes if self._ivf is not None else 0,
+            "text_bytes": self._text_bytes,
+        }
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _append(self, nodes: List[BaseNode], embeddings: np.ndarray) -> List[str]:
+        if not nodes:
+            return []
+        embeddings = _normalize(embeddings)
+        if len(self._records) == 0:
+            self._vectors = embeddings
+        else:
+            if embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} doesn't match index dimension {self.dim}")
+            self._vectors = np.vstack([self._vectors, embeddings])
+        added = [
+            {
+                "id": node.node_id,
+                "text": node.get_content(),
+                "metadata": dict(node.metadata),
+                "ref_doc_id": node.ref_doc_id,
+            }
+            for node in nodes
+        ]
+        self._records.extend(added)
+        self._quantize()
+        self._text_bytes += self._record_bytes(added)
+        self._update_ann(embeddings)
+        return [node.node_id for node in nodes]
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        return self._append(nodes, np.asarray([node.get_embedding() for node in nodes], dtype=np.float32))
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        keep = [i for i, r in enumerate(self._records) if r["ref_doc_id"] != ref_doc_id]
+        if len(keep) == len(self._records):
+            return
+        kept = set(keep)
+        self._text_bytes -= self._record_bytes([r for i, r in enumerate(self._records) if i not in kept])
+        self._vectors = np.ascontiguousarray(self._vectors[keep])
+        self._records = [self._records[i] for i in keep]
+        self._quantize()
+        if self._ivf is not None:
+            self._ivf.keep(keep)
+        self._update_ann()
+
+    def _to_node(self, i: int) -> TextNode:
+        record = self._records[i]
+        node = TextNode(id_=record["id"], text=record["text"], metadata=record["metadata"])
+        if record.get("ref_doc_id"):
+            node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=record["ref_doc_id"])
+        return node
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if not self._records or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        q = _normalize(np.asarray(query.query_embedding, dtype=np.float32))
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query embedding dimension {q.shape[0]} doesn't match index dimension {self.dim}")
+        k = min(query.similarity_top_k, len(self._records))
+
+        # Rows to score: the closest IVF lists, or everything
+        pool = self._ivf.candidates(q, kwargs.get("nprobe")) if self._ivf is not None else None
+        if pool is not None and len(pool) < k:
+            pool = None
+        if self._qvectors is not None:
+            # Coarse pass on the quantized copy, then exact rescoring of the shortlist
+            coarse = self._coarse_scores(q, pool)
+            n = min(len(coarse), max(k * RESCORE_FACTOR, MIN_RESCORE_CANDIDATES))
+            shortlist = np.argpartition(-coarse, n - 1)[:n]
+            pool = np.sort(shortlist if pool is None else pool[shortlist])
+
+        if pool is None:
+            scores = self._vectors @ q
+        else:
+            scores = np.asarray(self._vectors[pool], dtype=np.float32) @ q
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        top = best if pool is None else pool[best]
+
+        return VectorStoreQueryResult(
+            nodes=[self._to_node(int(i)) for i in top],
+            similarities=[float(scores[i]) for i in best],
+            ids=[self._records[int(i)]["id"] for i in top],
+        )
+
+    def save(self, persist_dir: Path, **manifest: Any) -> dict:
+        """Write vectors, nodes and a manifest to `persist_dir`."""
+        persist_dir = Path(persist_dir)
+        persist_dir.mkdir(parents=True, exist_ok=True)
+        np.save(persist_dir / VECTORS_FILE, np.ascontiguousarray(self._vectors, dtype=np.float32))
+        (persist_dir / NODES_FILE).write_text(json.dumps(self._records), encoding="utf-8")
+        if self._ivf is not None:
+            self._ivf.save(persist_dir)
+        self._manifest = {
+            **self._manifest,
+            "nodes": len(self._records),
+            "dim": self.dim,
+            "ann": self.ann_params(),
+            "created_at": time.time(),
+            **manifest,
+        }
+        (persist_dir / MANIFEST_FILE).write_text(json.dumps(self._manifest), encoding="utf-8")
+        return self._manifest
+
+    @classmethod
+    def load(cls, persist_dir: Path, mmap: bool = True, **options: Any) -> "NumpyVectorStore":
+        """
+        Load a saved store; with `mmap` the vectors stay in the page cache instead
+        of the heap. `options` are constructor settings; a saved IVF index is
+        reused when `index_type="ivf"`, otherwise one is trained as needed.
+        """
+        persist_dir = Path(persist_dir)
+        vectors = np.load(persist_dir / VECTORS_FILE, mmap_mode="r" if mmap else None)
+        records = json.loads((persist_dir / NODES_FILE).read_text(encoding="utf-8"))
+        manifest = json.loads((persist_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+        if options.get("index_type") == "ivf" and "ivf" not in options:
+            options["ivf"] = IVFIndex.load(persist_dir, nprobe=options.get("nprobe"))
+        return cls(vectors=vectors, records=records, manifest=manifest, **options)
+
+
+class ShardedVectorStore(BasePydanticVectorStore):
+    """
+    One NumpyVectorStore shard per source document.
+
+    A query only searches the shards selected by a `document` metadata
+    filter (EQ or IN), or every shard when unfiltered, and merges their
+    top-k. Adding, replacing or removing a document swaps a single shard.
+
+    ANN indexes are per shard too: an unscoped query still visits every
+    shard, and each one under ANN_MIN_VECTORS is scanned in full, so its
+    cost grows with the number of documents in the library.
+    """
+
+    stores_text: bool = True
+
+    _shards: dict = PrivateAttr(default_factory=dict)
+
+    def __init__(self):
+        super().__init__()
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def shard_keys(self) -> List[str]:
+        return list(self._shards)
+
+    def get_shard(self, key: str) -> Optional[NumpyVectorStore]:
+        return self._shards.get(key)
+
+    def shards(self) -> dict:
+        return dict(self._shards)
+
+    def set_shard(self, key: str, store: NumpyVectorStore) -> None:
+        # Copy-on-write, so a query running in another thread sees a consistent set
+        self._shards = {**self._shards, key: store}
+
+    def remove_shard(self, key: str) -> Optional[NumpyVectorStore]:
+        shards = dict(self._shards)
+        store = shards.pop(key, None)
+        self._shards = shards
+        return store
+
+    def clear(self) -> None:
+        self._shards = {}
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self._shards.values())
+
+    def stats(self, shards: Optional[dict] = None) -> dict:
+        """
+        Totals over every shard (see NumpyVectorStore.stats) plus each shard's own
+        stats; pass a `shards()` snapshot to describe exactly that set of shards.
+        """
+        shards = {key: store.stats() for key, store in (shards if shards is not None else self._shards).items()}
+        totals = {
+            field: sum(s[field] for s in shards.values())
+            for field in ("nodes", "vectors", "vector_bytes", "vector_bytes_mapped",
+                          "quantized_bytes", "ann_bytes", "text_bytes")
+        }
+        dims = {s["dim"] for s in shards.values() if s["vectors"]}
+        totals["dim"] = dims.pop() if len(dims) == 1 else (sorted(dims) if dims else 0)
+        totals["shards"] = shards
+        return totals
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        by_document: dict = {}
+        for node in nodes:
+            by_document.setdefault(node.metadata.get(DOCUMENT_KEY, ""), []).append(node)
+        ids = []
+        for key, group in by_document.items():
+            store = self._shards.get(key)
+            if store is None:
+                store = NumpyVectorStore()
+                self.set_shard(key, store)
+            ids.extend(store.add(group))
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        for store in self._shards.values():
+            store.delete(ref_doc_id)
+
+    def _select(self, filters: Optional[MetadataFilters], shards: dict) -> List[str]:
+        """Keys of the `shards` snapshot that the filters allow."""
+        if not filters or not filters.filters:
+            return list(shards)
+        selected = None
+        for f in filters.filters:
+            if f.key != DOCUMENT_KEY or f.operator not in (FilterOperator.EQ, FilterOperator.IN):
+                raise ValueError(f"Unsupported filter {f.key} {f.operator}; only '{DOCUMENT_KEY}' EQ/IN is indexed")
+            keys = set(f.value) if f.operator == FilterOperator.IN else {f.value}
+            if selected is None:
+                selected = keys
+            elif filters.condition == FilterCondition.OR:
+                selected |= keys
+            else:
+                selected &= keys
+        return [k for k in shards if k in selected]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        shards = self._shards
+        hits = []
+        for key in self._select(query.filters, shards):
+            result = shards[key].query(query, **kwargs)
+            hits.extend(zip(result.similarities, result.nodes, result.ids))
+        hits.sort(key=lambda h: h[0], reverse=True)
+        hits = hits[:query.similarity_top_k]
+        return VectorStoreQueryResult(
+            nodes=[h[1] for h in hits],
+            similarities=[h[0] for h in hits],
+            ids=[h[2] for h in hits],
+        )
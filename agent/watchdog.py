@@ -0,0 +1,169 @@
+"""
+Event-loop blocking watchdog (opt-in with LOOP_WATCHDOG=1).
+
+The asyncio loop also carries real-time audio, so any synchronous network
+or CPU work on it is heard as a glitch. A helper thread posts a heartbeat
+to the loop every LOOP_WATCHDOG_INTERVAL seconds; if it hasn't run within
+LOOP_WATCHDOG_THRESHOLD_MS the loop is blocked, and the watchdog captures
+the loop thread's stack and the tool or handler that was running (see
+`activity`), then records the stall in metrics and the log once the loop
+is free again.
+"""
+import asyncio
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Optional
+
+import tracing
+from metrics import counter, histogram
+
+LOOP_WATCHDOG = os.getenv("LOOP_WATCHDOG", "0") == "1"
+LOOP_WATCHDOG_THRESHOLD_MS = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", "100"))
+LOOP_WATCHDOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.25"))
+# Innermost frames of the loop thread kept in the log
+STACK_LIMIT = 30
+# Innermost frames that identify a blocking site, for logging each full stack once
+SITE_FRAMES = 5
+
+LOOP_LAG = histogram("souschef_event_loop_lag_seconds", "Delay before the event loop ran a watchdog heartbeat")
+LOOP_STALLS = counter("souschef_event_loop_stalls_total", "Event-loop stalls over the watchdog threshold, by activity")
+LOOP_STALL_SECONDS = histogram("souschef_event_loop_stall_seconds", "Duration of event-loop stalls, by activity")
+
+# Labels of the tools/handlers in progress, per task (None: plain loop callbacks).
+# Only touched from the loop thread; the watchdog reads a snapshot.
+_activities: dict[Optional[asyncio.Task], list[str]] = {}
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+@contextmanager
+def activity(label: str):
+    """Mark `label` (e.g. "tool:search_cookbook") as running in the current task, for stall attribution."""
+    task = _current_task()
+    stack = _activities.setdefault(task, [])
+    stack.append(label)
+    try:
+        yield
+    finally:
+        stack.pop()
+        if not stack:
+            _activities.pop(task, None)
+
+
+def watched(label: str):
+    """Decorator form of `activity` for sync or async handlers."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with activity(label):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with activity(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class LoopWatchdog:
+    """Helper thread measuring the lag of one event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int,
+                 threshold_ms: float = LOOP_WATCHDOG_THRESHOLD_MS, interval: float = LOOP_WATCHDOG_INTERVAL):
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._seen_stacks: set[tuple] = set()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            beat = threading.Event()
+            sent = time.monotonic()
+            try:
+                self.loop.call_soon_threadsafe(beat.set)
+            except RuntimeError:
+                return  # Loop closed
+            if not beat.wait(self.threshold):
+                # Blocked: look at what the loop thread is doing right now
+                label, frames = self._capture()
+                while not beat.wait(1.0):
+                    if self._stopped.is_set() or self.loop.is_closed():
+                        return
+                self._report(time.monotonic() - sent, label, frames)
+            LOOP_LAG.observe(time.monotonic() - sent)
+            self._stopped.wait(self.interval)
+
+    def _capture(self) -> tuple[str, list]:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        frames = traceback.extract_stack(frame, limit=STACK_LIMIT) if frame else []
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        labels = list(_activities.get(task) or _activities.get(None) or ())
+        if labels:
+            label = labels[-1]
+        elif task is not None:
+            label = f"task:{task.get_name()}"
+        else:
+            label = "callback"
+        return label, frames
+
+    def _report(self, stall_s: float, label: str, frames: list) -> None:
+        LOOP_STALLS.inc(activity=label)
+        LOOP_STALL_SECONDS.observe(stall_s, activity=label)
+        where = f"{frames[-1].filename}:{frames[-1].lineno} in {frames[-1].name}" if frames else "unknown"
+        tracing.event("loop.stall", activity=label, stall_ms=round(stall_s * 1000, 1), where=where)
+
+        # The full stack the first time a blocking site shows up, one line after that
+        signature = tuple((f.filename, f.lineno) for f in frames[-SITE_FRAMES:])
+        if signature in self._seen_stacks:
+            print(f"Event loop blocked {stall_s * 1000:.0f}ms by {label} at {where}")
+            return
+        self._seen_stacks.add(signature)
+        stack = "".join(traceback.format_list(frames))
+        print(f"Event loop blocked {stall_s * 1000:.0f}ms by {label} at {where}; loop thread stack:\n{stack}")
+
+
+_instance: Optional[LoopWatchdog] = None
+
+
+def start() -> Optional[LoopWatchdog]:
+    """
+    Start watching the running event loop if LOOP_WATCHDOG=1. Call from
+    the loop; safe to call from every session.
+    """
+    global _instance
+    if not LOOP_WATCHDOG:
+        return None
+    loop = asyncio.get_running_loop()
+    if _instance is None or _instance.loop is not loop:
+        if _instance is not None:
+            _instance.stop()
+        _instance = LoopWatchdog(loop, threading.get_ident())
+        _instance.start()
+        print(f"Event-loop watchdog on: threshold {LOOP_WATCHDOG_THRESHOLD_MS:.0f}ms")
+    return _instance
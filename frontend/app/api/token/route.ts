@@ -10,6 +10,13 @@ export async function GET(request: NextRequest) {
     const room = request.nextUrl.searchParams.get('room') || defaultRoom;
     const username = request.nextUrl.searchParams.get('username') || 'user';
     const apiKeyParam = request.nextUrl.searchParams.get('apiKey') || '';
+    // "id:version,..." of recipe plans the browser has cached
+    const plans = (request.nextUrl.searchParams.get('plans') || '')
+        .split(',')
+        .map((entry) => entry.split(':'))
+        .filter((parts) => parts.length === 2 && parts[0] && parts[1])
+        .slice(0, 20)
+        .map(([id, version]) => ({ id, version }));
 
     const apiKey = process.env.LIVEKIT_API_KEY;
     const apiSecret = process.env.LIVEKIT_API_SECRET;
@@ -22,7 +29,7 @@ export async function GET(request: NextRequest) {
         );
     }
 
-    const roomMetadata = JSON.stringify({ voice, apiKey: apiKeyParam });
+    const roomMetadata = JSON.stringify({ voice, apiKey: apiKeyParam, plans });
     const httpUrl = livekitUrl.replace('wss://', 'https://');
 
     const roomService = new RoomServiceClient(httpUrl, apiKey, apiSecret);
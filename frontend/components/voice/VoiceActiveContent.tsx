@@ -13,7 +13,9 @@ import {
 import { ConnectionState, RoomEvent, TranscriptionSegment, Participant, DataPacket_Kind, Track, LocalAudioTrack } from "livekit-client"
 
 import { cn } from "@/lib/utils"
-import { VoiceActiveContentProps, TranscriptEntry, Timer, ShoppingItem, RecipePlan } from "./types"
+import { decodeMessage, SUPPORTED_ENCODINGS } from "@/lib/codec"
+import { cachePlan, cachedPlanVersions, resolvePlanRef } from "@/lib/planCache"
+import { VoiceActiveContentProps, TranscriptEntry, Timer, ShoppingItem, RecipePlan, RecipePlanRef } from "./types"
 import { ChatPanel } from "./ChatPanel"
 import { TimerDisplay } from "@/components/tools/TimerDisplay"
 import { ShoppingList } from "@/components/tools/ShoppingList"
@@ -72,7 +74,7 @@ export function VoiceActiveContent({
             kind?: DataPacket_Kind
         ) => {
             try {
-                const data = JSON.parse(new TextDecoder().decode(payload))
+                const data = decodeMessage(payload)
 
                 if (data.type === "timer") {
                     if (data.action === "start") {
@@ -107,11 +109,25 @@ export function VoiceActiveContent({
 
                 if (data.type === "recipe_plan") {
                     console.log("Recipe plan received:", data.plan)
+                    cachePlan(data.plan)
                     setRecipePlan(data.plan)
                     setIsRecipeGenerating(false)
                     // We don't auto-start cooking mode; wait for "cooking_mode" event
                 }
 
+                if (data.type === "recipe_plan_ref") {
+                    // A plan we reported holding: only its id and step state were sent
+                    const plan = resolvePlanRef(data as RecipePlanRef)
+                    if (plan) {
+                        setRecipePlan(plan)
+                        setIsRecipeGenerating(false)
+                    } else {
+                        const payload = JSON.stringify({ type: "plan_missing", id: data.id })
+                        room.localParticipant.publishData(new TextEncoder().encode(payload), { reliable: true })
+                            .catch((e) => console.error("Failed to request plan:", e))
+                    }
+                }
+
                 if (data.type === "recipe_plan_status") {
                     if (data.action === "started") {
                         setIsRecipeGenerating(true)
@@ -145,8 +161,23 @@ export function VoiceActiveContent({
         }
     }, [room])
 
+    // Once the agent is up, tell it which plans we have cached so it can send them by id
+    const helloSent = useRef(false)
+    useEffect(() => {
+        if (!room || helloSent.current) return
+        if (agentState === "disconnected" || agentState === "connecting" || agentState === "initializing") return
+        helloSent.current = true
+        const payload = JSON.stringify({ type: "hello", encodings: SUPPORTED_ENCODINGS, plans: cachedPlanVersions() })
+        room.localParticipant.publishData(new TextEncoder().encode(payload), { reliable: true })
+            .catch((e) => console.error("Failed to send hello:", e))
+    }, [room, agentState])
+
     const handleRemoveTimer = (id: string) => {
         setTimers((prev) => prev.filter((t) => t.id !== id))
+        // So the agent doesn't bring it back when the session resumes
+        const payload = JSON.stringify({ type: "timer_cancel", id })
+        room?.localParticipant.publishData(new TextEncoder().encode(payload), { reliable: true })
+            .catch((e) => console.error("Failed to cancel timer:", e))
     }
 
     const handleRemoveShoppingItem = (id: string) => {
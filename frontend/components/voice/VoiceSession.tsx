@@ -13,6 +13,8 @@ import {
 import { ConnectionState, RoomEvent, TranscriptionSegment, Participant } from "livekit-client"
 
 import { cn } from "@/lib/utils"
+import { cachedPlansParam } from "@/lib/planCache"
+import { browserUserId } from "@/lib/userId"
 
 import { VoiceActiveContent } from "./VoiceActiveContent"
 import { VoiceSelectView } from "@/components/landing/VoiceSelect"
@@ -65,10 +67,15 @@ export function HeroSection({ livekitUrl }: HeroSectionProps) {
 
         // Get token and connect
         try {
-            let url = `/api/token?voice=${voice}`
+            let url = `/api/token?voice=${voice}&username=${encodeURIComponent(browserUserId())}`
             if (apiKey) {
                 url += `&apiKey=${encodeURIComponent(apiKey)}`
             }
+            // Plans we already hold, so a resumed session doesn't resend them
+            const plans = cachedPlansParam()
+            if (plans) {
+                url += `&plans=${encodeURIComponent(plans)}`
+            }
             const response = await fetch(url)
             const data = await response.json()
 
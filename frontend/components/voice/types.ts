@@ -74,6 +74,7 @@ export interface Ingredient {
 
 export interface RecipePlan {
     id: string
+    version?: string
     title?: string
     name?: string
     steps: RecipeStep[]
@@ -83,3 +84,11 @@ export interface RecipePlan {
     prep_time?: string
     cook_time?: string
 }
+
+// A plan the UI already holds, sent by id with only its step state
+export interface RecipePlanRef {
+    id: string
+    version: string
+    current_step_index: number
+    completed_steps: number[]
+}
@@ -0,0 +1,120 @@
+import { FieldSpec, MESSAGE_SCHEMAS } from "./messageSchemas"
+
+// Agent -> UI data messages come as JSON or, once negotiated in the hello
+// handshake, as MessagePack arrays `[type, field1, field2, ...]` laid out by
+// MESSAGE_SCHEMAS (generated from agent/codec.py). Most compact first.
+export const SUPPORTED_ENCODINGS = ["msgpack", "json"]
+
+const textDecoder = new TextDecoder()
+
+class Reader {
+    private view: DataView
+    private pos = 0
+
+    constructor(private bytes: Uint8Array) {
+        this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength)
+    }
+
+    private take(n: number): number {
+        if (this.pos + n > this.bytes.length) throw new Error("Truncated MessagePack payload")
+        const at = this.pos
+        this.pos += n
+        return at
+    }
+
+    private str(n: number): string {
+        const at = this.take(n)
+        return textDecoder.decode(this.bytes.subarray(at, at + n))
+    }
+
+    private bin(n: number): Uint8Array {
+        const at = this.take(n)
+        return this.bytes.slice(at, at + n)
+    }
+
+    private array(n: number): unknown[] {
+        const out = []
+        for (let i = 0; i < n; i++) out.push(this.read())
+        return out
+    }
+
+    private map(n: number): Record<string, unknown> {
+        const out: Record<string, unknown> = {}
+        for (let i = 0; i < n; i++) {
+            const key = this.read()
+            out[String(key)] = this.read()
+        }
+        return out
+    }
+
+    read(): unknown {
+        const v = this.view
+        const b = v.getUint8(this.take(1))
+        if (b <= 0x7f) return b
+        if (b >= 0xe0) return b - 0x100
+        if ((b & 0xe0) === 0xa0) return this.str(b & 0x1f)
+        if ((b & 0xf0) === 0x90) return this.array(b & 0x0f)
+        if ((b & 0xf0) === 0x80) return this.map(b & 0x0f)
+        switch (b) {
+            case 0xc0: return null
+            case 0xc2: return false
+            case 0xc3: return true
+            case 0xc4: return this.bin(v.getUint8(this.take(1)))
+            case 0xc5: return this.bin(v.getUint16(this.take(2)))
+            case 0xc6: return this.bin(v.getUint32(this.take(4)))
+            case 0xca: return v.getFloat32(this.take(4))
+            case 0xcb: return v.getFloat64(this.take(8))
+            case 0xcc: return v.getUint8(this.take(1))
+            case 0xcd: return v.getUint16(this.take(2))
+            case 0xce: return v.getUint32(this.take(4))
+            case 0xcf: return Number(v.getBigUint64(this.take(8)))
+            case 0xd0: return v.getInt8(this.take(1))
+            case 0xd1: return v.getInt16(this.take(2))
+            case 0xd2: return v.getInt32(this.take(4))
+            case 0xd3: return Number(v.getBigInt64(this.take(8)))
+            case 0xd9: return this.str(v.getUint8(this.take(1)))
+            case 0xda: return this.str(v.getUint16(this.take(2)))
+            case 0xdb: return this.str(v.getUint32(this.take(4)))
+            case 0xdc: return this.array(v.getUint16(this.take(2)))
+            case 0xdd: return this.array(v.getUint32(this.take(4)))
+            case 0xde: return this.map(v.getUint16(this.take(2)))
+            case 0xdf: return this.map(v.getUint32(this.take(4)))
+        }
+        throw new Error(`Unsupported MessagePack type 0x${b.toString(16)}`)
+    }
+}
+
+export function unpackMsgpack(bytes: Uint8Array): unknown {
+    return new Reader(bytes).read()
+}
+
+// Mirror of codec._unpack: positional values back into a keyed record
+function unpackFields(values: unknown, fields: FieldSpec[]): Record<string, any> | null {
+    if (!Array.isArray(values)) return null
+    const out: Record<string, any> = {}
+    const n = Math.min(fields.length, values.length)
+    for (let i = 0; i < n; i++) {
+        const spec = fields[i]
+        const value = values[i]
+        if (typeof spec === "string") {
+            out[spec] = value
+        } else if ("items" in spec) {
+            out[spec.name] = Array.isArray(value) ? value.map((v) => unpackFields(v, spec.items)) : null
+        } else {
+            out[spec.name] = unpackFields(value, spec.fields)
+        }
+    }
+    return out
+}
+
+// Parse an agent data packet in either encoding; JSON payloads always start with '{'
+export function decodeMessage(payload: Uint8Array): any {
+    if (payload[0] === 0x7b) return JSON.parse(textDecoder.decode(payload))
+    const data = unpackMsgpack(payload)
+    if (Array.isArray(data) && typeof data[0] === "string") {
+        const type = data[0]
+        return { ...unpackFields(data.slice(1), MESSAGE_SCHEMAS[type] ?? []), type }
+    }
+    if (data && typeof data === "object") return data
+    throw new Error("Unrecognized data message")
+}
@@ -0,0 +1,120 @@
+// Generated from agent/codec.py MESSAGE_SCHEMAS by `python agent/codec.py > frontend/lib/messageSchemas.ts`. Do not edit.
+
+export type FieldSpec = string | { name: string; fields: FieldSpec[] } | { name: string; items: FieldSpec[] }
+
+export const MESSAGE_SCHEMAS: Record<string, FieldSpec[]> = {
+    "timer": [
+        "action",
+        "minutes",
+        "seconds",
+        "label",
+        "id"
+    ],
+    "shopping_list": [
+        "action",
+        {
+            "name": "items",
+            "items": [
+                "id",
+                "name",
+                "category",
+                "emoji",
+                "quantity",
+                "estimated_price"
+            ]
+        }
+    ],
+    "recipe_plan_status": [
+        "action"
+    ],
+    "recipe_plan": [
+        {
+            "name": "plan",
+            "fields": [
+                "id",
+                "title",
+                "servings",
+                "prep_time",
+                "cook_time",
+                {
+                    "name": "ingredients",
+                    "items": [
+                        "name",
+                        "quantity",
+                        "emoji"
+                    ]
+                },
+                {
+                    "name": "steps",
+                    "items": [
+                        "step_number",
+                        "instruction",
+                        "duration_minutes",
+                        "tips",
+                        "completed",
+                        "depends_on"
+                    ]
+                },
+                "current_step_index",
+                "version"
+            ]
+        }
+    ],
+    "recipe_plan_ref": [
+        "id",
+        "version",
+        "current_step_index",
+        "completed_steps"
+    ],
+    "meal_timeline": [
+        {
+            "name": "timeline",
+            "fields": [
+                "recipes",
+                {
+                    "name": "steps",
+                    "items": [
+                        "recipe",
+                        "step_number",
+                        "instruction",
+                        "start_minute",
+                        "end_minute",
+                        "hands_off",
+                        "duration_minutes",
+                        "tips",
+                        "timer_started"
+                    ]
+                },
+                "total_minutes",
+                "sequential_minutes"
+            ]
+        }
+    ],
+    "cooking_mode": [
+        "action"
+    ],
+    "step_update": [
+        "step_index"
+    ],
+    "hello_ack": [
+        "encoding"
+    ],
+    "hello": [
+        "encodings",
+        "plans"
+    ],
+    "plan_missing": [
+        "id"
+    ],
+    "ui_step_change": [
+        "action",
+        "step_index"
+    ],
+    "timer_cancel": [
+        "id"
+    ],
+    "request_recipe": [
+        "title",
+        "book"
+    ]
+}
@@ -0,0 +1,63 @@
+import { RecipePlan, RecipePlanRef } from "@/components/voice/types"
+
+// Recipe plans the agent has sent, by id. The agent sends a plan we already
+// hold as just its id, version and step state (see recipe_plan_ref).
+const STORAGE_KEY = "souschef-plan-cache"
+const MAX_PLANS = 20
+
+interface CacheEntry {
+    plan: RecipePlan
+    usedAt: number
+}
+
+function load(): Record<string, CacheEntry> {
+    if (typeof window === "undefined") return {}
+    try {
+        return JSON.parse(window.localStorage.getItem(STORAGE_KEY) || "{}")
+    } catch {
+        return {}
+    }
+}
+
+function save(entries: Record<string, CacheEntry>) {
+    try {
+        window.localStorage.setItem(STORAGE_KEY, JSON.stringify(entries))
+    } catch {
+        // Storage full or disabled: the agent just resends full plans
+    }
+}
+
+export function cachePlan(plan: RecipePlan) {
+    if (!plan.id || !plan.version) return
+    const entries = load()
+    entries[plan.id] = { plan, usedAt: Date.now() }
+    const ids = Object.keys(entries).sort((a, b) => entries[b].usedAt - entries[a].usedAt)
+    for (const id of ids.slice(MAX_PLANS)) delete entries[id]
+    save(entries)
+}
+
+export function cachedPlanVersions(): { id: string; version: string }[] {
+    return Object.values(load())
+        .filter((e) => e.plan.version)
+        .map((e) => ({ id: e.plan.id, version: e.plan.version as string }))
+}
+
+// Compact form for the token request: "id:version,id:version"
+export function cachedPlansParam(): string {
+    return cachedPlanVersions().map((p) => `${p.id}:${p.version}`).join(",")
+}
+
+// The cached plan with the ref's step state applied, or null if we don't hold that version
+export function resolvePlanRef(ref: RecipePlanRef): RecipePlan | null {
+    const entries = load()
+    const entry = entries[ref.id]
+    if (!entry || entry.plan.version !== ref.version) return null
+    entry.usedAt = Date.now()
+    save(entries)
+    const completed = new Set(ref.completed_steps)
+    return {
+        ...entry.plan,
+        current_step_index: ref.current_step_index,
+        steps: entry.plan.steps.map((step, i) => ({ ...step, completed: completed.has(i) })),
+    }
+}
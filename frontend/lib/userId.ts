@@ -0,0 +1,18 @@
+// Stable id for this browser, sent as the LiveKit identity so the agent can
+// save and resume this user's cooking state without mixing it up with others'
+const STORAGE_KEY = "souschef-user-id"
+
+export function browserUserId(): string {
+    if (typeof window === "undefined") return ""
+    try {
+        let id = window.localStorage.getItem(STORAGE_KEY)
+        if (!id) {
+            id = `user-${crypto.randomUUID()}`
+            window.localStorage.setItem(STORAGE_KEY, id)
+        }
+        return id
+    } catch {
+        // Storage disabled: a fresh id each visit, so nothing is resumed
+        return `user-${crypto.randomUUID()}`
+    }
+}